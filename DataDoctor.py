@@ -3,12 +3,12 @@ import os
 import csv
 import json
 from datetime import datetime
-from PyQt6.QtWidgets import (QApplication, QMainWindow, QPushButton, QTableWidget, QTabWidget, QWidget, QGridLayout, 
+from PyQt6.QtWidgets import (QApplication, QMainWindow, QPushButton, QTableView, QTabWidget, QWidget, QGridLayout, 
                              QSizePolicy, QMessageBox, QFileDialog, QMenu, QLabel, QVBoxLayout)
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QPalette, QFontMetrics, QPixmap
 from PyQt6 import uic
-from core import Logic, Query, Utils, Config
+from core import Logic, Query, QueryUtils, Utils, Config, SqlConsole
 from ui.uiAbout import uiAbout
 from ui.uiDataDictionary import uiDataDictionary
 from ui.uiOptions import uiOptions
@@ -22,7 +22,7 @@ class uiMain(QMainWindow):
 
         # Define controls
         self.btnPublicQuery = self.findChild(QPushButton, 'btnPublicQuery')
-        self.mainTable = self.findChild(QTableWidget, 'mainTable')
+        self.mainTable = self.findChild(QTableView, 'mainTable')
         self.btnDataDictionary = self.findChild(QPushButton, 'btnDataDictionary')
         self.btnExportCSV = self.findChild(QPushButton, 'btnExportCSV')
         self.btnOptions = self.findChild(QPushButton, 'btnOptions')
@@ -32,16 +32,20 @@ class uiMain(QMainWindow):
         self.btnUndo = self.findChild(QPushButton, 'btnUndo')
         self.tabWidget = self.findChild(QTabWidget, 'tabWidget')
         self.tabMain = self.findChild(QWidget, 'tabMain')
+        self.tabSQL = self.findChild(QWidget, 'tabSQL')
+        self.btnSQL = self.findChild(QPushButton, 'btnSQL')
         self.lastQueryType = None
         self.lastQueryItems = []
         self.lastStartDate = None
         self.lastEndDate = None
         self.columnMetadata = []
+        self.resultFrame = None
+        self.queryController = None
 
         # Set button style
         for btn in [self.btnPublicQuery, self.btnDataDictionary, self.btnExportCSV,
                     self.btnOptions, self.btnInfo, self.btnInternalQuery,
-                    self.btnUndo, self.btnRefresh]:
+                    self.btnUndo, self.btnRefresh, self.btnSQL]:
             if btn:
                 Utils.buttonStyle(btn)
 
@@ -62,7 +66,8 @@ class uiMain(QMainWindow):
         self.btnInternalQuery.clicked.connect(self.btnInternalQueryPressed)
         self.btnRefresh.clicked.connect(self.btnRefreshPressed)
         self.btnUndo.clicked.connect(self.btnUndoPressed)
-        self.mainTable.horizontalHeader().sectionClicked.connect(lambda col: Query.customSortTable(self.mainTable, col, self.winDataDictionary.mainTable))
+        self.btnSQL.clicked.connect(self.btnSQLPressed)
+        self.mainTable.horizontalHeader().sectionClicked.connect(lambda col: Query.customSortTable(self.mainTable, col, self.winDataDictionary.mainTable, self.resultFrame))
         self.mainTable.horizontalHeader().setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.mainTable.horizontalHeader().customContextMenuRequested.connect(self.showHeaderContextMenu)
         self.mainTable.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
@@ -93,12 +98,14 @@ class uiMain(QMainWindow):
             if dataQueryIndex != -1:
                 self.tabWidget.removeTab(dataQueryIndex)
 
-            sqlTab = self.findChild(QWidget, 'tabSQL')
-            sqlIndex = self.tabWidget.indexOf(sqlTab)
+            sqlIndex = self.tabWidget.indexOf(self.tabSQL)
 
             if sqlIndex != -1:
                 self.tabWidget.removeTab(sqlIndex)
 
+        # SQL console lives on the hidden SQL tab until opened
+        self.sqlConsole = SqlConsole.sqlConsole(self, self.tabSQL)
+
         # Center window
         Utils.centerWindowToParent(self)
 
@@ -132,7 +139,7 @@ class uiMain(QMainWindow):
                 print("[DEBUG] showDataDictionary: Opened data dictionary")
 
     def btnExportCSVPressed(self):
-        if self.mainTable.rowCount() == 0:
+        if self.resultFrame is None or self.resultFrame.rowCount() == 0:
             QMessageBox.warning(self, "Export CSV", "No data to export.")
             if Config.debug:
                 print("[DEBUG] btnExportCSVPressed: No data to export")
@@ -156,17 +163,12 @@ class uiMain(QMainWindow):
                 writer = csv.writer(csvFile)
 
                 # Write headers
-                headers = [self.mainTable.horizontalHeaderItem(c).text() for c in range(self.mainTable.columnCount())]
-                writer.writerow(['Timestamp'] + headers)
+                frame = self.resultFrame
+                writer.writerow(['Timestamp'] + frame.headers())
 
                 # Write data
-                for row in range(self.mainTable.rowCount()):
-                    rowData = [self.mainTable.verticalHeaderItem(row).text()]
-
-                    for col in range(self.mainTable.columnCount()):
-                        item = self.mainTable.item(row, col)
-                        rowData.append(item.text() if item else '')
-                    writer.writerow(rowData)
+                for row, timestamp in enumerate(frame.timestampStrings()):
+                    writer.writerow([timestamp] + [frame.cellText(row, col) for col in range(frame.columnCount())])
             config['lastExportPath'] = os.path.dirname(fileName)
 
             with open(Utils.getConfigPath(), 'w', encoding='utf-8') as configFile:
@@ -203,12 +205,12 @@ class uiMain(QMainWindow):
                 print("[DEBUG] btnRefreshPressed: No previous query to refresh")
 
     def btnUndoPressed(self):
-        if self.mainTable.rowCount() == 0:
+        if self.resultFrame is None or self.resultFrame.rowCount() == 0:
             if Config.debug:
                 print("[DEBUG] btnUndoPressed: No data to sort")
             QMessageBox.information(self, "Undo", "No data to sort.")
             return
-        Query.timestampSortTable(self.mainTable, self.winDataDictionary.mainTable)
+        Query.timestampSortTable(self.mainTable, self.winDataDictionary.mainTable, self.resultFrame)
 
         if Config.debug:
             print("[DEBUG] btnUndoPressed: Called timestampSortTable")
@@ -263,7 +265,17 @@ class uiMain(QMainWindow):
         if Config.debug:
             print("[DEBUG] showCellContextMenu: Displayed menu for cell ({}, {})".format(row, col))
 
+    def btnSQLPressed(self):
+        if self.tabWidget.indexOf(self.tabSQL) == -1:
+            self.tabWidget.addTab(self.tabSQL, 'SQL')
+        self.tabWidget.setCurrentWidget(self.tabSQL)
+
+        if Config.debug:
+            print("[DEBUG] btnSQLPressed: Opened SQL console tab")
+
     def onTabCloseRequested(self, index):
+        if self.tabWidget.widget(index) is self.tabSQL:
+            self.sqlConsole.close()
         self.tabWidget.removeTab(index)
 
         if Config.debug:
@@ -299,14 +311,9 @@ class uiMain(QMainWindow):
 
     def showOverlayCellDetails(self, row, col):
         """Display details for overlay cell."""
-        item = self.mainTable.item(row, col)
-
-        if not item:
-            return
-        data = item.data(Qt.ItemDataRole.UserRole)
-
-        if not data:
+        if self.resultFrame is None or col >= self.resultFrame.columnCount():
             return
+        data = QueryUtils.overlayDetails(self.resultFrame, row, col)
         
         # Set blank logic
         primaryVal = data['primaryVal'] if data['primaryVal'] else "NDA!"
@@ -355,5 +362,8 @@ if __name__ == '__main__':
     # Show main window
     winMain.show()
     
+    # Stop background fetches and close pooled connections on exit
+    app.aboutToQuit.connect(Logic.cleanShutdown)
+
     # Start application
     sys.exit(app.exec())
\ No newline at end of file
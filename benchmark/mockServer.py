@@ -0,0 +1,220 @@
+"""Local stand-in for the provider APIs DataDoctor queries, for benchmarks.
+
+Answers USBR hdb.pl, USGS WaterServices (iv/dv), the USGS OGC daily collection and Aquarius
+GetTimeSeriesCorrectedData. Each response is built from the sample payload in fixtures/ (one
+series in the service's own response format): the sample series is cloned for every requested ID and
+its values repeated over the requested time range, so payloads have the real shape and grow with the query. An optional latency is added before
+every response.
+
+Run on its own with: python benchmark/mockServer.py --port 8765 --latency 0.05
+"""
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+fixtureDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+usbrSteps = {'HR': timedelta(hours=1), 'IN': timedelta(minutes=15), 'DY': timedelta(days=1)}
+nwisSteps = {'iv': timedelta(minutes=15), 'dv': timedelta(days=1)}
+aquariusStep = timedelta(minutes=15)
+ogcPageLimit = 10000
+
+def loadFixture(name):
+    with open(os.path.join(fixtureDir, name), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def methodId(site, param):
+    """NWIS method ID served for a site/parameter; the fixture site keeps its own method."""
+    if site == '09428500':
+        return '210438'
+    return str(100000 + int(hashlib.md5(f"{site}-{param}".encode()).hexdigest()[:8], 16) % 900000)
+
+def timeSeriesId(site, param):
+    """OGC time_series_id served for a site/parameter (32 hex characters, as the service uses)."""
+    return hashlib.md5(f"{site}-{param}".encode()).hexdigest()
+
+def timeRange(start, end, step):
+    times = []
+
+    while start <= end:
+        times.append(start)
+        start += step
+    return times
+
+def parseTime(text):
+    """ISO-ish date-time from a query string ('T' or space separated, optional seconds and 'Z')."""
+    text = text.strip().replace('T', ' ').rstrip('Z')
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d', '%m-%d-%Y'):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized time '{text}'")
+
+def clockText(moment):
+    """hdb.pl style 'M/D/YYYY h:MM:SS AM'."""
+    hour = moment.hour % 12 or 12
+    return f"{moment.month}/{moment.day}/{moment.year} {hour}:{moment.minute:02d}:00 {'AM' if moment.hour < 12 else 'PM'}"
+
+class mockProviders:
+    """Builds provider responses from the fixture samples."""
+    def __init__(self):
+        self.usbr = loadFixture('usbrHdb.json')
+        self.nwis = loadFixture('nwisIv.json')
+        self.ogc = loadFixture('ogcDaily.json')
+        self.aquarius = loadFixture('aquariusCorrectedData.json')
+        self.usbrValues = [point['v'] for point in self.usbr['Series'][0]['Data']]
+        self.nwisValues = [point['value'] for point in self.nwis['value']['timeSeries'][0]['values'][0]['value']]
+        self.ogcValues = [feature['properties']['value'] for feature in self.ogc['features']]
+        self.aquariusValues = [point['Value']['Numeric'] for point in self.aquarius['Points']]
+
+    def hdb(self, query):
+        SDIs = [sdi for sdi in query['SDI'][0].split(',') if sdi]
+        times = timeRange(parseTime(query['t1'][0]), parseTime(query['t2'][0]), usbrSteps.get(query['tstp'][0], timedelta(hours=1)))
+
+        if query.get('format', ['json'])[0] == 'csv':
+            lines = ['Date Time,' + ','.join(f"SDI_{sdi}" for sdi in SDIs)]
+            for i, moment in enumerate(times):
+                value = self.usbrValues[i % len(self.usbrValues)]
+                lines.append(clockText(moment) + ',' + ','.join(value for _ in SDIs))
+            return 'text/csv', '\n'.join(lines).encode()
+        template = self.usbr['Series'][0]
+        series = []
+
+        for sdi in SDIs:
+            entry = dict(template, SDI=sdi)
+            entry['Data'] = [{'t': clockText(moment), 'v': self.usbrValues[i % len(self.usbrValues)]} for i, moment in enumerate(times)]
+            series.append(entry)
+        return 'application/json', json.dumps(dict(self.usbr, Series=series)).encode()
+
+    def waterServices(self, service, query):
+        sites = query['sites'][0].split(',')
+        params = query['parameterCd'][0].split(',')
+        times = timeRange(parseTime(query['startDT'][0]), parseTime(query['endDT'][0]), nwisSteps[service])
+        template = self.nwis['value']['timeSeries'][0]
+        timeSeries = []
+
+        for site in sites:
+            for param in params:
+                points = [{'value': self.nwisValues[i % len(self.nwisValues)], 'qualifiers': ['P'], 'dateTime': moment.strftime('%Y-%m-%dT%H:%M:%S.000-07:00')}
+                          for i, moment in enumerate(times)]
+                entry = dict(template, name=f"USGS:{site}:{param}:00000")
+                entry['sourceInfo'] = dict(template['sourceInfo'], siteCode=[dict(template['sourceInfo']['siteCode'][0], value=site)])
+                entry['variable'] = dict(template['variable'], variableCode=[dict(template['variable']['variableCode'][0], value=param)])
+                entry['values'] = [dict(template['values'][0], value=points, method=[{'methodDescription': '', 'methodID': int(methodId(site, param))}])]
+                timeSeries.append(entry)
+        body = dict(self.nwis, value=dict(self.nwis['value'], timeSeries=timeSeries))
+        return 'application/json', json.dumps(body).encode()
+
+    def ogcDaily(self, url, query):
+        sites = query['monitoring_location_id'][0].split(',')
+        params = query['parameter_code'][0].split(',')
+        startText, endText = query['time'][0].split('/')
+        days = timeRange(parseTime(startText), parseTime(endText), timedelta(days=1))
+        limit = int(query.get('limit', [ogcPageLimit])[0])
+        offset = int(query.get('offset', ['0'])[0])
+        total = len(sites) * len(params) * len(days)
+        template = self.ogc['features'][0]
+        features = []
+
+        # Features are numbered site by site, parameter by parameter, day by day, so any page can be built on its own
+        for index in range(offset, min(offset + limit, total)):
+            siteIndex, rest = divmod(index, len(params) * len(days))
+            paramIndex, dayIndex = divmod(rest, len(days))
+            site, param = sites[siteIndex], params[paramIndex]
+            tsid = timeSeriesId(site.replace('USGS-', ''), param)
+            properties = dict(template['properties'], time_series_id=tsid, monitoring_location_id=site, parameter_code=param,
+                              time=days[dayIndex].strftime('%Y-%m-%d'), value=self.ogcValues[dayIndex % len(self.ogcValues)])
+            features.append(dict(template, id=f"{tsid}-{properties['time']}", properties=properties))
+        links = [dict(self.ogc['links'][0], href=f"{url}?{urlencode({k: v[0] for k, v in query.items()}, safe=',/:')}")]
+
+        if offset + limit < total:
+            nextQuery = {k: v[0] for k, v in query.items()}
+            nextQuery['offset'] = str(offset + limit)
+            links.append({'type': 'application/geo+json', 'rel': 'next', 'title': 'Items (next)', 'href': f"{url}?{urlencode(nextQuery, safe=',/:')}"})
+        body = dict(self.ogc, features=features, numberReturned=len(features), numberMatched=total, links=links)
+        return 'application/json', json.dumps(body).encode()
+
+    def correctedData(self, query):
+        uid = query['TimeSeriesUniqueId'][0]
+        times = timeRange(parseTime(query['QueryFrom'][0]), parseTime(query['QueryTo'][0]), aquariusStep)
+        body = dict(self.aquarius, UniqueId=uid, LocationIdentifier=f"{self.aquarius['LocationIdentifier']}-{uid[:6]}", NumPoints=len(times))
+
+        if query.get('GetParts', [''])[0] == 'MetadataOnly':
+            body.pop('Points', None)
+        else:
+            body['Points'] = [{'Timestamp': moment.strftime('%Y-%m-%dT%H:%M:%S.0000000-07:00'), 'Value': {'Display': str(value), 'Numeric': value}}
+                              for moment, value in zip(times, (self.aquariusValues[i % len(self.aquariusValues)] for i in range(len(times))))]
+        return 'application/json', json.dumps(body).encode()
+
+class mockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # Keep-alive, as the real services allow
+    providers = None
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query, keep_blank_values=True)
+        time.sleep(self.latency)
+
+        try:
+            if parts.path.endswith('/hdb.pl'):
+                contentType, body = self.providers.hdb(query)
+            elif parts.path.startswith('/nwis/'):
+                contentType, body = self.providers.waterServices(parts.path.strip('/').split('/')[1], query)
+            elif parts.path.endswith('/collections/daily/items'):
+                contentType, body = self.providers.ogcDaily(f"http://{self.headers['Host']}{parts.path}", query)
+            elif parts.path.endswith('/GetTimeSeriesCorrectedData'):
+                contentType, body = self.providers.correctedData(query)
+            else:
+                self.reply(404, 'text/plain', b'Not found')
+                return
+        except (KeyError, ValueError) as e:
+            self.reply(400, 'text/plain', str(e).encode())
+            return
+        self.reply(200, contentType, body)
+
+    def do_POST(self):
+        # Aquarius login: any credentials get a session token
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.reply(200, 'application/json', b'"benchmark"')
+
+    def do_DELETE(self):
+        self.reply(204, 'text/plain', b'')
+
+    def reply(self, status, contentType, body):
+        self.send_response(status)
+        self.send_header('Content-Type', contentType)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def start(port=0, latency=0.0):
+    """Serve in a background thread; returns (server, base URL)."""
+    handler = type('handler', (mockHandler,), {'providers': mockProviders(), 'latency': latency})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='mockServer', daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve sample provider payloads for DataDoctor benchmarks.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added before every response')
+    args = parser.parse_args()
+    server, baseUrl = start(args.port, args.latency)
+    print(f"[INFO] Mock providers at {baseUrl} (Ctrl+C to stop)")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,252 @@
+"""End-to-end query benchmark against the local mock providers.
+
+Runs executeQuery headless (offscreen Qt) for each scenario and times its stages:
+  total       executeQuery until the table is built
+  firstColumn executeQuery until the first group's columns are on screen
+  usbr/usgs/aquarius  wall time inside each provider read (fetch and decode together)
+  fetch       HTTP requests, summed over threads
+  decode      payload parsing (hdb.pl split and time decode, OGC pages, point lists), summed over threads
+  gapCheck    placing series on the query grid (TimeSeries.alignToGrid), summed over threads
+  merge       filling result columns as group signals arrive
+  buildTable  model, headers and column sizing (QAQC excluded)
+  qaqc        QAQC checks and cell flags
+
+Summed stages can exceed the total when work runs in parallel. Results go to a JSON file; pass an
+earlier file with --compare to print the change per stage.
+
+python benchmark/runBenchmark.py --latency 0.05 --scale 1 --repeat 3 [--compare benchmark/results/old.json]
+"""
+import os
+import sys
+import json
+import time
+import inspect
+import argparse
+import platform
+import statistics
+import subprocess
+import threading
+from datetime import datetime, timedelta
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+repoDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repoDir)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PyQt6.QtCore import QCoreApplication
+from PyQt6.QtGui import QPalette
+from PyQt6.QtWidgets import QApplication
+import mockServer
+
+class stageTimer:
+    """Accumulates wall time per stage from wrapped functions, across threads."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.seconds = {}
+            self.calls = {}
+            self.marks = {}
+
+    def add(self, stage, seconds):
+        with self.lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def mark(self, name):
+        """Record the first time name happens in this run."""
+        with self.lock:
+            self.marks.setdefault(name, time.perf_counter())
+
+    def wrap(self, owner, name, stage, markName=None):
+        original = inspect.getattr_static(owner, name)
+        isDescriptor = isinstance(original, (classmethod, staticmethod))
+        func = original.__func__ if isDescriptor else original
+        timer = self
+
+        def timed(*args, **kwargs):
+            startTime = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timer.add(stage, time.perf_counter() - startTime)
+                if markName:
+                    timer.mark(markName)
+        setattr(owner, name, type(original)(timed) if isDescriptor else timed)
+
+def gitVersion():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=repoDir, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def quickLookItems(name):
+    """Items of a shipped quick look, as uiQuery builds them."""
+    from core import Planner
+    with open(os.path.join(repoDir, 'quickLook', f'{name}.txt'), 'r', encoding='utf-8-sig') as f:
+        content = f.read().strip()
+    items = []
+
+    for itemText in (content.split(',') if ',' in content else content.splitlines()):
+        parts = itemText.strip().split('|')
+        if len(parts) != 3:
+            continue
+        dataID, interval, database = parts
+        interval = Planner.resolveInterval(interval, database)
+        mrid = dataID.rsplit('-', 1)[1] if database.startswith('USBR-') and '-' in dataID else '0'
+        items.append((dataID, interval, database, mrid))
+    return items
+
+def scenarios(scale):
+    """name -> (items, days). scale multiplies both the number of series and the span."""
+    count = lambda n: max(1, round(n * scale))
+    span = lambda days: max(1, round(days * scale))
+    usbr = [(str(2000 + i), 'HOUR', 'USBR-LCHDB', '0') for i in range(count(60))]
+    nwis = [(f"{9400000 + i:08d}-{mockServer.methodId(f'{9400000 + i:08d}', '00060')}-60", 'INSTANT:15', 'USGS-NWIS', '0') for i in range(count(10))]
+    ogc = [(f"{9400000 + i:08d}-{mockServer.timeSeriesId(f'{9400000 + i:08d}', '00060')}-60", 'DAY', 'USGS-NWIS', '0') for i in range(count(20))]
+    aquarius = [(mockServer.timeSeriesId('aquarius', str(i)), 'HOUR', 'AQUARIUS', '0') for i in range(count(10))]
+    return {
+        'usbrHour': (usbr, span(90)),
+        'nwisInstant': (nwis, span(14)),
+        'ogcDaily': (ogc, span(3650)),
+        'aquariusHour': (aquarius, span(90)),
+        'mixedHour': (usbr + aquarius + [(dataID, 'HOUR', db, mrid) for dataID, _, db, mrid in nwis], span(30)),
+        'quickLookHdbUsgs': (quickLookItems('Data Check (HDB & USGS)'), span(30)),
+    }
+
+def pointProviders(baseUrl):
+    """Send every provider to the mock server."""
+    from core import USBR, USGS, Aquarius
+    USBR.baseUrl = f"{baseUrl}/pn-bin/hdb/hdb.pl"
+    USGS.nwisBaseUrl = f"{baseUrl}/nwis/"
+    USGS.ogcBaseUrl = f"{baseUrl}/ogcapi/v0/collections/daily/items"
+
+    # Aquarius takes its server from the keyring at login; start with a live session on the mock instead
+    Aquarius.tokens.server = baseUrl
+    Aquarius.tokens.token = 'benchmark'
+    Aquarius.tokens.verifyMode = True
+
+def instrument(timer):
+    from core import Http, USBR, USGS, Aquarius, TimeSeries, Query
+    timer.wrap(Http, 'request', 'fetch')
+    for name in ['splitJson', 'splitCsv', 'decodeTimes']:
+        timer.wrap(USBR, name, 'decode')
+    timer.wrap(USGS.ogcReader, 'addPage', 'decode')
+    timer.wrap(TimeSeries.timeSeries, 'fromPoints', 'decode')
+    timer.wrap(TimeSeries, 'alignToGrid', 'gapCheck')
+    timer.wrap(USBR, 'read', 'usbr')
+    timer.wrap(USGS, 'apiRead', 'usgs')
+    timer.wrap(Aquarius, 'apiRead', 'aquarius')
+    timer.wrap(Query.queryController, 'handleResult', 'merge', markName='firstColumn')
+    timer.wrap(Query, 'buildTable', 'buildTable')
+    timer.wrap(Query, 'qaqc', 'qaqc')
+
+def runOnce(window, dataDictionaryTable, items, days, timer):
+    from core import Query
+    end = datetime(2025, 1, 1)
+    start = end - timedelta(days=days)
+    queryItems = [(dataID, interval, db, mrid, i) for i, (dataID, interval, db, mrid) in enumerate(items)]
+    timer.reset()
+    startTime = time.perf_counter()
+    controller = Query.executeQuery(window, queryItems, start.strftime('%Y-%m-%d %H:%M'), end.strftime('%Y-%m-%d %H:%M'), True, dataDictionaryTable)
+
+    while controller is not None and not controller.done:
+        QCoreApplication.processEvents()
+        time.sleep(0.001)
+    total = time.perf_counter() - startTime
+    stages = {stage: {'seconds': round(seconds, 6), 'calls': timer.calls[stage]} for stage, seconds in timer.seconds.items()}
+
+    # buildTable runs qaqc inside it; report the two apart
+    if 'buildTable' in stages and 'qaqc' in stages:
+        stages['buildTable']['seconds'] = round(stages['buildTable']['seconds'] - stages['qaqc']['seconds'], 6)
+    stages['total'] = {'seconds': round(total, 6), 'calls': 1}
+    if 'firstColumn' in timer.marks:
+        stages['firstColumn'] = {'seconds': round(timer.marks['firstColumn'] - startTime, 6), 'calls': 1}
+    frame = window.resultFrame
+    return stages, (frame.rowCount(), frame.columnCount(), int((~frame.mask).sum())) if frame is not None else (0, 0, 0)
+
+def summarize(runs):
+    stages = sorted({stage for run in runs for stage in run})
+    return {stage: round(statistics.median(run[stage]['seconds'] if stage in run else 0.0 for run in runs), 6) for stage in stages}
+
+def compare(previousPath, results):
+    with open(previousPath, 'r', encoding='utf-8') as f:
+        previous = json.load(f)
+    print(f"\nChange from {previous.get('version', '?')} ({previousPath}), median seconds:")
+    previousScenarios = {scenario['name']: scenario for scenario in previous.get('scenarios', [])}
+
+    for scenario in results['scenarios']:
+        old = previousScenarios.get(scenario['name'])
+        if old is None:
+            continue
+        print(f"  {scenario['name']}")
+        for stage, seconds in scenario['median'].items():
+            oldSeconds = old['median'].get(stage)
+            if oldSeconds:
+                print(f"    {stage:<12} {oldSeconds:>10.4f} -> {seconds:>10.4f}  ({(seconds - oldSeconds) / oldSeconds:+.1%})")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark DataDoctor queries against local mock providers.')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds the mock adds before every response')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiplier on series counts and query spans')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per scenario; medians are reported')
+    parser.add_argument('--scenario', action='append', help='Run only these scenarios (repeatable)')
+    parser.add_argument('--format', choices=['json', 'csv'], default='json', help='hdb.pl response format')
+    parser.add_argument('--output', help='Results file (default benchmark/results/<version>-<time>.json)')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    from core import Config, Utils, Scheduler
+    import DataDoctor
+    from ui.uiDataDictionary import uiDataDictionary
+    Config.systemTextColor = app.palette().color(QPalette.ColorRole.Text)
+    window = DataDoctor.uiMain()
+    window.winDataDictionary = uiDataDictionary(window)
+    Utils.loadDataDictionary(window.winDataDictionary.mainTable)
+
+    # Measure fetching, not the cache or the SQL path, and never stop for the large-query prompt
+    Config.debug = False
+    Config.cacheEnabled = False
+    Config.usbrBackend = 'api'
+    Config.usbrFormat = args.format
+    Config.qaqcEnabled = True
+    Config.planConfirmPoints = Config.planConfirmRows = float('inf')
+    server, baseUrl = mockServer.start(latency=args.latency)
+    pointProviders(baseUrl)
+    timer = stageTimer()
+    instrument(timer)
+    selected = scenarios(args.scale)
+    names = args.scenario or list(selected)
+    results = {'version': gitVersion(), 'createdAt': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+               'platform': platform.platform(), 'settings': {'latency': args.latency, 'scale': args.scale, 'repeat': args.repeat, 'format': args.format,
+               'schedulerMaxWorkers': Config.schedulerMaxWorkers, 'httpMaxConnections': Config.httpMaxConnections}, 'scenarios': []}
+
+    for name in names:
+        items, days = selected[name]
+        runs = []
+
+        for _ in range(args.repeat):
+            stages, (rows, columns, points) = runOnce(window, window.winDataDictionary.mainTable, items, days, timer)
+            runs.append(stages)
+        median = summarize(runs)
+        results['scenarios'].append({'name': name, 'items': len(items), 'days': days, 'rows': rows, 'columns': columns, 'points': points,
+                                     'median': median, 'runs': runs})
+        print(f"[INFO] {name}: {len(items)} series x {rows:,} rows, {points:,} points, total {median['total']:.3f} s, "
+              f"first column {median.get('firstColumn', 0):.3f} s")
+    server.shutdown()
+    output = args.output or os.path.join(repoDir, 'benchmark', 'results', f"{results['version']}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"[INFO] Results written to {output}")
+
+    if args.compare:
+        compare(args.compare, results)
+    Scheduler.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -2,15 +2,155 @@ import requests
 import json
 import keyring
 import os
+import time
 import threading
-import queue
-from core import Logic, Config
+from core import Http, Scheduler, Logic, Config, TimeSeries
 from datetime import datetime, timedelta
 
-queryLimit = 500 # Configurable max points per API call
-maxThreads = 15 # Configurable max number of threads
+queryLimit = 500 # Smallest chunk, in points per API call; chunkPlanner grows it from observed throughput
+
+class tokenManager:
+    """Aquarius session token shared by all queries and threads; remembers which SSL verify mode worked."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.server = None
+        self.token = None
+        self.verifyMode = None
+
+    def getToken(self):
+        """Return (server, token), authenticating if there is no live token."""
+        with self.lock:
+            if not self.token:
+                self.authenticate()
+            return self.server, self.token
+
+    def authenticate(self):
+        # Fetch creds right before auth, use, then clear
+        server = keyring.get_password("DataDoctor", "aqServer") or ''
+        user = keyring.get_password("DataDoctor", "aqUser") or ''
+        password = keyring.get_password("DataDoctor", "aqPassword") or ''
+
+        if not server or not user or not password:
+            print("[ERROR] Missing Aquarius credentials.")
+            return
+        authData = {'Username': user, 'EncryptedPassword': password}
+        certPath = Logic.resourcePath('certs/aquarius.pem')
+        attempts = ['system', 'custom_cert', 'unverified']
+
+        # Try the verify mode that worked last time first
+        if self.verifyMode is not None:
+            attempts.insert(0, 'remembered')
+
+        for attempt in attempts:
+            try:
+                if attempt == 'custom_cert' and not os.path.exists(certPath):
+                    if Config.debug:
+                        print("[DEBUG] No certificate found at '{}', skipping to unverified.".format(certPath))
+                    continue
+
+                verifyMode = self.verifyMode if attempt == 'remembered' else certPath if attempt == 'custom_cert' else False if attempt == 'unverified' else True
+                authResponse = Http.post(f'{server}/AQUARIUS/Provisioning/v1/session', data=authData, verify=verifyMode)
+                authResponse.raise_for_status()
+
+                if Config.debug:
+                    print(f"[DEBUG] Authentication succeeded with verify={verifyMode}")
+                if verifyMode is False and Config.debug:
+                    print("[WARN] SSL verification disabled due to cert issues. Add 'aquarius.pem' to 'certs' folder or system trust store for secure connection.")
+                break
+            except requests.exceptions.SSLError as e:
+                if Config.debug:
+                    print(f"[DEBUG] SSL error with verify={verifyMode}: {e}")
+                continue
+            except requests.exceptions.RequestException as e:
+                print(f"[ERROR] Authentication failed: {e}")
+                return
+        else:
+            print("[ERROR] Aquarius authentication failed after all attempts.")
+            return
+        self.server = server
+        self.token = authResponse.text.strip('"')
+        self.verifyMode = verifyMode
+
+    def invalidate(self, token):
+        """Drop a rejected token; only the first thread to see the 401 clears it."""
+        with self.lock:
+            if self.token == token:
+                self.token = None
+
+    def get(self, url, cancel=None):
+        """GET with the session token, re-authenticating once if the server answers 401."""
+        server, token = self.getToken()
+        response = Http.get(url, headers={'X-Authentication-Token': token or ''}, verify=self.verifyMode, cancel=cancel)
+
+        if response.status_code == 401:
+            if Config.debug:
+                print("[DEBUG] Aquarius token rejected (401), re-authenticating")
+            self.invalidate(token)
+            server, token = self.getToken()
+
+            if token:
+                response = Http.get(url, headers={'X-Authentication-Token': token}, verify=self.verifyMode, cancel=cancel)
+        return response
+
+    def logout(self):
+        """Delete the server-side session and forget the token (shutdown or credential change)."""
+        with self.lock:
+            if self.token:
+                try:
+                    Http.request('DELETE', f'{self.server}/AQUARIUS/Provisioning/v1/session',
+                                 headers={'X-Authentication-Token': self.token}, verify=self.verifyMode, timeout=5)
+                    if Config.debug:
+                        print("[DEBUG] Aquarius session closed")
+                except requests.exceptions.RequestException as e:
+                    if Config.debug:
+                        print(f"[DEBUG] Aquarius logout failed: {e}")
+            self.server = None
+            self.token = None
+
+tokens = tokenManager()
+
+class chunkPlanner:
+    """Chunk size for point requests, adapted from observed throughput and payload size."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pointsPerChunk = 4 * queryLimit
+
+    def observe(self, numPoints, seconds, numBytes):
+        """Resize chunks so a full one takes about aquariusTargetSeconds and stays under aquariusMaxChunkBytes."""
+        if numPoints < self.pointsPerChunk // 2 or seconds <= 0:
+            return # Partial chunks say little about what a full one costs
+        bySpeed = numPoints / seconds * Config.aquariusTargetSeconds
+        bySize = numPoints / max(numBytes, 1) * Config.aquariusMaxChunkBytes
+        target = max(queryLimit, min(bySpeed, bySize, Config.aquariusMaxChunkPoints))
+
+        with self.lock:
+            # Smooth so one slow response doesn't collapse the chunk size
+            self.pointsPerChunk = int(0.7 * self.pointsPerChunk + 0.3 * target)
+
+        if Config.debug:
+            print(f"[DEBUG] chunkPlanner: {numPoints} points in {seconds:.2f}s ({numBytes} bytes), chunk size now {self.pointsPerChunk}")
 
-def apiRead(dataIDs, startDate, endDate, interval):
+planner = chunkPlanner()
+
+def planChunks(startDateTime, endDateTime, numPoints, pointsPerChunk):
+    """Split [start, end] into (start, end) strings holding about pointsPerChunk points each; none if the series is empty."""
+    if numPoints <= 0:
+        return []
+    numChunks = max(1, -(-numPoints // pointsPerChunk))
+
+    # Fold a small remainder into the previous chunk instead of sending a tiny request
+    if numChunks > 1 and numPoints - (numChunks - 1) * pointsPerChunk < pointsPerChunk // 4:
+        numChunks -= 1
+    chunkDuration = (endDateTime - startDateTime) / numChunks
+    subRanges = []
+
+    for i in range(numChunks):
+        subStart = startDateTime + i * chunkDuration
+        subEnd = subStart + chunkDuration if i < numChunks - 1 else endDateTime
+        subRanges.append((subStart.strftime('%Y-%m-%d %H:%M'), subEnd.strftime('%Y-%m-%d %H:%M')))
+    return subRanges
+
+def apiRead(dataIDs, startDate, endDate, interval, cancel=None):
     if Config.debug:
         print("[DEBUG] Aquarius.apiRead called with dataIDs: {}, interval: {}, start: {}, end: {}".format(dataIDs, interval, startDate, endDate))
 
@@ -53,55 +193,15 @@ def apiRead(dataIDs, startDate, endDate, interval):
     startDate = f'{startDateTime.year}-{startMonth}-{startDay} {startHour}:{startMinute}'
     endDate = f'{endDateTime.year}-{endMonth}-{endDay} {endHour}:{endMinute}'
 
-    # Fetch creds right before auth, use, then clear
-    server = keyring.get_password("DataDoctor", "aqServer") or ''
-    user = keyring.get_password("DataDoctor", "aqUser") or ''
-    password = keyring.get_password("DataDoctor", "aqPassword") or ''
+    # Reuse the cached session token; authenticates only on first use or after a 401
+    server, token = tokens.getToken()
 
-    if not server or not user or not password:
-        print("[ERROR] Missing Aquarius credentials.")
-        return {uid: {'data': [], 'label': uid} for uid in dataIDs}
+    # No token or interval means nothing was read; returning no UIDs lets the query report them as failed, not blank
+    if not token:
+        print(f"[ERROR] Aquarius read skipped for {len(dataIDs)} UIDs: not signed in")
+        return {}
 
-    # Authenticate session with fallback for SSL verification
-    authData = {'Username': user, 'EncryptedPassword': password}
-    certPath = Logic.resourcePath('certs/aquarius.pem')
-    verifyMode = True
-
-    for attempt in ['system', 'custom_cert', 'unverified']:
-        try:
-            if attempt == 'custom_cert' and not os.path.exists(certPath):
-                if Config.debug:
-                    print("[DEBUG] No certificate found at '{}', skipping to unverified.".format(certPath))
-                continue
-
-            verifyMode = certPath if attempt == 'custom_cert' else False if attempt == 'unverified' else True
-            authResponse = requests.post(f'{server}/AQUARIUS/Provisioning/v1/session', data=authData, verify=verifyMode)
-            authResponse.raise_for_status()
-
-            if Config.debug:
-                print(f"[DEBUG] Authentication succeeded with verify={verifyMode}")
-            if attempt == 'unverified' and Config.debug:
-                print("[WARN] SSL verification disabled due to cert issues. Add 'aquarius.pem' to 'certs' folder or system trust store for secure connection.")
-            break
-        except requests.exceptions.SSLError as e:
-            if Config.debug:
-                print(f"[DEBUG] SSL error with verify={verifyMode}: {e}")
-            continue
-        except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Authentication failed: {e}")
-            return {uid: {'data': [], 'label': uid} for uid in dataIDs}
-    else:
-        print("[ERROR] Aquarius authentication failed after all attempts.")
-        return {uid: {'data': [], 'label': uid} for uid in dataIDs}
-
-    token = authResponse.text.strip('"')
-    headers = {'X-Authentication-Token': token}
-
-    # Clear creds immediately after use
-    user = None
-    password = None
-
-    # Calculate total points
+    # Expected points on the interval grid; used when the server can't tell us NumPoints
     totalDuration = endDateTime - startDateTime
     
     if interval == 'HOUR':
@@ -113,39 +213,46 @@ def apiRead(dataIDs, startDate, endDate, interval):
         delta = timedelta(days=1)
     else:
         print(f"[ERROR] Unsupported interval: {interval}")
-        return {uid: {'data': [], 'label': uid} for uid in dataIDs}
+        return {}
     totalPoints = int(totalDuration.total_seconds() / delta.total_seconds()) + 1
-    numChunks = (totalPoints + queryLimit - 1) // queryLimit
-
-    if Config.debug:
-        print(f"[DEBUG] Estimated {totalPoints} points, splitting into {numChunks} chunks of ~{queryLimit} points each")
+    pointsPerChunk = planner.pointsPerChunk
+    labels = {}
+
+    # Probe NumPoints per UID only when the grid estimate would need more than one chunk
+    if totalPoints > pointsPerChunk:
+        def probeTask(uid):
+            response = tokens.get(
+                f'{server}/AQUARIUS/Publish/v2/GetTimeSeriesCorrectedData?TimeSeriesUniqueId={uid}&QueryFrom={startDate}&QueryTo={endDate}&utcOffset={offsetHours}&GetParts=MetadataOnly&format=json', cancel
+            )
+            readFile = json.loads(response.content)
+            return uid, readFile.get('NumPoints'), f"{readFile.get('Label', '')} \n{readFile.get('LocationIdentifier', uid)}"
+        probeFutures = [Scheduler.submit(server, probeTask, uid) for uid in dataIDs]
+        numPoints = {}
 
-    # Generate sub-ranges
-    subRanges = []
-    chunkDuration = totalDuration / numChunks
+        for probeResult in Scheduler.results(probeFutures, cancel):
+            if probeResult is not None and probeResult[1] is not None:
+                uid, numPoints[uid], labels[uid] = probeResult
+    else:
+        numPoints = {}
+    subRanges = {}
 
-    for i in range(numChunks):
-        subStart = startDateTime + i * chunkDuration
-        subEnd = subStart + chunkDuration if i < numChunks - 1 else endDateTime
-        subStartStr = subStart.strftime('%Y-%m-%d %H:%M')
-        subEndStr = subEnd.strftime('%Y-%m-%d %H:%M')
-        subRanges.append((subStartStr, subEndStr))
+    for uid in dataIDs:
+        uidPoints = numPoints.get(uid, totalPoints)
+        subRanges[uid] = planChunks(startDateTime, endDateTime, uidPoints, pointsPerChunk)
 
-    if Config.debug:
-        print(f"[DEBUG] Generated {len(subRanges)} sub-ranges: {[(s, e) for s, e in subRanges[:3]]}")
+        if Config.debug:
+            print(f"[DEBUG] UID {uid}: {uidPoints} points ({'probed' if uid in numPoints else 'estimated'}), {len(subRanges[uid])} chunks of up to {pointsPerChunk} points")
 
-    # Threading setup
-    resultQueue = queue.Queue()
-    tasks = [(uid, subStart, subEnd) for uid in dataIDs for subStart, subEnd in subRanges]
+    # One scheduler task per (UID, sub-range); concurrency is bounded by the server's host budget
+    tasks = [(uid, subStart, subEnd) for uid in dataIDs for subStart, subEnd in subRanges[uid]]
     numTasks = len(tasks)
-    numThreads = min(maxThreads, numTasks)
 
     if Config.debug:
-        print(f"[DEBUG] Created {numTasks} tasks for {len(dataIDs)} UIDs across {len(subRanges)} sub-ranges, using {numThreads} threads")
+        print(f"[DEBUG] Created {numTasks} tasks for {len(dataIDs)} UIDs")
 
-    def queryTask(uid, subStart, subEnd, threadId):
+    def queryTask(uid, subStart, subEnd):
         if Config.debug:
-            print(f"[DEBUG] Thread {threadId} processing task for UID {uid}, range {subStart} to {subEnd}")
+            print(f"[DEBUG] Processing task for UID {uid}, range {subStart} to {subEnd}")
         subStartDt = datetime.strptime(subStart, '%Y-%m-%d %H:%M')
         subEndDt = datetime.strptime(subEnd, '%Y-%m-%d %H:%M')
         subStartYear = subStartDt.year
@@ -160,17 +267,16 @@ def apiRead(dataIDs, startDate, endDate, interval):
         subEndMinute = f'{subEndDt.minute:02d}'
         subStartStr = f'{subStartYear}-{subStartMonth}-{subStartDay} {subStartHour}:{subStartMinute}'
         subEndStr = f'{subEndYear}-{subEndMonth}-{subEndDay} {subEndHour}:{subEndMinute}'
-        response = requests.get(
-            f'{server}/AQUARIUS/Publish/v2/GetTimeSeriesCorrectedData?TimeSeriesUniqueId={uid}&QueryFrom={subStartStr}&QueryTo={subEndStr}&utcOffset={offsetHours}&GetParts=PointsOnly&format=json',
-            headers=headers, verify=verifyMode
+        requestStart = time.perf_counter()
+        response = tokens.get(
+            f'{server}/AQUARIUS/Publish/v2/GetTimeSeriesCorrectedData?TimeSeriesUniqueId={uid}&QueryFrom={subStartStr}&QueryTo={subEndStr}&utcOffset={offsetHours}&GetParts=PointsOnly&format=json', cancel
         )
 
         try:
             readFile = json.loads(response.content)
+            planner.observe(len(readFile['Points']), time.perf_counter() - requestStart, len(response.content))
         except Exception as e:
-            print(f"[WARN] Aquarius fetch failed for UID '{uid}' in thread {threadId}, range {subStart} to {subEnd}: {e}")
-            resultQueue.put((uid, {'data': [], 'label': uid}))
-            return
+            raise ValueError(f"Aquarius fetch failed for UID '{uid}', range {subStart} to {subEnd}: {e}") from e
 
         location = readFile.get('LocationIdentifier', uid)
         label = readFile.get('Label', '')
@@ -178,67 +284,54 @@ def apiRead(dataIDs, startDate, endDate, interval):
         points = readFile['Points']
 
         if Config.debug:
-            print(f"[DEBUG] Thread {threadId} fetched {len(points)} points for UID '{uid}', range {subStart} to {subEnd}")
+            print(f"[DEBUG] Fetched {len(points)} points for UID '{uid}', range {subStart} to {subEnd}")
         outputData = []
 
         for point in points:
             date = point['Timestamp']
             parseDate = date.split('T')
             parseDate[1] = parseDate[1].split('.')[0]
-            dateTime = datetime.fromisoformat(f'{parseDate[0]} {parseDate[1]}')
-            formattedTs = dateTime.strftime('%m/%d/%y %H:%M:00')
+            dateTime = datetime.fromisoformat(f'{parseDate[0]} {parseDate[1]}').replace(second=0, tzinfo=None)
             value = point['Value'].get('Numeric', None)
 
             if value is not None:
-                outputData.append(f'{formattedTs},{value}')
-        resultQueue.put((uid, {'data': outputData, 'label': fullLabel}))
+                outputData.append((TimeSeries.toEpoch(dateTime), TimeSeries.toFloat(value)))
 
         if Config.debug:
-            print(f"[DEBUG] Thread {threadId} completed task for UID {uid} with {len(outputData)} points")
+            print(f"[DEBUG] Completed task for UID {uid} with {len(outputData)} points")
+        return uid, {'data': outputData, 'label': fullLabel}
             
-    # Start threads
-    taskQueue = queue.Queue()
-    for task in tasks: taskQueue.put(task)
-    threads = []
-
-    def worker(threadId):
-        while True:
-            try:
-                uid, subStart, subEnd = taskQueue.get_nowait()
-                queryTask(uid, subStart, subEnd, threadId)
-                taskQueue.task_done()
-            except queue.Empty:
-                if Config.debug:
-                    print(f"[DEBUG] Thread {threadId} found no more tasks")
-                break
-    for i in range(numThreads):
-        t = threading.Thread(target=worker, args=(i,))
-        threads.append(t)
-        t.start()
-
-        if Config.debug:
-            print(f"[DEBUG] Started thread {i} for task processing")
-    for t in threads:
-        t.join()
-
-        if Config.debug:
-            print(f"[DEBUG] Thread {threads.index(t)} joined")
+    futures = [Scheduler.submit(server, queryTask, uid, subStart, subEnd) for uid, subStart, subEnd in tasks]
     result = {}
+    failed = set()
 
-    while not resultQueue.empty():
-        uid, data = resultQueue.get()
+    for (taskUid, _, _), taskResult in zip(tasks, Scheduler.results(futures, cancel)):
+        if taskResult is None:
+            failed.add(taskUid)
+            continue
+        uid, data = taskResult
         if uid in result:
             result[uid]['data'].extend(data['data'])
             result[uid]['label'] = data['label']
         else:
             result[uid] = data
+
+    # A UID with a missing chunk would show a silent gap (and be cached as complete), so it is left out as failed
+    for uid in failed:
+        result.pop(uid, None)
+        print(f"[ERROR] Aquarius fetch failed for UID '{uid}'; a chunk did not download")
     for uid in result:
-        result[uid]['data'].sort(key=lambda x: datetime.strptime(x.split(',')[0], '%m/%d/%y %H:%M:00'))
+        result[uid] = TimeSeries.timeSeries.fromPoints(result[uid]['data'], result[uid]['label']).sortByTime()
+
+    # Series the probe found empty get no chunk requests, but keep their label
+    for uid, label in labels.items():
+        if uid not in result and uid not in failed:
+            result[uid] = TimeSeries.timeSeries(label=label)
     if Config.debug:
         print(f"[DEBUG] Combined results from {numTasks} tasks with {len(result)} UIDs")
     for uid in dataIDs:
-        if uid not in result:
-            result[uid] = {'data': [], 'label': uid}
+        if uid not in result and uid not in failed:
+            result[uid] = TimeSeries.timeSeries(label=uid)
 
             if Config.debug:
                 print(f"[DEBUG] Added empty result for UID {uid}")
@@ -0,0 +1,177 @@
+import os
+import hashlib
+import threading
+import numpy as np
+from datetime import datetime
+from concurrent.futures import Future
+from core import Config, Utils, TimeSeries
+
+cacheLock = threading.Lock()
+inFlight = {} # (cache key, start, end) -> Future of the series another thread is fetching right now
+inFlightLock = threading.Lock()
+
+def getCacheDir():
+    cacheDir = os.path.join(Utils.getConfigDir(), "cache")
+
+    if not os.path.exists(cacheDir):
+        os.makedirs(cacheDir, exist_ok=True)
+    return cacheDir
+
+def cacheKey(database, dataID, mrid, interval):
+    """Key a series by source and by the settings that change its timestamps."""
+    return f"{database}|{dataID}|{mrid}|{interval}|{Config.periodOffset}|{Config.utcOffset}"
+
+def cachePath(key):
+    return os.path.join(getCacheDir(), hashlib.sha1(key.encode('utf-8')).hexdigest() + '.npz')
+
+def loadEntry(key):
+    """Return (times, values, ranges, label) for a key, or empty arrays if not cached."""
+    path = cachePath(key)
+
+    if os.path.exists(path):
+        try:
+            with np.load(path) as entry:
+                return entry['times'], entry['values'], entry['ranges'], str(entry['label']) or None
+        except Exception as e:
+            print(f"[WARN] Cache entry unreadable, discarding {path}: {e}")
+    return np.array([], dtype=np.int64), np.array([], dtype=np.float64), np.empty((0, 2), dtype=np.int64), None
+
+def saveEntry(key, times, values, ranges, label):
+    path = cachePath(key)
+    tmpPath = path + '.tmp'
+
+    with open(tmpPath, 'wb') as f:
+        np.savez(f, times=times, values=values, ranges=ranges, label=np.array(label or ''))
+    os.replace(tmpPath, path)
+
+def mergeRanges(ranges):
+    """Union of [start, end) epoch ranges, sorted."""
+    merged = []
+
+    for start, end in sorted(ranges.tolist() if isinstance(ranges, np.ndarray) else ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return np.array(merged, dtype=np.int64).reshape(-1, 2)
+
+def missingRanges(ranges, start, end):
+    """Parts of [start, end) not covered by cached ranges, always including the recent tail."""
+    cutoff = TimeSeries.toEpoch(datetime.now()) - int(Config.cacheRecentHours * 3600)
+    cutoff -= cutoff % 3600
+    missing = []
+    cursor = start
+
+    for rangeStart, rangeEnd in mergeRanges(ranges).tolist():
+        rangeEnd = min(rangeEnd, cutoff)
+        if rangeEnd <= cursor or rangeStart >= end:
+            continue
+        if rangeStart > cursor:
+            missing.append((cursor, rangeStart))
+        cursor = max(cursor, rangeEnd)
+    if cursor < end:
+        missing.append((cursor, end))
+    return missing
+
+def store(key, series, start, end):
+    """Merge freshly fetched points for [start, end) into the cache entry."""
+    with cacheLock:
+        times, values, ranges, label = loadEntry(key)
+        keep = ((times < start) | (times >= end)) & ~np.isin(times, series.times)
+        newTimes = np.concatenate([times[keep], series.times])
+        newValues = np.concatenate([values[keep], series.values])
+        order = np.argsort(newTimes, kind='stable')
+        ranges = mergeRanges(np.vstack([ranges, [[start, end]]]))
+        saveEntry(key, newTimes[order], newValues[order], ranges, series.label or label)
+
+def read(key, start, end):
+    times, values, _, label = loadEntry(key)
+    inRange = (times >= start) & (times < end)
+    return TimeSeries.timeSeries(times[inRange], values[inRange], label)
+
+def sharedFetch(database, dataIDs, interval, mrid, startDate, endDate, fetch):
+    """fetch(ids, startDate, endDate) for IDs nobody else is fetching; IDs already in flight for the same range wait for that result.
+
+    Our own results are published before we wait on anyone else's, so two overlapping callers cannot deadlock.
+    """
+    own = {}
+    waiting = {}
+
+    with inFlightLock:
+        for dataID in dict.fromkeys(dataIDs):
+            key = (cacheKey(database, dataID, mrid, interval), startDate, endDate)
+            if key in inFlight:
+                waiting[dataID] = inFlight[key]
+            else:
+                own[dataID] = (key, Future())
+                inFlight[key] = own[dataID][1]
+    if Config.debug and waiting:
+        print(f"[DEBUG] Cache.sharedFetch: {database} joining {len(waiting)} in-flight requests, fetching {len(own)}")
+    result = {}
+
+    try:
+        if own:
+            result = fetch(list(own), startDate, endDate) or {}
+    finally:
+        with inFlightLock:
+            for dataID, (key, future) in own.items():
+                inFlight.pop(key, None)
+                future.set_result(result.get(dataID))
+    for dataID, future in waiting.items():
+        series = future.result()
+        if series is not None:
+            result[dataID] = series
+    return result
+
+def cachedRead(database, dataIDs, interval, mrid, startDate, endDate, fetch):
+    """Serve dataIDs from the cache, calling fetch(ids, startDate, endDate) only for missing ranges.
+
+    fetch leaves out IDs whose download failed or came back incomplete. Nothing is cached for them and they are
+    left out of the result too, as they are with the cache off, so the caller can tell them from IDs with no data.
+    """
+    if not Config.cacheEnabled:
+        return sharedFetch(database, dataIDs, interval, mrid, startDate, endDate, fetch)
+    start = TimeSeries.toEpoch(datetime.strptime(startDate, '%Y-%m-%d %H:%M'))
+    end = TimeSeries.toEpoch(datetime.strptime(endDate, '%Y-%m-%d %H:%M'))
+
+    # Group IDs that are missing the same ranges so each range is one provider call
+    pending = {}
+
+    for dataID in dataIDs:
+        key = cacheKey(database, dataID, mrid, interval)
+        with cacheLock:
+            ranges = loadEntry(key)[2]
+        for rangeStart, rangeEnd in missingRanges(ranges, start, end):
+            pending.setdefault((rangeStart, rangeEnd), []).append(dataID)
+    if Config.debug:
+        print(f"[DEBUG] Cache.cachedRead: {database} {len(dataIDs)} IDs, missing ranges: {[(TimeSeries.formatEpochs([s])[0], TimeSeries.formatEpochs([e])[0], len(ids)) for (s, e), ids in pending.items()]}")
+
+    failed = set()
+
+    for (rangeStart, rangeEnd), ids in pending.items():
+        rangeStartStr = TimeSeries.fromEpoch(rangeStart).strftime('%Y-%m-%d %H:%M')
+        rangeEndStr = TimeSeries.fromEpoch(rangeEnd).strftime('%Y-%m-%d %H:%M')
+        result = sharedFetch(database, ids, interval, mrid, rangeStartStr, rangeEndStr, fetch)
+
+        for dataID in ids:
+            series = result.get(dataID)
+
+            # A failed fetch must not mark the range covered, or the hole would never be fetched again
+            if series is None:
+                failed.add(dataID)
+                print(f"[WARN] Fetch failed for {dataID} in {rangeStartStr} to {rangeEndStr}, not cached")
+
+            # Empty answers may be failures; leave the range uncovered so it is retried
+            elif len(series):
+                store(cacheKey(database, dataID, mrid, interval), series, rangeStart, rangeEnd)
+            elif Config.debug:
+                print(f"[DEBUG] Cache.cachedRead: No data for {dataID} in {rangeStartStr} to {rangeEndStr}, not cached")
+    return {dataID: read(cacheKey(database, dataID, mrid, interval), start, end) for dataID in dataIDs if dataID not in failed}
+
+def clear():
+    with cacheLock:
+        for file in os.listdir(getCacheDir()):
+            if file.endswith('.npz'):
+                os.remove(os.path.join(getCacheDir(), file))
+    if Config.debug:
+        print("[DEBUG] Cache.clear: Removed all cached series")
@@ -11,4 +11,25 @@ sortState = {}
 appRoot = ""
 deltaChecked = False
 overlayChecked = False
-systemTextColor = ""
\ No newline at end of file
+systemTextColor = ""
+cacheEnabled = True
+cacheRecentHours = 48  # Always re-fetch this much recent data; providers may still revise it
+httpConnectTimeout = 10
+httpReadTimeout = 120
+httpMaxConnections = 8
+httpHostConnections = {}  # Per-host pool size overrides, e.g. {"www.usbr.gov": 4}; also the per-host fetch concurrency
+schedulerMaxWorkers = 24
+aquariusTargetSeconds = 5  # Aim for Aquarius point requests of about this long
+aquariusMaxChunkBytes = 16 * 1024 * 1024
+aquariusMaxChunkPoints = 200000
+oraclePoolMax = 4  # Sessions per TNS alias
+oracleStatementCache = 50
+oracleArraySize = 10000  # Rows per fetch round trip
+usbrBackend = 'auto'  # 'auto' prefers HDB SQL for internal queries, 'api' always uses hdb.pl
+usbrFormat = 'json'  # hdb.pl response format; 'csv' parses lighter but is not yet verified against live hdb.pl, so it is not a user setting
+usbrServerConnections = 4  # Concurrent hdb.pl requests per HDB server
+usbrWindowPoints = 50000  # Points per hdb.pl request (SDIDs x steps); longer ranges are split into time windows
+usgsPageLimit = 10000  # Features per OGC API page
+maxUrlLength = 2000  # Provider batches are split to keep request URLs under this
+planConfirmPoints = 2000000  # Ask before running a query expected to return more points than this
+planConfirmRows = 500000
\ No newline at end of file
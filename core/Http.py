@@ -0,0 +1,120 @@
+import socket
+import threading
+import requests
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from core import Config
+
+sessions = {}
+sessionsLock = threading.Lock()
+active = threading.local() # The cancelable request this thread is sending, so its connection can be found to abort it
+
+def trackConnection(connection):
+    tracked = getattr(active, 'request', None)
+
+    if tracked is not None:
+        tracked['connection'] = connection
+
+# Pooled connections report themselves to the cancelable request using them, new or reused alike
+class trackedHTTPConnection(HTTPConnection):
+    def request(self, *args, **kwargs):
+        trackConnection(self)
+        return super().request(*args, **kwargs)
+
+class trackedHTTPSConnection(HTTPSConnection):
+    def request(self, *args, **kwargs):
+        trackConnection(self)
+        return super().request(*args, **kwargs)
+
+class trackedHTTPPool(HTTPConnectionPool):
+    ConnectionCls = trackedHTTPConnection
+
+class trackedHTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = trackedHTTPSConnection
+
+class trackedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': trackedHTTPPool, 'https': trackedHTTPSPool}
+
+def hostKey(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+def maxConnections(host):
+    """Connection pool size for a host: per-host override from user.config, else the default."""
+    netloc = urlsplit(host).netloc
+    return int(Config.httpHostConnections.get(netloc, Config.httpMaxConnections))
+
+def getSession(url):
+    """Shared keep-alive session for the URL's host, created on first use."""
+    host = hostKey(url)
+
+    with sessionsLock:
+        session = sessions.get(host)
+
+        if session is None:
+            session = requests.Session()
+            poolSize = maxConnections(host)
+
+            # Block instead of opening extra sockets when every pooled connection is busy
+            adapter = trackedAdapter(pool_connections=1, pool_maxsize=poolSize, pool_block=True)
+            session.mount(host, adapter)
+            session.headers.update({'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'})
+            sessions[host] = session
+
+            if Config.debug:
+                print(f"[DEBUG] Http.getSession: New session for {host} with {poolSize} connections")
+        return session
+
+def request(method, url, cancel=None, **kwargs):
+    """Request on the host's shared session; with a Scheduler.cancelToken, cancel() aborts it while waiting or downloading."""
+    kwargs.setdefault('timeout', (Config.httpConnectTimeout, Config.httpReadTimeout))
+
+    if cancel is None:
+        return getSession(url).request(method, url, **kwargs)
+    tracked = {'connection': None, 'done': False}
+    active.request = tracked
+    callback = cancel.add(lambda: abort(tracked))
+
+    try:
+        cancel.check()
+        return getSession(url).request(method, url, **kwargs)
+    except Exception:
+        cancel.check() # The abort surfaces as a connection error; report it as the cancel it was
+        raise
+    finally:
+        tracked['done'] = True
+        active.request = None
+        cancel.discard(callback)
+
+def abort(tracked):
+    """Shut the socket of a tracked request so the read blocked on it in another thread fails at once; the pool then drops it."""
+    connection = tracked['connection']
+    sock = getattr(connection, 'sock', None)
+
+    if tracked['done'] or sock is None:
+        return
+    try:
+        # Plain socket shutdown, also for TLS sockets, whose own shutdown would tear down the SSL state under the reader
+        socket.socket.shutdown(sock, socket.SHUT_RDWR)
+    except OSError as e:
+        if Config.debug:
+            print(f"[DEBUG] Http.abort: Socket shutdown failed: {e}")
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+def closeAll():
+    with sessionsLock:
+        for session in sessions.values():
+            session.close()
+        sessions.clear()
+
+    if Config.debug:
+        print("[DEBUG] Http.closeAll: Closed all pooled sessions")
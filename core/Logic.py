@@ -8,7 +8,7 @@ from PyQt6.QtCore import Qt, QThreadPool, QRunnable, pyqtSignal, QObject, QTimer
 from PyQt6.QtGui import QColor, QBrush
 from PyQt6.QtWidgets import QTableWidgetItem, QHeaderView, QAbstractItemView, QMessageBox, QSizePolicy, QProgressDialog
 from collections import defaultdict
-from core import USBR, USGS, Aquarius, Config, Utils
+from core import USBR, USGS, Aquarius, Config, Utils, Http, Scheduler, Oracle
 
 def resourcePath(relativePath):
     """Get absolute path to resource, works for dev and PyInstaller"""
@@ -271,7 +271,11 @@ def valuePrecision(value):
 
 def cleanShutdown():
     pool = QThreadPool.globalInstance()
+    Scheduler.shutdown()
     pool.waitForDone(5000)
+    Aquarius.tokens.logout()
+    Oracle.manager.shutdown()
+    Http.closeAll()
 
 def setQueryDateRange(window, radioButton, dteStartDate, dteEndDate):
     now = datetime.now()
@@ -6,20 +6,42 @@ import shutil
 import keyring
 import time
 import re
+import json
+import threading
+import numpy as np
 from pathlib import Path
 from typing import List, Any, Optional
 from datetime import datetime
-from core import Logic, Config
-
-class oracleConnection:
-    def __init__(self, dsn: str):
-        self.dsn = dsn
-        self.connection = None
+from core import Logic, Config, Utils
+
+try:
+    import pyarrow # Optional; lets fetchColumns use python-oracledb's Arrow data frame fetch
+except ImportError:
+    pyarrow = None
+
+class oracleManager:
+    """Process-wide Oracle state: Instant Client and TNS_ADMIN set up once, one session pool per TNS alias."""
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.initialized = False
+        self.clientReady = False
         self.tnsDir = None
-        self._setup()
-
-    def _setup(self):
-        """Set up bundled Instant Client and TNS_ADMIN."""
+        self.pools = {}
+        self.credentialsStored = None # Keyring answer, looked up once until closePools()
+
+    def initialize(self):
+        """Load the Instant Client and stage tnsnames/sqlnet/wallet on first use only."""
+        with self.lock:
+            if self.initialized:
+                return
+            if not self.clientReady:
+                self.initClient()
+                self.clientReady = True
+            self.stageTnsAdmin()
+            self.initialized = True
+
+    def initClient(self):
+        """Set up bundled Instant Client."""
         system = platform.system().lower()
         if platform.architecture()[0] != "64bit": raise RuntimeError("Only 64-bit platforms supported.")
         clientDirPath = "oracle/client"
@@ -35,10 +57,10 @@ class oracleConnection:
 
         requiredFiles = expectedFiles.get(system)
         if not requiredFiles: raise RuntimeError(f"Unsupported platform: {system}")
-        if Config.debug: print(f"[DEBUG] oracleConnection._setup: Checking for platform-specific files in {clientDir}: {requiredFiles}")
+        if Config.debug: print(f"[DEBUG] oracleManager.initClient: Checking for platform-specific files in {clientDir}: {requiredFiles}")
         filesExist = all((clientDir / f).exists() for f in requiredFiles)
         if not filesExist: raise FileNotFoundError(f"Oracle Instant Client files for {system.capitalize()} not found in {clientDir}. Please download and unzip the correct Instant Client 23.9 for your platform into oracle/client.")
-        if Config.debug: print(f"[DEBUG] oracleConnection._setup: Validated Instant Client files for {system}")
+        if Config.debug: print(f"[DEBUG] oracleManager.initClient: Validated Instant Client files for {system}")
 
         # Set platform-specific library path
         if system == "windows":
@@ -49,18 +71,24 @@ class oracleConnection:
             os.environ['DYLD_LIBRARY_PATH'] = f"{clientDir}:{os.environ.get('DYLD_LIBRARY_PATH', '')}"
 
         oracledb.init_oracle_client(lib_dir=str(clientDir))
-        if Config.debug: print(f"[DEBUG] oracleConnection._setup: Initialized oracledb with clientDir {clientDir}")
+        if Config.debug: print(f"[DEBUG] oracleManager.initClient: Initialized oracledb with clientDir {clientDir}")
 
-        # Setup TNS_ADMIN 
-        config = Logic.loadConfig()
+    def stageTnsAdmin(self):
+        """Copy tnsnames.ora, sqlnet.ora and the wallet to a temp TNS_ADMIN."""
+        configPath = Utils.getConfigPath()
+        config = {}
+
+        if os.path.exists(configPath):
+            with open(configPath, 'r', encoding='utf-8') as configFile:
+                config = json.load(configFile)
         tnsAdmin = config.get('tnsNamesLocation')
         if not tnsAdmin: tnsAdmin = os.environ.get('TNS_ADMIN', Logic.resourcePath('oracle/network/admin'))
-        if tnsAdmin.startswith('%AppRoot%'): tnsAdmin = tnsAdmin.replace('%AppRoot%', Logic.appRoot)
+        if tnsAdmin.startswith('%AppRoot%'): tnsAdmin = tnsAdmin.replace('%AppRoot%', Config.appRoot)
         srcAdminDir = Path(tnsAdmin)
 
         if not srcAdminDir.exists():
             srcAdminDir = Path(Logic.resourcePath('oracle/network/admin'))
-            if Config.debug: print(f"[DEBUG] oracleConnection._setup: tnsNamesLocation {tnsAdmin} not found, falling back to {srcAdminDir}")
+            if Config.debug: print(f"[DEBUG] oracleManager.stageTnsAdmin: tnsNamesLocation {tnsAdmin} not found, falling back to {srcAdminDir}")
 
         self.tnsDir = Path(tempfile.mkdtemp())
         tnsPath = self.tnsDir / "tnsnames.ora"
@@ -68,10 +96,10 @@ class oracleConnection:
 
         if (srcAdminDir / "tnsnames.ora").exists():
             shutil.copy(srcAdminDir / "tnsnames.ora", tnsPath)
-            if Config.debug: print(f"[DEBUG] oracleConnection._setup: Copied tnsnames.ora to {tnsPath}")
+            if Config.debug: print(f"[DEBUG] oracleManager.stageTnsAdmin: Copied tnsnames.ora to {tnsPath}")
         else:
             tnsPath.write_text("")
-            if Config.debug: print("[DEBUG] oracleConnection._setup: Created empty tnsnames.ora")
+            if Config.debug: print("[DEBUG] oracleManager.stageTnsAdmin: Created empty tnsnames.ora")
         if (srcAdminDir / "sqlnet.ora").exists():
             sqlnetContent = (srcAdminDir / "sqlnet.ora").read_text()
             srcWalletDir = srcAdminDir / "wallet"
@@ -91,40 +119,208 @@ class oracleConnection:
                         f"(METHOD_DATA = (DIRECTORY = {walletDir}))"
                     )
 
-                if Config.debug: print(f"[DEBUG] oracleConnection._setup: Updated sqlnet.ora WALLET_LOCATION to {walletDir}")
+                if Config.debug: print(f"[DEBUG] oracleManager.stageTnsAdmin: Updated sqlnet.ora WALLET_LOCATION to {walletDir}")
 
             sqlnetPath.write_text(sqlnetContent)
-            if Config.debug: print(f"[DEBUG] oracleConnection._setup: Copied/updated sqlnet.ora to {sqlnetPath}")
+            if Config.debug: print(f"[DEBUG] oracleManager.stageTnsAdmin: Copied/updated sqlnet.ora to {sqlnetPath}")
         else:
             raise FileNotFoundError("sqlnet.ora not found for PIV/MCS configuration.")
         
         os.environ['TNS_ADMIN'] = str(self.tnsDir)
-        if Config.debug: print(f"[DEBUG] oracleConnection._setup: Set TNS_ADMIN to {self.tnsDir}")
+        if Config.debug: print(f"[DEBUG] oracleManager.stageTnsAdmin: Set TNS_ADMIN to {self.tnsDir}")
+
+    def hasAlias(self, alias):
+        """True if the staged tnsnames.ora defines the alias."""
+        self.initialize()
+        tnsText = (self.tnsDir / "tnsnames.ora").read_text()
+        return re.search(rf'^\s*{re.escape(alias)}\s*=', tnsText, re.IGNORECASE | re.MULTILINE) is not None
+
+    def getPool(self, alias):
+        """Session pool for a TNS alias, created on first use with the keyring credentials."""
+        with self.lock:
+            pool = self.pools.get(alias)
+
+            if pool is None:
+                self.initialize()
+                user = keyring.get_password("DataDoctor", "oracleUser") or ''
+                password = keyring.get_password("DataDoctor", "oraclePassword") or ''
+
+                if not user or not password:
+                    if Config.debug: print("[DEBUG] oracleManager.getPool: Missing Oracle credentials")
+                    raise ValueError("Oracle username or password not set in keyring")
+                pool = oracledb.create_pool(user=user, password=password, dsn=alias, min=1, max=Config.oraclePoolMax, increment=1,
+                                            stmtcachesize=Config.oracleStatementCache, getmode=oracledb.POOL_GETMODE_WAIT)
+                user = None
+                password = None
+                self.pools[alias] = pool
+                if Config.debug: print(f"[DEBUG] oracleManager.getPool: Created pool for {alias} (max {Config.oraclePoolMax})")
+            return pool
+
+    def acquire(self, alias) -> oracledb.Connection:
+        """Check out a pooled connection; closing it returns it to the pool."""
+        return self.getPool(alias).acquire()
+
+    def closePools(self):
+        """Close every pool, e.g. after the Oracle credentials change."""
+        with self.lock:
+            for alias, pool in self.pools.items():
+                try:
+                    pool.close(force=True)
+                    if Config.debug: print(f"[DEBUG] oracleManager.closePools: Closed pool for {alias}")
+                except oracledb.Error as e:
+                    if Config.debug: print(f"[DEBUG] oracleManager.closePools: Error closing pool for {alias}: {e}")
+            self.pools = {}
+            self.credentialsStored = None
+
+    def hasCredentials(self):
+        """True when the Oracle user and password are both in the keyring."""
+        with self.lock:
+            if self.credentialsStored is None:
+                self.credentialsStored = bool(keyring.get_password("DataDoctor", "oracleUser") and keyring.get_password("DataDoctor", "oraclePassword"))
+            return self.credentialsStored
+
+    def shutdown(self):
+        """Close pools and remove the staged TNS_ADMIN directory."""
+        with self.lock:
+            self.closePools()
+
+            if self.tnsDir:
+                shutil.rmtree(self.tnsDir, ignore_errors=True)
+                self.tnsDir = None
+                if Config.debug: print("[DEBUG] oracleManager.shutdown: Cleaned up TNS_ADMIN directory")
+
+manager = oracleManager()
+
+numberTypes = {oracledb.DB_TYPE_NUMBER, oracledb.DB_TYPE_BINARY_DOUBLE, oracledb.DB_TYPE_BINARY_FLOAT, oracledb.DB_TYPE_BINARY_INTEGER}
+dateTypes = {oracledb.DB_TYPE_DATE, oracledb.DB_TYPE_TIMESTAMP, oracledb.DB_TYPE_TIMESTAMP_LTZ, oracledb.DB_TYPE_TIMESTAMP_TZ}
+
+def columnDtype(typeCode):
+    """NumPy dtype for a cursor column: float64 for numbers, datetime64 for dates, object for everything else."""
+    if typeCode in numberTypes: return np.dtype(np.float64)
+    if typeCode == oracledb.DB_TYPE_DATE: return np.dtype('datetime64[s]')
+    if typeCode in dateTypes: return np.dtype('datetime64[us]')
+    return np.dtype(object)
+
+def arrowDtype(arrowType):
+    """NumPy dtype for an Arrow column from the data frame fetch, matching columnDtype."""
+    if pyarrow.types.is_integer(arrowType) or pyarrow.types.is_floating(arrowType) or pyarrow.types.is_decimal(arrowType): return np.dtype(np.float64)
+    if pyarrow.types.is_timestamp(arrowType): return np.dtype(f'datetime64[{arrowType.unit}]')
+    if pyarrow.types.is_date(arrowType): return np.dtype('datetime64[s]')
+    return np.dtype(object)
+
+def nullMask(array):
+    if array.dtype.kind == 'f': return np.isnan(array)
+    if array.dtype.kind == 'M': return np.isnat(array)
+    return np.equal(array, None)
+
+class columnarResult:
+    """Query result held column-wise: one typed array and one null mask per column instead of a dict per row."""
+    def __init__(self, names, dtypes):
+        self.names = list(names)
+        self.dtypes = list(dtypes)
+        self.arrays = [np.empty(0, dtype=dtype) for dtype in self.dtypes]
+        self.masks = [np.empty(0, dtype=bool) for _ in self.names]
+        self.batches = [[] for _ in self.names]
+
+    def append(self, col, array):
+        self.batches[col].append(array.astype(self.dtypes[col], copy=False))
+
+    def appendRows(self, rows):
+        """Add one fetchmany batch; None becomes NaN/NaT when a column converts to its typed array."""
+        for col, values in enumerate(zip(*rows)):
+            self.append(col, np.array(values, dtype=self.dtypes[col]))
+
+    def finish(self):
+        """Join the fetched batches into one array per column."""
+        for col, batches in enumerate(self.batches):
+            if batches:
+                self.arrays[col] = batches[0] if len(batches) == 1 else np.concatenate(batches)
+            self.masks[col] = nullMask(self.arrays[col])
+        self.batches = [[] for _ in self.names]
+        return self
+
+    def rowCount(self):
+        return len(self.arrays[0]) if self.arrays else 0
+
+    def column(self, name):
+        return self.arrays[self.names.index(name.upper())]
+
+    def mask(self, name):
+        return self.masks[self.names.index(name.upper())]
+
+def describeColumns(cursor):
+    """Empty columnarResult shaped like an executed cursor's select list."""
+    return columnarResult([desc[0] for desc in cursor.description], [columnDtype(desc[1]) for desc in cursor.description])
+
+def checkBinds(query, params):
+    """Refuse queries whose bind variables and params do not match, so values are never spliced into SQL."""
+    hasBindVars = bool(re.search(r'(?<!\w):(\d+|[a-zA-Z]\w*)', query))
+    if Config.debug: print(f"[DEBUG] Oracle.checkBinds: Query '{query[:100]}' has bind vars: {hasBindVars}")
+
+    if not params and hasBindVars:
+        raise ValueError("Bind variables found in query but params not provided. Use parameterized input to prevent SQL injection.")
+    if params and not isinstance(params, (list, tuple)):
+        raise ValueError("Params must be a list or tuple to prevent SQL injection")
+    if params and not hasBindVars:
+        raise ValueError("Query has no bind variables but params were provided")
+
+def fetchColumns(connection, query, params=None, batchSize=None):
+    """Run a SELECT and stream its rows straight into a columnarResult, batchSize rows per round trip."""
+    batchSize = batchSize or Config.oracleArraySize
+
+    if pyarrow is not None and hasattr(connection, 'fetch_df_batches'):
+        # Column types come from the first batch's Arrow schema
+        result = None
+        for frame in connection.fetch_df_batches(query, parameters=params, size=batchSize):
+            arrowColumns = [pyarrow.array(frame.get_column(col)) for col in range(frame.num_columns())]
+            if result is None:
+                result = columnarResult(frame.column_names(), [arrowDtype(arrowColumn.type) for arrowColumn in arrowColumns])
+            for col, arrowColumn in enumerate(arrowColumns):
+                result.append(col, arrowColumn.to_numpy(zero_copy_only=False))
+        if result is not None:
+            result.finish()
+            if Config.debug: print(f"[DEBUG] Oracle.fetchColumns: Fetched {result.rowCount()} rows in {len(result.names)} columns")
+            return result
+        # No batches means no rows and no schema; the cursor below still describes the select list
+
+    cursor = connection.cursor()
+    cursor.arraysize = batchSize
+    cursor.prefetchrows = batchSize + 1
+
+    try:
+        # Column types come from the executed cursor, so describing costs no extra round trip
+        cursor.execute(query, params or [])
+        result = describeColumns(cursor)
+
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            result.appendRows(rows)
+        result.finish()
+        if Config.debug: print(f"[DEBUG] Oracle.fetchColumns: Fetched {result.rowCount()} rows in {len(result.names)} columns")
+        return result
+    finally:
+        cursor.close()
+
+class oracleConnection:
+    """One pooled connection to a TNS alias; see oracleManager for the shared client, TNS_ADMIN and pools."""
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.connection = None
+        manager.initialize()
 
     def connect(self) -> oracledb.Connection:
-        """Establish Oracle connection with PIV/MCS and user credentials."""
+        """Check out a connection from the alias's pool (PIV/MCS and user credentials)."""
         try:
-            user = keyring.get_password("DataDoctor", "oracleUser") or ''
-            password = keyring.get_password("DataDoctor", "oraclePassword") or ''
-
-            if not user or not password:
-                if Config.debug: print("[DEBUG] oracleConnection.connect: Missing Oracle credentials")
-                raise ValueError("Oracle username or password not set in keyring")
-            
-            self.connection = oracledb.connect(user=user, password=password, dsn=self.dsn)
-            if Config.debug: print(f"[DEBUG] oracleConnection.connect: Connection established to {self.dsn}")
-            user = None
-            password = None
+            self.connection = manager.acquire(self.dsn)
+            if Config.debug: print(f"[DEBUG] oracleConnection.connect: Connection acquired from pool for {self.dsn}")
             return self.connection
         except oracledb.Error as e:
             if Config.debug: print(f"[DEBUG] oracleConnection.connect: Error connecting to Oracle: {e}")
-            user = None
-            password = None
             raise
         except Exception as e:
             if Config.debug: print(f"[DEBUG] oracleConnection.connect: Unexpected error: {e}")
-            user = None
-            password = None
             raise
 
     def executeCustomQuery(self, query: str, params: Optional[List[Any]] = None, fetchAll: bool = True) -> Any:
@@ -249,6 +445,35 @@ class oracleConnection:
             cursor.close()
             if Config.debug: print("[DEBUG] OracleConnection.executeCustomQuery: Cursor closed")            
 
+    def openCursor(self, query: str, params: Optional[List[Any]] = None, batchSize: Optional[int] = None) -> oracledb.Cursor:
+        """Execute a statement and hand back its open cursor so rows can be fetched page by page; the caller closes it."""
+        if not self.connection: raise RuntimeError("No active connection. Call connect() first.")
+        checkBinds(query, params)
+        cursor = self.connection.cursor()
+        cursor.arraysize = batchSize or Config.oracleArraySize
+        cursor.prefetchrows = cursor.arraysize + 1
+
+        try:
+            cursor.execute(query, params or [])
+            return cursor
+        except Exception:
+            cursor.close()
+            raise
+
+    def cancel(self):
+        """Interrupt the statement or fetch running on this connection; safe to call from another thread."""
+        if self.connection:
+            self.connection.cancel()
+            if Config.debug: print(f"[DEBUG] oracleConnection.cancel: Sent break to {self.dsn}")
+
+    def fetchColumns(self, query: str, params: Optional[Any] = None, batchSize: Optional[int] = None) -> columnarResult:
+        """Columnar SELECT for large pulls; see the module-level fetchColumns."""
+        if not self.connection: raise RuntimeError("No active connection. Call connect() first.")
+        startTime = time.time()
+        result = fetchColumns(self.connection, query, params, batchSize)
+        if Config.debug: print(f"[DEBUG] oracleConnection.fetchColumns: {result.rowCount()} rows in {time.time() - startTime:.3f} seconds")
+        return result
+
     def callStoredProcedure(self, procedureName: str, params: Optional[List[Any]] = None) -> List[Any]:
         """Call an Oracle stored procedure and return output values."""
         if not self.connection: raise RuntimeError("No active connection. Call connect() first.")
@@ -266,24 +491,21 @@ class oracleConnection:
             if Config.debug: print("[DEBUG] oracleConnection.callStoredProcedure: Cursor closed")
 
     def close(self):
-        """Close connection and clean up TNS_ADMIN directory."""
+        """Return the connection to its pool."""
         try:
             if self.connection:
                 self.connection.close()
-                if Config.debug: print("[DEBUG] oracleConnection.close: Connection closed.")
+                self.connection = None
+                if Config.debug: print("[DEBUG] oracleConnection.close: Connection released to pool.")
         except oracledb.Error as e:
-            if Config.debug: print(f"[DEBUG] oracleConnection.close: Error closing connection: {e}")
-        finally:
-            if self.tnsDir:
-                shutil.rmtree(self.tnsDir, ignore_errors=True)
-                if Config.debug: print("[DEBUG] oracleConnection.close: Cleaned up TNS_ADMIN directory")
+            if Config.debug: print(f"[DEBUG] oracleConnection.close: Error releasing connection: {e}")
 
     def testConnection(self):
         if Config.debug: print(f"[DEBUG] oracleConnection.testConnection: Testing connection to {self.dsn}")       
 
         try:
             self.connect()
-            result = self.executeQuery("SELECT SYSDATE FROM DUAL", fetchAll=False)
+            result = self.executeCustomQuery("SELECT SYSDATE FROM DUAL", fetchAll=False)
             if Config.debug: print(f"[DEBUG] oracleConnection.testConnection: Query result: {result}")
             if result: print(f"[INFO] Successfully connected to {self.dsn} and fetched SYSDATE: {result[0]}")
             else: print(f"[WARN] Connected to {self.dsn} but no result from query")
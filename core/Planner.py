@@ -0,0 +1,116 @@
+import math
+from collections import defaultdict
+from core import Config, TimeSeries, USBR, USGS, Aquarius
+
+def resolveInterval(interval, db):
+    """Bare INSTANT means each provider's native instant step."""
+    if interval == 'INSTANT':
+        if db.startswith('USBR-'):
+            return 'INSTANT:60'
+        if db == 'USGS-NWIS':
+            return 'INSTANT:15'
+        if db == 'AQUARIUS':
+            return 'INSTANT:1'
+    return interval
+
+def splitBatches(ids, limit, maxJoinedLength):
+    """Split ids into batches of at most limit that also keep ','.join(batch) within maxJoinedLength (URL-safe)."""
+    batches = []
+    batch = []
+    joinedLength = 0
+
+    for dataID in ids:
+        if batch and (len(batch) >= limit or joinedLength + 1 + len(dataID) > maxJoinedLength):
+            batches.append(batch)
+            batch = []
+            joinedLength = 0
+        joinedLength += len(dataID) + (1 if batch else 0)
+        batch.append(dataID)
+    if batch:
+        batches.append(batch)
+    return batches
+
+class queryPlan:
+    """What a query will fetch, worked out before anything goes on the wire: grouped work, provider requests and expected size."""
+    def __init__(self, startDate, endDate, timestamps):
+        self.startDate = startDate
+        self.endDate = endDate
+        self.timestamps = timestamps
+        self.groups = defaultdict(list) # (db, interval, mrid) -> [(origIndex, dataID, SDID, db, interval, mrid)]
+        self.columns = [] # One per query item: dataID, db, interval, cells on the shared grid
+        self.requests = [] # One per provider batch: db, interval, number of IDs, number of HTTP/SQL calls
+        self.folded = 0
+
+    def rowCount(self):
+        return len(self.timestamps)
+
+    def pointCount(self):
+        return sum(column['points'] for column in self.columns)
+
+    def requestCount(self):
+        return sum(request['calls'] for request in self.requests)
+
+    def isLarge(self):
+        return self.pointCount() > Config.planConfirmPoints or self.rowCount() > Config.planConfirmRows
+
+    def summary(self):
+        """Plain-text estimate for the confirmation dialog and debug output."""
+        lines = [f"{len(self.columns)} columns x {self.rowCount():,} rows, about {self.pointCount():,} points",
+                 f"{self.requestCount():,} provider requests in {len(self.requests)} batches"]
+
+        if self.folded:
+            lines.append(f"{self.folded} duplicate entries fetched once")
+        largest = sorted(self.columns, key=lambda column: column['points'], reverse=True)[:3]
+        lines += [f"  {column['dataID']} ({column['db']}, {column['interval']}): {column['points']:,} points" for column in largest]
+        lines.append("Cached ranges are not counted, so this is an upper bound.")
+        return '\n'.join(lines)
+
+def gridPoints(startDate, endDate, interval):
+    grid = TimeSeries.buildGrid(startDate, endDate, interval)
+    return 0 if grid is None else len(grid)
+
+def buildPlan(queryItems, startDate, endDate):
+    """Plan queryItems (sorted by origIndex); None if the dates and intervals give no timestamps."""
+    intervals = dict.fromkeys(resolveInterval(interval, db) for _, interval, db, _, _ in queryItems)
+    grids = [TimeSeries.buildGrid(startDate, endDate, interval) for interval in intervals]
+    grids = [grid for grid in grids if grid is not None and len(grid) > 0]
+
+    if not grids:
+        return None
+    # Mixed intervals share the finest grid; coarser series land on their own timestamps within it
+    timestamps = max(grids, key=len)
+    plan = queryPlan(startDate, endDate, timestamps)
+    requested = set()
+
+    # Repeated (dataID, db, interval, mrid) entries are fetched once and fanned out to every column
+    for dataID, interval, db, mrid, origIndex in queryItems:
+        interval = resolveInterval(interval, db)
+        plan.columns.append({'dataID': dataID, 'db': db, 'interval': interval, 'points': len(timestamps)})
+
+        if (dataID, db, interval, mrid) in requested:
+            plan.folded += 1
+            if Config.debug:
+                print(f"[DEBUG] buildPlan: Folded duplicate request {dataID} ({db}, {interval}, {mrid})")
+            continue
+        requested.add((dataID, db, interval, mrid))
+        SDID = dataID.split('-')[0] if db.startswith('USBR-') and '-' in dataID else dataID
+        plan.groups[(db, interval, mrid)].append((origIndex, dataID, SDID, db, interval, mrid))
+
+    for (db, interval, mrid), entries in plan.groups.items():
+        ids = list(dict.fromkeys(entry[2] for entry in entries))
+        points = gridPoints(startDate, endDate, interval)
+
+        if db.startswith('USBR-'):
+            batches = USBR.batches(ids)
+            windows = len(USBR.planWindows(startDate, endDate, interval, max(len(batch) for batch in batches)))
+            plan.requests += [{'db': db, 'interval': interval, 'ids': len(batch), 'calls': windows} for batch in batches]
+        elif db == 'USGS-NWIS':
+            for batch in USGS.batches(ids):
+                pages = math.ceil(len(batch) * points / Config.usgsPageLimit) if interval == 'DAY' else 1
+                plan.requests.append({'db': db, 'interval': interval, 'ids': len(batch), 'calls': max(1, pages)})
+        elif db == 'AQUARIUS':
+            chunks = max(1, math.ceil(points / Aquarius.planner.pointsPerChunk))
+            plan.requests += [{'db': db, 'interval': interval, 'ids': 1, 'calls': chunks + (1 if chunks > 1 else 0)} for _ in ids]
+    if Config.debug:
+        print(f"[DEBUG] buildPlan: {plan.summary()}")
+    return plan
@@ -1,39 +1,34 @@
-import queue
-import time
+import numpy as np
 from collections import defaultdict
 from datetime import datetime, timedelta
-from PyQt6.QtCore import Qt, QThreadPool, QRunnable, pyqtSignal, QObject, QCoreApplication, QTimer
-from PyQt6.QtGui import QColor, QBrush, QFont, QFontMetrics
-from PyQt6.QtWidgets import QTableWidgetItem, QHeaderView, QAbstractItemView, QMessageBox, QSizePolicy, QProgressDialog
-from core import Logic, USBR, USGS, Aquarius, Config, Utils, QueryUtils
+from PyQt6.QtCore import Qt, QThreadPool, QRunnable, pyqtSignal, QObject, QTimer
+from PyQt6.QtGui import QFont, QFontMetrics
+from PyQt6.QtWidgets import QHeaderView, QAbstractItemView, QMessageBox, QSizePolicy, QProgressDialog
+from core import Logic, USBR, USGS, Aquarius, Config, Utils, QueryUtils, TimeSeries, TableModel, Cache, Planner, Scheduler
 from DataDoctor import uiMain
 
 class sortWorkerSignals(QObject):
-    sortDone = pyqtSignal(list, bool)
+    sortDone = pyqtSignal(object, bool)
 
 class sortWorker(QRunnable):
-    def __init__(self, rows, col, ascending):
+    def __init__(self, keys, ascending):
         super().__init__()
         self.signals = sortWorkerSignals()
-        self.rows = rows
-        self.col = col
+        self.keys = keys
         self.ascending = ascending
 
     def run(self):
-        def sortKey(row):
-            try:
-                return float(row[self.col + 1])
-            except ValueError:
-                return 0
-        self.rows.sort(key=sortKey, reverse=not self.ascending)
-        self.signals.sortDone.emit(self.rows, self.ascending)
+        # Blank cells sort as 0, same as the old text-based sort
+        keys = np.where(np.isnan(self.keys), 0, self.keys) if self.keys.dtype.kind == 'f' else self.keys
+        order = np.argsort(keys if self.ascending else -keys, kind='stable')
+        self.signals.sortDone.emit(order, self.ascending)
 
 class queryWorkerSignals(QObject):
     progressSignal = pyqtSignal(int, str)
     resultSignal = pyqtSignal(tuple)
 
 class queryWorker(QRunnable):
-    def __init__(self, groupKey, groupItems, signals, startDate, endDate, isInternal, timestamps, defaultBlanks):
+    def __init__(self, groupKey, groupItems, signals, startDate, endDate, isInternal, timestamps, defaultBlanks, cancel=None):
         super().__init__()
         self.groupKey = groupKey
         self.groupItems = groupItems
@@ -43,66 +38,92 @@ class queryWorker(QRunnable):
         self.isInternal = isInternal
         self.timestamps = timestamps
         self.defaultBlanks = defaultBlanks
+        self.cancel = cancel or Scheduler.cancelToken()
 
     def run(self):
         db, _, _ = self.groupKey
         groupResult = {}
         groupLabels = {} if db == 'AQUARIUS' else None
+        groupBackends = {}
+        groupStates = {} # requestKey -> 'ok', 'empty' or 'error', shown on the column while the rest of the query runs
         usbrGroups = defaultdict(list)
         for origIndex, dataID, SDID, itemDb, interval, mrid in self.groupItems:
             usbrGroups[(itemDb, interval, mrid)].append((origIndex, dataID, SDID))
         try:
             for (itemDb, interval, mrid), items in usbrGroups.items():
-                SDIDs = [item[2] for item in items]
+                if self.cancel.isCanceled():
+                    if Config.debug:
+                        print(f"[DEBUG] queryWorker: Canceled group {self.groupKey}, skipping remaining batches")
+                    break
+                SDIDs = list(dict.fromkeys(item[2] for item in items)) # Each SDID fetched once; columns sharing it fan out below
                 result = {}
+                failed = False
+                backends = {} # SDID -> backend that fetched it; IDs served wholly from the cache stay absent
                 if db.startswith('USBR'):
                     try:
                         svr = itemDb.split('-')[1].lower() if '-' in itemDb else 'lchdb'
                         table = 'M' if mrid != '0' else 'R'
                         apiInterval = interval
-                        result = USBR.apiRead(svr, SDIDs, self.startDate, self.endDate, apiInterval, mrid, table)
+                        def usbrFetch(ids, start, end):
+                            fetched, backend = USBR.read(svr, ids, start, end, apiInterval, mrid, table, self.isInternal, self.cancel)
+                            backends.update(dict.fromkeys(ids, backend))
+                            return fetched
+                        result = Cache.cachedRead(itemDb, SDIDs, interval, mrid, self.startDate, self.endDate, usbrFetch)
                         if Config.debug:
                             print(f"[DEBUG] queryWorker: USBR result for SDIDs {SDIDs}: {result}")
                     except Exception as e:
                         if Config.debug:
-                            print(f"[DEBUG] queryWorker: USBR apiRead failed for SDIDs {SDIDs}: {e}")
+                            print(f"[DEBUG] queryWorker: USBR read failed for SDIDs {SDIDs}: {e}")
                         result = {}
+                        failed = True
                 elif db == 'AQUARIUS' and self.isInternal:
                     try:
-                        result = Aquarius.apiRead(SDIDs, self.startDate, self.endDate, interval)
+                        def aquariusFetch(ids, start, end):
+                            backends.update(dict.fromkeys(ids, 'api'))
+                            return Aquarius.apiRead(ids, start, end, interval, self.cancel)
+                        result = Cache.cachedRead(db, SDIDs, interval, mrid, self.startDate, self.endDate, aquariusFetch)
                         if Config.debug:
                             print(f"[DEBUG] queryWorker: Aquarius result for SDIDs {SDIDs}: {result}")
                     except Exception as e:
                         if Config.debug:
                             print(f"[DEBUG] queryWorker: Aquarius apiRead failed for SDIDs {SDIDs}: {e}")
                         result = {}
+                        failed = True
                 elif db == 'USGS-NWIS':
                     try:
-                        result = USGS.apiRead(SDIDs, interval, self.startDate, self.endDate)
+                        def usgsFetch(ids, start, end):
+                            backends.update(dict.fromkeys(ids, 'api'))
+                            return USGS.apiRead(ids, interval, start, end, self.cancel)
+                        result = Cache.cachedRead(db, SDIDs, interval, mrid, self.startDate, self.endDate, usgsFetch)
                         if Config.debug:
                             print(f"[DEBUG] queryWorker: USGS result for SDIDs {SDIDs}: {result}")
                     except Exception as e:
                         if Config.debug:
                             print(f"[DEBUG] queryWorker: USGS apiRead failed for SDIDs {SDIDs}: {e}")
                         result = {}
+                        failed = True
                 else:
                     if Config.debug:
                         print(f"[DEBUG] queryWorker: Unknown db skipped: {db}")
                     continue
                 for idx, (origIndex, dataID, SDID) in enumerate(items):
-                    if SDID in result and result[SDID]:
+                    requestKey = (dataID, itemDb, interval, mrid)
+                    groupBackends[requestKey] = backends.get(SDID, 'cache' if Config.cacheEnabled else 'api')
+                    series = result.get(SDID)
+                    hasData = series is not None and len(series) > 0
+
+                    # Providers leave out IDs whose download failed (e.g. a dropped USBR batch), so a missing ID is an error, not a blank
+                    groupStates[requestKey] = 'ok' if hasData else 'error' if failed or series is None else 'empty'
+                    if hasData:
                         if db == 'AQUARIUS':
-                            outputData = result.get(SDID, {}).get('data', [])
-                            groupLabels[dataID] = result.get(SDID, {}).get('label', dataID)
+                            groupLabels[dataID] = series.label or dataID
                             if Config.debug:
                                 print(f"[DEBUG] queryWorker: Aquarius label for {dataID}: {groupLabels[dataID]}")
-                        else:
-                            outputData = result.get(SDID, [])
-                        alignedData = gapCheck(self.timestamps, outputData, dataID)
-                        values = [line.split(',')[1] if line else '' for line in alignedData]
-                        groupResult[dataID] = values
+                        groupResult[requestKey], dropped = TimeSeries.alignToGrid(self.timestamps, series)
+                        if dropped and Config.debug:
+                            print(f"[DEBUG] queryWorker: Dropped {dropped} off-grid/duplicate points from '{dataID}'")
                     else:
-                        groupResult[dataID] = self.defaultBlanks
+                        groupResult[requestKey] = self.defaultBlanks
                         if db == 'AQUARIUS':
                             groupLabels[dataID] = dataID
                         if Config.debug:
@@ -112,145 +133,33 @@ class queryWorker(QRunnable):
         except Exception as e:
             if Config.debug:
                 print(f"[DEBUG] queryWorker: Failed for group {self.groupKey}: {e}")
-            for _, dataID, _ in items:
-                groupResult[dataID] = self.defaultBlanks
+            for _, dataID, _, itemDb, interval, mrid in self.groupItems:
+                groupResult[(dataID, itemDb, interval, mrid)] = self.defaultBlanks
+                groupStates[(dataID, itemDb, interval, mrid)] = 'error'
                 if db == 'AQUARIUS':
                     groupLabels[dataID] = dataID
-        self.signals.resultSignal.emit((self.groupKey, groupResult, groupLabels))
+        self.signals.resultSignal.emit((self.groupKey, groupResult, groupLabels, groupBackends, groupStates))
 
 def buildTimestamps(startDateStr, endDateStr, intervalStr):
+    """Epoch grid for the query; memoized in TimeSeries.buildGrid, so repeat calls for the same range are free."""
     if Config.debug:
         print("[DEBUG] buildTimestamps called with start: {}, end: {}, interval: {}".format(startDateStr, endDateStr, intervalStr))
-    try:
-        start = datetime.strptime(startDateStr, '%Y-%m-%d %H:%M')
-        end = datetime.strptime(endDateStr, '%Y-%m-%d %H:%M')
-    except ValueError as e:
-        print("[ERROR] Invalid date format in buildTimestamps: {}".format(e))
-        return []
-    if intervalStr == 'HOUR':
-        delta = timedelta(hours=1)
-        start = start.replace(minute=0, second=0)
-    elif intervalStr.startswith('INSTANT:'):
-        try:
-            minutes = int(intervalStr.split(':')[1])
-            delta = timedelta(minutes=minutes)
-            start = start.replace(second=0)
-            if minutes == 1:
-                pass
-            elif minutes == 15:
-                minute = (start.minute // 15) * 15
-                start = start.replace(minute=minute)
-            elif minutes == 60:
-                start = start.replace(minute=0)
-            else:
-                print("[ERROR] Unsupported INSTANT interval: {}".format(intervalStr))
-                return []
-        except (IndexError, ValueError) as e:
-            print("[ERROR] Invalid INSTANT interval format: {}".format(e))
-            return []
-    elif intervalStr == 'DAY':
-        delta = timedelta(days=1)
-        start = start.replace(hour=0, minute=0, second=0)
-    else:
-        print("[ERROR] Unknown intervalStr: {}".format(intervalStr))
-        return []
-    timestamps = []
-    current = start
-    while current < end:
-        ts = current.strftime('%m/%d/%y %H:%M:00')
-        timestamps.append(ts)
-        current += delta
+    timestamps = TimeSeries.buildGrid(startDateStr, endDateStr, intervalStr)
+    if timestamps is None:
+        return np.array([], dtype=np.int64)
     if Config.debug:
-        print("[DEBUG] Generated {} timestamps, sample first 3: {}".format(len(timestamps), timestamps[:3]))
+        print("[DEBUG] Generated {} timestamps, sample first 3: {}".format(len(timestamps), TimeSeries.formatEpochs(timestamps[:3])))
     return timestamps
 
-def gapCheck(timestamps, data, dataID=''):
-    if Config.debug:
-        print("[DEBUG] gapCheck for dataID '{}': timestamps len={}, data len={}".format(dataID, len(timestamps), len(data)))
-    if not timestamps:
-        return data
-    try:
-        expectedDateTimes = [datetime.strptime(ts, '%m/%d/%y %H:%M:00') for ts in timestamps]
-    except ValueError as e:
-        print("[ERROR] Invalid timestamp format in timestamps: {}".format(e))
-        return data
-    newData = []
-    removed = []
-    i = 0
-    for expectedDateTime in expectedDateTimes:
-        found = False
-        while i < len(data):
-            line = data[i]
-            if not line:
-                i += 1
-                continue
-            parts = line.split(',')
-            if len(parts) < 2:
-                print("[WARN] Malformed data row skipped: '{}' for '{}'".format(line, dataID))
-                i += 1
-                continue
-            actualTimestampStr = parts[0].strip()
-            try:
-                actualDateTime = datetime.strptime(actualTimestampStr, '%m/%d/%y %H:%M:%S')
-            except ValueError:
-                print("[WARN] Invalid ts skipped: '{}' in '{}' for '{}'".format(actualTimestampStr, line, dataID))
-                i += 1
-                continue
-            if actualDateTime == expectedDateTime:
-                if not actualTimestampStr.endswith(':00'):
-                    actualTimestampStr = actualDateTime.strftime('%m/%d/%y %H:%M:00')
-                    line = actualTimestampStr + ',' + ','.join(parts[1:])
-                newData.append(line)
-                found = True
-                i += 1
-                break
-            elif actualDateTime < expectedDateTime:
-                removed.append(actualTimestampStr)
-                i += 1
-            else:
-                break
-        if not found:
-            tsStr = expectedDateTime.strftime('%m/%d/%y %H:%M:00')
-            newData.append(tsStr + ',')
-    while i < len(data):
-        line = data[i]
-        parts = line.split(',')
-        if len(parts) > 0:
-            removed.append(parts[0].strip())
-        i += 1
-    if removed:
-        if Config.debug:
-            print("[DEBUG] Removed {} extra/mismatched rows from '{}': ts {}".format(len(removed), dataID, removed))
-    if Config.debug:
-        print("[DEBUG] Post-gapCheck len={}, sample first 3: {}".format(len(newData), newData[:3]))
-    return newData
-
-def combineParameters(data, newData):
-    if len(data) != len(newData):
-        return data
-    for d in range(len(newData)):
-        parseLine = newData[d].split(',')
-        data[d] = f'{data[d]},{parseLine[1]}'
-    return data
-
-def buildTable(table, data, buildHeader, dataDictionaryTable, intervals, lookupIds=None, labelsDict=None, databases=None, queryItems=None):
-    if Config.debug:
-        print("[DEBUG] buildTable: Starting with {} rows, {} headers".format(len(data), len(buildHeader)))
-    table.clear()
-    if not data:
-        if Config.debug:
-            print("[DEBUG] buildTable: No data to display.")
-        return
-    if isinstance(buildHeader, str):
-        buildHeader = [h.strip() for h in buildHeader.split(',')]
-    processedHeaders = []
-    for i, h in enumerate(buildHeader):
-        dataId = h.strip()
-        intervalStr = intervals[i].upper()
+def buildHeaders(frame, dataDictionaryTable, labelsDict=None):
+    """Set the display header on each frame column from the data dictionary and API labels."""
+    for i, meta in enumerate(frame.columns):
+        dataId = meta['dataID'].strip()
+        intervalStr = meta['interval'].upper()
         if intervalStr.startswith('INSTANT:'):
             intervalStr = 'INSTANT'
-        database = databases[i] if databases and i < len(databases) else None
-        dictRow = getDataDictionaryItem(dataDictionaryTable, lookupIds[i] if lookupIds else dataId)
+        database = meta.get('db')
+        dictRow = getDataDictionaryItem(dataDictionaryTable, meta.get('lookupId', dataId))
         mrid = None
         if database and database.startswith('USBR-') and '-' in dataId:
             parts = dataId.rsplit('-', 1)
@@ -264,11 +173,11 @@ def buildTable(table, data, buildHeader, dataDictionaryTable, intervals, lookupI
                 if len(parts) == 3 and parts[0].isdigit() and (parts[1].isdigit() or (len(parts[1]) == 32 and parts[1].isalnum())) and parts[2].isdigit():
                     fullLabel = f"{parts[0]}-{parts[2]} \n{intervalStr}"
                     if Config.debug:
-                        print(f"[DEBUG] buildTable: USGS in dict, header {i}: {fullLabel}")
+                        print(f"[DEBUG] buildHeaders: USGS in dict, header {i}: {fullLabel}")
                 else:
                     fullLabel = f"{baseLabel} \n{intervalStr}"
                     if Config.debug:
-                        print(f"[DEBUG] buildTable: USGS in dict but non-USGS format, header {i}: {fullLabel}")
+                        print(f"[DEBUG] buildHeaders: USGS in dict but non-USGS format, header {i}: {fullLabel}")
             elif database == 'AQUARIUS' and labelsDict and dataId in labelsDict:
                 apiFull = labelsDict[dataId]
                 parts = apiFull.split('\n')
@@ -276,27 +185,27 @@ def buildTable(table, data, buildHeader, dataDictionaryTable, intervals, lookupI
                 location = parts[1].strip() if len(parts) >= 2 else dataId
                 fullLabel = f"{label} \n{location}"
                 if Config.debug:
-                    print(f"[DEBUG] buildTable: Aquarius in dict, header {i}: {fullLabel}")
+                    print(f"[DEBUG] buildHeaders: Aquarius in dict, header {i}: {fullLabel}")
             else:
                 if mrid and mrid != '0':
                     fullLabel = f"{baseLabel} \n{dataId}-{mrid}"
                     if Config.debug:
-                        print(f"[DEBUG] buildTable: USBR in dict with MRID, header {i}: {fullLabel}")
+                        print(f"[DEBUG] buildHeaders: USBR in dict with MRID, header {i}: {fullLabel}")
                 else:
                     fullLabel = f"{baseLabel} \n{dataId}"
                     if Config.debug:
-                        print(f"[DEBUG] buildTable: USBR in dict, header {i}: {fullLabel}")
+                        print(f"[DEBUG] buildHeaders: USBR in dict, header {i}: {fullLabel}")
         else:
             if database == 'USGS-NWIS':
                 parts = dataId.split('-')
                 if len(parts) == 3 and parts[0].isdigit() and (parts[1].isdigit() or (len(parts[1]) == 32 and parts[1].isalnum())) and parts[2].isdigit():
                     fullLabel = f"{parts[0]}-{parts[2]} \n{intervalStr}"
                     if Config.debug:
-                        print(f"[DEBUG] buildTable: Parsed USGS header {i}: {fullLabel}")
+                        print(f"[DEBUG] buildHeaders: Parsed USGS header {i}: {fullLabel}")
                 else:
                     fullLabel = f"{dataId} \n{intervalStr}"
                     if Config.debug:
-                        print(f"[DEBUG] buildTable: USGS not in dict, header {i}: {fullLabel}")
+                        print(f"[DEBUG] buildHeaders: USGS not in dict, header {i}: {fullLabel}")
             elif database == 'AQUARIUS' and labelsDict and dataId in labelsDict:
                 apiFull = labelsDict[dataId]
                 parts = apiFull.split('\n')
@@ -304,60 +213,56 @@ def buildTable(table, data, buildHeader, dataDictionaryTable, intervals, lookupI
                 location = parts[1].strip() if len(parts) >= 2 else dataId
                 fullLabel = f"{label} \n{location}"
                 if Config.debug:
-                    print(f"[DEBUG] buildTable: Aquarius not in dict, header {i}: {fullLabel}")
+                    print(f"[DEBUG] buildHeaders: Aquarius not in dict, header {i}: {fullLabel}")
             else:
                 if mrid and mrid != '0':
                     fullLabel = f"{dataId}-{mrid} \n{intervalStr}"
                     if Config.debug:
-                        print(f"[DEBUG] buildTable: USBR not in dict with MRID, header {i}: {fullLabel}")
+                        print(f"[DEBUG] buildHeaders: USBR not in dict with MRID, header {i}: {fullLabel}")
                 else:
                     fullLabel = f"{dataId} \n{intervalStr}"
                     if Config.debug:
-                        print(f"[DEBUG] buildTable: USBR not in dict, header {i}: {fullLabel}")
-        processedHeaders.append(fullLabel)
-    headers = processedHeaders
-    skipDateCol = dataDictionaryTable is not None
-    numCols = len(headers)
-    numRows = len(data)
-    if numRows > 10000:
-        reply = QMessageBox.warning(None, "Large Dataset Warning",
-                                   f"Query returned {numRows} rows, which may slow down the UI. Consider a smaller date range or coarser interval (e.g., HOUR instead of INSTANT:1). Continue?",
-                                   QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
-        if reply == QMessageBox.StandardButton.No:
-            if Config.debug:
-                print(f"[DEBUG] buildTable: User canceled due to large dataset ({numRows} rows)")
-            return
+                        print(f"[DEBUG] buildHeaders: USBR not in dict, header {i}: {fullLabel}")
+        meta['header'] = fullLabel
+
+def buildTable(table, frame, dataDictionaryTable, runQaqc=True):
+    """Show frame in table and size its columns; runQaqc=False for a grid still waiting on its data."""
     if Config.debug:
-        print(f"[DEBUG] buildTable: Setting table to {numRows} rows, {numCols} columns")
-    table.setRowCount(numRows)
-    table.setColumnCount(numCols)
-    table.setHorizontalHeaderLabels(headers)
+        print("[DEBUG] buildTable: Starting with {} rows, {} columns".format(frame.rowCount(), frame.columnCount()))
+    model = TableModel.resultTableModel(frame, table)
+    table.setModel(model)
+    if frame.rowCount() == 0:
+        if Config.debug:
+            print("[DEBUG] buildTable: No data to display.")
+        return
+    numCols = frame.columnCount()
+    numRows = frame.rowCount()
+    if Config.debug:
+        print(f"[DEBUG] buildTable: Set model with {numRows} rows, {numCols} columns")
     table.show()
+    font = table.font()
+    metrics = QFontMetrics(font)
+    vHeader = table.verticalHeader()
     if dataDictionaryTable:
-        timestamps = [row.split(',')[0].strip() for row in data]
-        table.setVerticalHeaderLabels(timestamps)
-        vHeader = table.verticalHeader()
-        vHeader.setMinimumWidth(120)
-        vHeader.setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        # Fixed-width timestamps, so one sample is enough to size the header
+        maxTimeWidth = metrics.horizontalAdvance(model.headerData(0, Qt.Orientation.Vertical))
+        vHeader.setMinimumWidth(max(120, maxTimeWidth) + 10)
         vHeader.setVisible(True)
     else:
-        table.verticalHeader().setVisible(False)
-    font = table.font()
-    metrics = QFontMetrics(font)
+        vHeader.setVisible(False)
     columnWidths = []
     sampleRows = min(1000, numRows)
     if Config.debug:
         print(f"[DEBUG] buildTable: Sampling {sampleRows} rows for column widths")
     for c in range(numCols):
-        cellValues = [row.split(',')[c+1].strip() if c+1 < len(row.split(',')) else "0.00" for row in data[:sampleRows]]
-        nonEmptyValues = [val for val in cellValues if val]
+        nonEmptyValues = [frame.cellText(r, c) for r in range(sampleRows) if not frame.mask[r, c]]
         if nonEmptyValues:
             maxCellWidth = max(metrics.horizontalAdvance(val) for val in nonEmptyValues)
         else:
             maxCellWidth = metrics.horizontalAdvance("0.00")
             if Config.debug:
                 print(f"[DEBUG] buildTable col {c}: No non-empty values, using fallback width {maxCellWidth}")
-        headerLines = headers[c].split('\n')
+        headerLines = model.headerData(c, Qt.Orientation.Horizontal).split('\n')
         headerWidth = max(metrics.horizontalAdvance(line.strip()) for line in headerLines) if headerLines else 0
         if Config.debug:
             print(f"[DEBUG] buildTable col {c}: maxCellWidth={maxCellWidth}, headerWidth={headerWidth}")
@@ -368,67 +273,29 @@ def buildTable(table, data, buildHeader, dataDictionaryTable, intervals, lookupI
         else:
             finalWidth += 20
         columnWidths.append(finalWidth)
-    table.setUpdatesEnabled(False)
-    if Config.debug:
-        print("[DEBUG] buildTable: Disabled table updates for population")
-    for rowIdx, rowStr in enumerate(data):
-        rowData = rowStr.split(',')[1:] if skipDateCol else rowStr.split(',')
-        for colIdx in range(min(numCols, len(rowData))):
-            cellText = rowData[colIdx].strip() if colIdx < len(rowData) else ''
-            item = QTableWidgetItem(cellText)
-            item.setTextAlignment(Qt.AlignmentFlag.AlignCenter | Qt.AlignmentFlag.AlignVCenter)
-            if not Config.rawData and cellText.strip():
-                item.setText(Logic.valuePrecision(cellText))
-            table.setItem(rowIdx, colIdx, item)
-    table.setUpdatesEnabled(True)
-    if Config.debug:
-        print("[DEBUG] buildTable: Re-enabled table updates after population")
-    table.horizontalHeader().sectionClicked.connect(lambda col: customSortTable(table, col, dataDictionaryTable))
     header = table.horizontalHeader()
-    vHeader = table.verticalHeader()
     table.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
     table.setMinimumSize(0, 0)
-    table.update()
     header.setStretchLastSection(False)
     if Config.debug:
         print("[DEBUG] buildTable: Set stretchLastSection=False to prevent last column expansion.")
-    if dataDictionaryTable:
-        maxTimeWidth = max(metrics.horizontalAdvance(ts) for ts in timestamps)
-        vHeader.setMinimumWidth(max(120, maxTimeWidth) + 10)
     for c in range(numCols):
         table.setColumnWidth(c, columnWidths[c])
         if Config.debug:
             print(f"[DEBUG] buildTable: Set column {c} width to {columnWidths[c]}")
-    rowHeight = metrics.height() + 10
-    sampleItem = QTableWidgetItem("189.5140")
-    sampleItem.setFont(font)
-    sampleCellHeight = sampleItem.sizeHint().height()
-    if sampleCellHeight <= 0:
-        sampleCellHeight = metrics.height()
-    adjustedRowHeight = max(rowHeight, sampleCellHeight + 2)
-    if Config.debug:
-        print(f"[DEBUG] buildTable: Sample cell height: {sampleCellHeight}, Adjusted row height: {adjustedRowHeight}")
+    adjustedRowHeight = metrics.height() + 10
     vHeader.setDefaultSectionSize(adjustedRowHeight)
     if Config.debug:
         print(f"[DEBUG] buildTable: Set default row height to {adjustedRowHeight}")
     header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
-    vHeader.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
-    table.update()
+
+    # Uniform row heights keep the view from measuring every row
+    vHeader.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
     table.horizontalScrollBar().setValue(0)
-    visibleWidth = table.columnWidth(1) if numCols > 1 else 0
-    if Config.debug and numCols > 1:
-        print(f"[DEBUG] buildTable: Custom resized {numCols} columns. Text width for col 1: {metrics.horizontalAdvance(headers[1])}, Visible width: {visibleWidth}, Row height: {adjustedRowHeight}")
-    dataIds = buildHeader
-    if Config.qaqcEnabled:
-        qaqc(table, dataDictionaryTable, dataIds)
-    else:
-        for r in range(table.rowCount()):
-            for c in range(table.columnCount()):
-                item = table.item(r, c)
-                if item:
-                    item.setBackground(QColor(0, 0, 0, 0))
-        if Config.debug:
-            print("[DEBUG] buildTable: QAQC skipped, cleared cell backgrounds")
+    if Config.qaqcEnabled and runQaqc:
+        qaqc(model, dataDictionaryTable)
+    elif Config.debug:
+        print("[DEBUG] buildTable: QAQC skipped")
 
 def getDataDictionaryItem(table, dataId):
     for r in range(table.rowCount()):
@@ -437,91 +304,70 @@ def getDataDictionaryItem(table, dataId):
             return r
     return -1
 
-def qaqc(table, dataDictionaryTable, lookupIds):
+def qaqc(model, dataDictionaryTable):
+    """Flag every cell of the normal columns at once and hand the uint8 flag matrix to the model, which colors from it."""
     if not Config.qaqcEnabled:
         if Config.debug:
             print("[DEBUG] qaqc: Skipped, QAQC disabled in config")
-        for r in range(table.rowCount()):
-            for c in range(table.columnCount()):
-                item = table.item(r, c)
-                if item:
-                    item.setBackground(QColor(0, 0, 0, 0))
+        model.setFlags(None)
         return
-    now = datetime.now()
-    for col, lookupId in enumerate(lookupIds):
-        if Config.debug:
-            print("[DEBUG] qaqc: Processing column {} for lookupId {}".format(col, lookupId))
-        rowIndex = getDataDictionaryItem(dataDictionaryTable, lookupId)
-        expectedMin = None
-        expectedMax = None
-        cutoffMin = None
-        cutoffMax = None
-        rateOfChange = None
-        if rowIndex != -1:
-            expectedMinItem = dataDictionaryTable.item(rowIndex, 3)
-            if expectedMinItem and expectedMinItem.text().strip():
-                expectedMin = float(expectedMinItem.text().strip())
-            expectedMaxItem = dataDictionaryTable.item(rowIndex, 4)
-            if expectedMaxItem and expectedMaxItem.text().strip():
-                expectedMax = float(expectedMaxItem.text().strip())
-            cutoffMinItem = dataDictionaryTable.item(rowIndex, 5)
-            if cutoffMinItem and cutoffMinItem.text().strip():
-                cutoffMin = float(cutoffMinItem.text().strip())
-            cutoffMaxItem = dataDictionaryTable.item(rowIndex, 6)
-            if cutoffMaxItem and cutoffMaxItem.text().strip():
-                cutoffMax = float(cutoffMaxItem.text().strip())
-            rateOfChangeItem = dataDictionaryTable.item(rowIndex, 7)
-            if rateOfChangeItem and rateOfChangeItem.text().strip():
-                rateOfChange = float(rateOfChangeItem.text().strip())
-        prevVal = None
-        for r in range(table.rowCount()):
-            item = table.item(r, col)
-            if not item:
-                continue
-            item.setData(Qt.ItemDataRole.ForegroundRole, None)
-            cellText = item.text().strip()
-            if cellText == '':
-                tsItem = table.verticalHeaderItem(r)
-                if tsItem:
-                    tsStr = tsItem.text()
-                    try:
-                        tsDt = datetime.strptime(tsStr, '%m/%d/%y %H:%M:00')
-                        if tsDt <= now:
-                            item.setBackground(QColor(100, 195, 247))
-                    except ValueError:
-                        pass
-                continue
-            try:
-                val = float(cellText)
-            except ValueError:
-                continue
-            if rowIndex != -1:
-                if expectedMin is not None and val < expectedMin:
-                    item.setBackground(QColor(249, 240, 107))
-                    item.setData(Qt.ItemDataRole.ForegroundRole, QBrush(QColor(0, 0, 0)))
-                elif expectedMax is not None and val > expectedMax:
-                    item.setBackground(QColor(249, 194, 17))
-                    item.setData(Qt.ItemDataRole.ForegroundRole, QBrush(QColor(0, 0, 0)))
-                elif cutoffMin is not None and val < cutoffMin:
-                    item.setBackground(QColor(255, 163, 72))
-                    item.setData(Qt.ItemDataRole.ForegroundRole, None)
-                elif cutoffMax is not None and val > cutoffMax:
-                    item.setBackground(QColor(192, 28, 40))
-                    item.setData(Qt.ItemDataRole.ForegroundRole, None)
-                if rateOfChange is not None and prevVal is not None:
-                    if abs(val - prevVal) > rateOfChange:
-                        item.setBackground(QColor(246, 97, 81))
-                        item.setData(Qt.ItemDataRole.ForegroundRole, None)
-            if prevVal is not None and val == prevVal:
-                item.setBackground(QColor(87, 227, 137))
-                item.setData(Qt.ItemDataRole.ForegroundRole, QBrush(QColor(0, 0, 0)))
-            prevVal = val
+    frame = model.frame
+    flags = np.zeros(frame.values.shape, dtype=np.uint8)
+    pastNow = frame.timestamps <= TimeSeries.toEpoch(datetime.now())
+    thresholds = dictionaryThresholds(dataDictionaryTable)
+
+    for col, meta in enumerate(frame.columns):
+        if meta.get('type', 'normal') != 'normal':
+            continue
+        lookupId = meta.get('lookupId', meta.get('dataID', '')).strip()
+        missing = frame.mask[:, col]
+        present = np.flatnonzero(~missing)
+        values = frame.values[present, col]
+
+        # Rate of change and repeats compare each value with the previous one present, skipping blanks
+        previous = np.concatenate(([np.nan], values[:-1]))
+        colFlags = np.zeros(len(values), dtype=np.uint8)
+
+        if lookupId in thresholds:
+            expectedMin, expectedMax, cutoffMin, cutoffMax, rateOfChange = thresholds[lookupId]
+            checks = [(expectedMin, np.less, TableModel.flagBelowExpected), (expectedMax, np.greater, TableModel.flagAboveExpected),
+                      (cutoffMin, np.less, TableModel.flagBelowCutoff), (cutoffMax, np.greater, TableModel.flagAboveCutoff)]
+            checks = [(compare(values, limit), flag) for limit, compare, flag in checks if limit is not None]
+
+            # First failing check wins, as expected limits sit inside the cutoffs
+            if checks:
+                colFlags = np.select([failed for failed, _ in checks], [flag for _, flag in checks], 0).astype(np.uint8)
+            if rateOfChange is not None:
+                colFlags[np.abs(values - previous) > rateOfChange] = TableModel.flagRateOfChange
+        colFlags[values == previous] = TableModel.flagRepeat
+        flags[present, col] = colFlags
+        flags[missing & pastNow, col] = TableModel.flagMissing
+
         if Config.debug:
-            print("[DEBUG] qaqc: Processed column {} for lookupId {}".format(col, lookupId))
+            print("[DEBUG] qaqc: Flagged {} of {} cells in column {} for lookupId {}".format(np.count_nonzero(flags[:, col]), frame.rowCount(), col, lookupId))
+    model.setFlags(flags)
 
-def customSortTable(table, col, dataDictionaryTable):
-    pool = QThreadPool.globalInstance()
-    if pool.activeThreadCount() > 0:
+def dictionaryThresholds(dataDictionaryTable):
+    """lookupId -> (expected min, expected max, cutoff min, cutoff max, rate of change) from the data dictionary, None where blank."""
+    thresholds = {}
+
+    for r in range(dataDictionaryTable.rowCount()):
+        item = dataDictionaryTable.item(r, 0)
+        if not item or item.text().strip() in thresholds:
+            continue
+        limits = []
+        for c in range(3, 8):
+            limitItem = dataDictionaryTable.item(r, c)
+            limits.append(float(limitItem.text().strip()) if limitItem and limitItem.text().strip() else None)
+        thresholds[item.text().strip()] = tuple(limits)
+    return thresholds
+
+def frameLoading(frame):
+    """True while a query is still filling frame's columns; sorting now would misplace the rows still to come."""
+    return any(meta.get('state') == 'loading' for meta in frame.columns)
+
+def customSortTable(table, col, dataDictionaryTable, frame):
+    if frame is None or col >= frame.columnCount() or frameLoading(frame):
         return
     table.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
     header = table.horizontalHeader()
@@ -531,68 +377,216 @@ def customSortTable(table, col, dataDictionaryTable):
     else:
         Config.sortState[col] = not Config.sortState[col]
     ascending = Config.sortState[col]
-    numRows = table.rowCount()
-    rows = []
-    for rowIdx in range(numRows):
-        timestamp = table.verticalHeaderItem(rowIdx).text() if table.verticalHeaderItem(rowIdx) else ''
-        rowData = [table.item(rowIdx, c).text() if table.item(rowIdx, c) else '' for c in range(table.columnCount())]
-        rows.append([timestamp] + rowData)
     pool = QThreadPool.globalInstance()
-    worker = sortWorker(rows, col, ascending)
-    worker.signals.sortDone.connect(lambda sortedRows, asc: updateTableAfterSort(table, sortedRows, asc, dataDictionaryTable, col))
+    worker = sortWorker(frame.column(col).copy(), ascending)
+    worker.signals.sortDone.connect(lambda order, asc: updateTableAfterSort(table, order, asc, dataDictionaryTable))
     pool.start(worker)
     header.setSortIndicator(col, Qt.SortOrder.AscendingOrder if ascending else Qt.SortOrder.DescendingOrder)
 
-def updateTableAfterSort(table, sortedRows, ascending, dataDictionaryTable, col):
-    table.setSortingEnabled(False)
-    for rowIdx, row in enumerate(sortedRows):
-        table.setVerticalHeaderItem(rowIdx, QTableWidgetItem(row[0]))
-        for c in range(table.columnCount()):
-            cellText = row[c + 1] if c + 1 < len(row) else ''
-            item = QTableWidgetItem(cellText)
-            item.setTextAlignment(Qt.AlignmentFlag.AlignCenter | Qt.AlignmentFlag.AlignVCenter)
-            if not Config.rawData and cellText.strip():
-                item.setText(Logic.valuePrecision(cellText))
-            table.setItem(rowIdx, c, item)
+def updateTableAfterSort(table, order, ascending, dataDictionaryTable):
+    model = table.model()
+    model.reorderRows(order)
     if Config.debug:
         print("[DEBUG] Updated table after sort; widths not locked.")
-    headerLabels = [table.horizontalHeaderItem(c).text() for c in range(table.columnCount())]
-    dataIds = [label.split('\n')[-1].strip() for label in headerLabels]
     if Config.qaqcEnabled:
-        qaqc(table, dataDictionaryTable, dataIds)
-    else:
-        for r in range(table.rowCount()):
-            for c in range(table.columnCount()):
-                item = table.item(r, c)
-                if item:
-                    item.setBackground(QColor(0, 0, 0, 0))
-        if Config.debug:
-            print("[DEBUG] updateTableAfterSort: QAQC skipped, cleared cell backgrounds")
+        qaqc(model, dataDictionaryTable)
+    elif Config.debug:
+        print("[DEBUG] updateTableAfterSort: QAQC skipped")
     table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
 
-def timestampSortTable(table, dataDictionaryTable):
+def timestampSortTable(table, dataDictionaryTable, frame):
     if Config.debug:
         print("[DEBUG] timestampSortTable: Starting sort by timestamps.")
-    numRows = table.rowCount()
-    rows = []
-    for rowIdx in range(numRows):
-        timestamp = table.verticalHeaderItem(rowIdx).text() if table.verticalHeaderItem(rowIdx) else ''
-        rowData = [table.item(rowIdx, c).text() if table.item(rowIdx, c) else '' for c in range(table.columnCount())]
-        rows.append([timestamp] + rowData)
-    def sortKey(row):
-        try:
-            return datetime.strptime(row[0], '%m/%d/%y %H:%M:00')
-        except ValueError:
-            return datetime.min
-    rows.sort(key=sortKey)
+    if frame is None or frameLoading(frame):
+        return
     pool = QThreadPool.globalInstance()
-    worker = sortWorker(rows, -1, True)
-    worker.signals.sortDone.connect(lambda sortedRows, asc: updateTableAfterSort(table, sortedRows, asc, dataDictionaryTable, -1))
+    worker = sortWorker(frame.timestamps.copy(), True)
+    worker.signals.sortDone.connect(lambda order, asc: updateTableAfterSort(table, order, asc, dataDictionaryTable))
     pool.start(worker)
     if Config.debug:
         print("[DEBUG] Timestamp sort worker started.")
 
+class queryController(QObject):
+    """Runs one query: lays out the table up front, starts a worker per group and fills in columns as their signals arrive."""
+    finished = pyqtSignal(object)
+    timeoutSeconds = 600
+
+    def __init__(self, mainWindow, queryItems, isInternal, dataDictionaryTable, plan, deltaChecked, overlayChecked):
+        super().__init__(mainWindow)
+        self.mainWindow = mainWindow
+        self.queryItems = queryItems
+        self.startDate = plan.startDate
+        self.endDate = plan.endDate
+        self.isInternal = isInternal
+        self.dataDictionaryTable = dataDictionaryTable
+        self.plan = plan
+        self.timestamps = plan.timestamps
+        self.groups = plan.groups
+        self.deltaChecked = deltaChecked
+        self.overlayChecked = overlayChecked
+        self.defaultBlanks = np.full(len(self.timestamps), np.nan, dtype=np.float64)
+        self.labelsDict = {} if isInternal else None
+        self.requestKeys = [(dataID, db, Planner.resolveInterval(interval, db), mrid) for dataID, interval, db, mrid, _ in queryItems]
+        self.frame = None
+        self.pendingGroups = set(self.groups.keys())
+        self.numGroups = len(self.groups)
+        self.workers = []
+        self.cancelToken = Scheduler.cancelToken()
+        self.done = False
+        self.progressDialog = None
+        self.timeoutTimer = QTimer(self)
+        self.timeoutTimer.setSingleShot(True)
+        self.timeoutTimer.timeout.connect(self.onTimeout)
+
+    def start(self):
+        estimate = f"~{self.plan.pointCount():,} points, {self.plan.requestCount():,} requests"
+        self.progressDialog = QProgressDialog(f"Querying data... (0/{self.numGroups} complete, {estimate})", "Cancel", 0, 100, self.mainWindow)
+        self.progressDialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self.progressDialog.setAutoReset(False)
+        self.progressDialog.setAutoClose(False)
+        self.progressDialog.setFixedSize(400, 100)
+        self.progressDialog.setWindowFlags(Qt.WindowType.Dialog | Qt.WindowType.MSWindowsFixedSizeDialogHint)
+        self.progressDialog.canceled.connect(self.cancel)
+        self.progressDialog.setValue(20)
+        self.progressDialog.show()
+        self.buildFrame()
+        pool = QThreadPool.globalInstance()
+
+        for i, groupKey in enumerate(self.groups.keys()):
+            signals = queryWorkerSignals()
+            signals.resultSignal.connect(self.handleResult)
+            worker = queryWorker(groupKey, self.groups[groupKey], signals, self.startDate, self.endDate, self.isInternal, self.timestamps, self.defaultBlanks, self.cancelToken)
+            worker.setAutoDelete(False)
+            self.workers.append(worker)
+            pool.start(worker)
+
+            if Config.debug:
+                print(f"[DEBUG] queryController: Started background worker {i} for group {groupKey}")
+        self.timeoutTimer.start(self.timeoutSeconds * 1000)
+
+    def buildFrame(self):
+        """Show the final column layout straight away, every column blank and loading until its group reports."""
+        lookupIds = [item[0].split('-')[0] if item[2].startswith('USBR-') and '-' in item[0] else item[0] for item in self.queryItems]
+        frame = TimeSeries.resultFrame(self.timestamps, len(self.queryItems))
+
+        for col, (dataID, interval, db, mrid, origIndex) in enumerate(self.queryItems):
+            queryInfo = f"{dataID}|{interval}|{db}"
+            frame.columns[col].update(dataID=dataID, db=db, interval=interval, mrid=mrid, lookupId=lookupIds[col], label=None, backend=None,
+                                      state='loading', type='normal', dataIds=[lookupIds[col]], dbs=[db], queryInfos=[queryInfo])
+        buildHeaders(frame, self.dataDictionaryTable, self.labelsDict)
+        mainWindow = self.mainWindow
+
+        # Add tab before building table
+        if mainWindow.tabWidget.indexOf(mainWindow.tabMain) == -1:
+            mainWindow.tabWidget.addTab(mainWindow.tabMain, 'Data Query')
+        buildTable(mainWindow.mainTable, frame, self.dataDictionaryTable, runQaqc=False)
+        mainWindow.resultFrame = frame
+        mainWindow.columnMetadata = frame.columns
+        self.frame = frame
+
+        if Config.debug:
+            print(f"[DEBUG] queryController: Laid out frame with {frame.rowCount()} rows, {frame.columnCount()} columns")
+
+    def handleResult(self, result):
+        groupKey, groupResult, groupLabels, groupBackends, groupStates = result
+
+        if self.done:
+            if Config.debug:
+                print(f"[DEBUG] queryController: Ignoring result for group {groupKey}, query already finished")
+            return
+        if groupKey not in self.pendingGroups:
+            if Config.debug:
+                print(f"[DEBUG] queryController: Duplicate group {groupKey}, skipping")
+            return
+        self.pendingGroups.discard(groupKey)
+        collected = self.numGroups - len(self.pendingGroups)
+
+        if groupLabels and self.labelsDict is not None:
+            self.labelsDict.update(groupLabels)
+        filled = []
+
+        # Every column sharing a request key is filled from the one fetched series
+        for col, requestKey in enumerate(self.requestKeys):
+            if requestKey in groupResult:
+                self.frame.setColumn(col, groupResult[requestKey], backend=groupBackends.get(requestKey),
+                                     state=groupStates.get(requestKey, 'ok'), label=self.labelsDict.get(requestKey[0]) if self.labelsDict else None)
+                filled.append(col)
+        if groupLabels:
+            buildHeaders(self.frame, self.dataDictionaryTable, self.labelsDict)
+        model = self.mainWindow.mainTable.model()
+        if isinstance(model, TableModel.resultTableModel) and model.frame is self.frame:
+            model.refreshColumns(filled)
+
+        if Config.debug:
+            print(f"[DEBUG] queryController: Filled {len(filled)} columns from group {groupKey} ({collected}/{self.numGroups})")
+        self.progressDialog.setValue(20 + int(50 * collected / self.numGroups))
+        self.progressDialog.setLabelText(f"Completed {groupKey[0]} query ({collected}/{self.numGroups})")
+
+        if not self.pendingGroups:
+            self.finish()
+
+    def cancel(self):
+        """Stop the query: drop workers that have not started and cancel the token, which aborts their downloads in flight."""
+        if self.done:
+            return
+        self.cancelToken.cancel()
+        pool = QThreadPool.globalInstance()
+
+        for worker in self.workers:
+            pool.tryTake(worker)
+        if Config.debug:
+            print(f"[DEBUG] queryController: Canceled with {len(self.pendingGroups)}/{self.numGroups} groups outstanding")
+        if self.frame is not None:
+            canceled = [col for col, meta in enumerate(self.frame.columns) if meta.get('state') == 'loading']
+            for col in canceled:
+                self.frame.columns[col]['state'] = 'canceled'
+            model = self.mainWindow.mainTable.model()
+            if isinstance(model, TableModel.resultTableModel) and model.frame is self.frame:
+                model.refreshColumns(canceled)
+        self.close()
+
+    def onTimeout(self):
+        print(f"[WARN] Query timeout after {self.timeoutSeconds} seconds; some data may be missing")
+        self.cancel()
+        QMessageBox.warning(self.mainWindow, "Query Timeout", "Query timed out; some data may be missing.")
+
+    def close(self):
+        self.done = True
+        self.timeoutTimer.stop()
+
+        if self.progressDialog:
+            self.progressDialog.canceled.disconnect(self.cancel)
+            self.progressDialog.close()
+            self.progressDialog.deleteLater()
+        if getattr(self.mainWindow, 'queryController', None) is self:
+            self.mainWindow.queryController = None
+        self.workers = []
+
+        # Parented to the main window, so without this every query would leave a controller and its connections behind
+        self.deleteLater()
+
+    def finish(self):
+        if Config.debug:
+            print(f"[DEBUG] queryController: All {self.numGroups} groups merged")
+        self.progressDialog.setLabelText("Building table...")
+        self.progressDialog.setValue(70)
+        frame = self.frame
+        mainWindow = self.mainWindow
+
+        # Modify frame if query tools are checked, then rebuild the table so widths and QAQC see the data
+        if self.deltaChecked or self.overlayChecked:
+            QueryUtils.modifyFrame(frame, self.deltaChecked, self.overlayChecked)
+        buildTable(mainWindow.mainTable, frame, self.dataDictionaryTable)
+        mainWindow.resultFrame = frame
+        mainWindow.columnMetadata = frame.columns
+
+        if Config.debug:
+            print("[DEBUG] queryController: Set columnMetadata with {} entries".format(len(mainWindow.columnMetadata)))
+        self.close()
+        self.finished.emit(frame)
+
 def executeQuery(mainWindow, queryItems, startDate, endDate, isInternal, dataDictionaryTable, deltaChecked=False, overlayChecked=False):
+    """Validate and group the query, then hand it to a queryController; returns the controller (or None) without waiting."""
     Config.deltaChecked = deltaChecked
     Config.overlayChecked = overlayChecked
 
@@ -606,248 +600,33 @@ def executeQuery(mainWindow, queryItems, startDate, endDate, isInternal, dataDic
         QMessageBox.warning(mainWindow, "No Valid Items", "No valid query items (AQUARIUS not allowed in public queries).")
         if Config.debug:
             print("[DEBUG] executeQuery: No valid items after filtering, aborting")
-        return
-    progressDialog = QProgressDialog(f"Querying data... (0/{len(set(item[2] for item in queryItems))} complete)", "Cancel", 0, 100, mainWindow)
-    progressDialog.setWindowModality(Qt.WindowModality.WindowModal)
-    progressDialog.setAutoReset(False)
-    progressDialog.setAutoClose(False)
-    progressDialog.setFixedSize(400, 100)
-    progressDialog.setWindowFlags(Qt.WindowType.Dialog | Qt.WindowType.MSWindowsFixedSizeDialogHint)
-    progressDialog.show()
-    progressDialog.setValue(10)
-    progressDialog.repaint()
-    if Config.debug:
-        print("[DEBUG] executeQuery: Initialized and showed progress dialog")
+        return None
     queryItems.sort(key=lambda x: x[4])
-    firstInterval = queryItems[0][1]
-    firstDb = queryItems[0][2]
-    if firstInterval == 'INSTANT':
-        if firstDb.startswith('USBR-'):
-            firstInterval = 'INSTANT:60'
-        elif firstDb == 'USGS-NWIS':
-            firstInterval = 'INSTANT:15'
-        elif firstDb == 'AQUARIUS':
-            firstInterval = 'INSTANT:1'
-    timestamps = buildTimestamps(startDate, endDate, firstInterval)
-    if not timestamps:
-        progressDialog.cancel()
+    plan = Planner.buildPlan(queryItems, startDate, endDate)
+    if plan is None:
         QMessageBox.warning(mainWindow, "Date Error", "Invalid dates or interval.")
-        return
-    progressDialog.setValue(20)
-    progressDialog.repaint()
-    QCoreApplication.processEvents()
-    if Config.debug:
-        print("[DEBUG] executeQuery: Setup complete, progress at 20%")
-    defaultBlanks = [''] * len(timestamps)
-    labelsDict = {} if isInternal else None
-    groups = defaultdict(list)
-    for dataID, interval, db, mrid, origIndex in queryItems:
-        if interval == 'INSTANT':
-            if db.startswith('USBR-'):
-                interval = 'INSTANT:60'
-            elif db == 'USGS-NWIS':
-                interval = 'INSTANT:15'
-            elif db == 'AQUARIUS':
-                interval = 'INSTANT:1'
-        groupKey = (db.split('-')[0] if db.startswith('USBR-') else db, None, None)
-        SDID = dataID.split('-')[0] if db.startswith('USBR-') and '-' in dataID else dataID
-        groups[groupKey].append((origIndex, dataID, SDID, db, interval, mrid))
-    pool = QThreadPool.globalInstance()
-    resultQueue = queue.Queue()
-    maxDbThreads = 3
-    numGroups = len(groups)
-    numThreads = min(maxDbThreads, numGroups)
-    if Config.debug:
-        print(f"[DEBUG] Starting {numThreads} threads for {numGroups} groups in background")
-    threadsStarted = 0
-    valueDict = {}
-    collected = 0
-    processedGroups = set()
-
-    def handleResult(result):
-        nonlocal collected
-        groupKey, groupResult, groupLabels = result
-        if groupKey in processedGroups:
-            if Config.debug:
-                print(f"[DEBUG] executeQuery: Duplicate group {groupKey}, skipping")
-            return
-        processedGroups.add(groupKey)
-        if all(all(v == '' for v in values) for values in groupResult.values()):
-            if Config.debug:
-                print(f"[DEBUG] executeQuery: Skipping empty group {groupKey}, no data")
-            collected += 1
-            if not progressDialog.wasCanceled():
-                progressDialog.setValue(20 + int(50 * collected / numGroups))
-                progressDialog.setLabelText(f"Completed {groupKey[0]} query ({collected}/{numGroups})")
-                progressDialog.repaint()
-                QCoreApplication.processEvents()
-            return
-        valueDict.update(groupResult)
-        if groupLabels and labelsDict is not None:
-            labelsDict.update(groupLabels)
-            if Config.debug:
-                print(f"[DEBUG] executeQuery: Updated labelsDict with {list(groupLabels.keys())}")
-        collected += 1
-        if Config.debug:
-            print(f"[DEBUG] executeQuery: Collected results for group {groupKey} with {len(groupResult)} items ({collected}/{numGroups})")
-        if not progressDialog.wasCanceled():
-            progressDialog.setValue(20 + int(50 * collected / numGroups))
-            progressDialog.setLabelText(f"Completed {groupKey[0]} query ({collected}/{numGroups})")
-            progressDialog.repaint()
-            QCoreApplication.processEvents()
-
-    for i, groupKey in enumerate(groups.keys()):
-        signals = queryWorkerSignals()
-        worker = queryWorker(groupKey, groups[groupKey], signals, startDate, endDate, isInternal, timestamps, defaultBlanks)
-        signals.resultSignal.connect(lambda result, i=i: [print(f"[DEBUG] executeQuery: Signal received for group {result[0]}") if Config.debug else None, resultQueue.put(result), handleResult(result)][-1])
-        pool.start(worker)
-        threadsStarted += 1
-        if Config.debug:
-            print(f"[DEBUG] Started background worker {i} for group {groupKey}")
-    if not progressDialog.wasCanceled():
-        progressDialog.setValue(20)
-        progressDialog.setLabelText(f"Querying data... (0/{numGroups} complete)")
-        progressDialog.repaint()
-    timeoutSeconds = 600
-    startTime = time.time()
-    timer = QTimer()
-    timer.setSingleShot(False)
-
-    def checkQueueAndProgress():
-        nonlocal collected
-        elapsed = time.time() - startTime
-        if collected >= numGroups and resultQueue.empty() and pool.activeThreadCount() == 0 or elapsed > timeoutSeconds:
-            timer.stop()
-            if elapsed > timeoutSeconds:
-                if Config.debug:
-                    print(f"[DEBUG] executeQuery: Timeout after {timeoutSeconds} seconds, collected {collected}/{numGroups}")
-                print(f"[WARN] Query timeout after {timeoutSeconds} seconds; some data may be missing")
-                progressDialog.cancel()
-                QMessageBox.warning(mainWindow, "Query Timeout", "Query timed out; some data may be missing.")
-                return
-        if not progressDialog.wasCanceled():
-            while not resultQueue.empty():
-                try:
-                    result = resultQueue.get_nowait()
-                    if Config.debug:
-                        print(f"[DEBUG] executeQuery: Retrieved result from queue: {result[0]}")
-                    handleResult(result)
-                except queue.Empty:
-                    break
-            progressDialog.setLabelText(f"Querying data... ({collected}/{numGroups} complete)")
-            progressDialog.repaint()
-            QCoreApplication.processEvents()
+        return None
 
-    timer.timeout.connect(checkQueueAndProgress)
-    timer.start(100)
-    if Config.debug:
-        print("[DEBUG] executeQuery: Started timer for progress updates")
-    while (collected < numGroups or not resultQueue.empty() or pool.activeThreadCount() > 0) and not progressDialog.wasCanceled():
-        time.sleep(0.05)
-        QCoreApplication.processEvents()
-    if collected >= numGroups:
-        while not resultQueue.empty():
-            try:
-                result = resultQueue.get_nowait()
-                if Config.debug:
-                    print(f"[DEBUG] executeQuery: Processed extra queued result, collected {collected}/{numGroups}, queue size {resultQueue.qsize()}")
-                handleResult(result)
-            except queue.Empty:
-                break
-        maxRetries = 5
-        retryCount = 0
-        while not resultQueue.empty() and retryCount < maxRetries:
-            try:
-                result = resultQueue.get_nowait()
-                if Config.debug:
-                    print(f"[DEBUG] executeQuery: Processed final queued result, collected {collected}/{numGroups}, queue size {resultQueue.qsize()}")
-                handleResult(result)
-            except queue.Empty:
-                break
-            retryCount += 1
-        if retryCount >= maxRetries:
-            if Config.debug:
-                print(f"[DEBUG] executeQuery: Max retries ({maxRetries}) reached for final queue flush, queue size {resultQueue.qsize()}")
-    timer.stop()
-    if Config.debug:
-        print(f"[DEBUG] executeQuery: Timer stopped, wait loop ended, final collected {collected}/{numGroups}, queue size {resultQueue.qsize()}, active threads {pool.activeThreadCount()}")
-    QCoreApplication.processEvents()
-    if progressDialog.wasCanceled():
-        if Config.debug:
-            print(f"[DEBUG] executeQuery: User canceled via progress dialog")
-        progressDialog.cancel()
-        return
-    if Config.debug:
-        print(f"[DEBUG] executeQuery: All {collected} groups merged")
-    progressDialog.setLabelText("Merging results...")
-    progressDialog.setValue(70)
-    progressDialog.repaint()
-    QCoreApplication.processEvents()
-    for dataID, _, _, _, _ in queryItems:
-        if dataID not in valueDict:
-            valueDict[dataID] = defaultBlanks
+    # Pre-flight: let the user trim a very large query before anything is downloaded
+    if plan.isLarge():
+        reply = QMessageBox.question(mainWindow, "Large Query", f"{plan.summary()}\n\nRun this query?",
+                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No)
+        if reply != QMessageBox.StandardButton.Yes:
             if Config.debug:
-                print(f"[DEBUG] Added empty result for dataID {dataID}")
-    originalDataIds = [item[0] for item in queryItems]
-    originalIntervals = [item[1] for item in queryItems]
-    databases = [item[2] for item in queryItems]
-    lookupIds = [item[0].split('-')[0] if item[2].startswith('USBR-') and '-' in item[0] else item[0] for item in queryItems]
-    data = []
-    for r in range(len(timestamps)):
-        rowValues = [valueDict.get(dataID, defaultBlanks)[r] for dataID in originalDataIds]
-        data.append("{},{}".format(timestamps[r], ','.join(rowValues)))
-        if r % 100 == 0:
-            progressDialog.setLabelText(f"Building rows... ({r}/{len(timestamps)} rows)")
-            progressDialog.setValue(72 + int(28 * r / len(timestamps)))
-            progressDialog.repaint()
-            QCoreApplication.processEvents()
-        if Config.debug:
-            print(f"[DEBUG] executeQuery: Building row {r}/{len(timestamps)}")
-    if Config.debug:
-        print(f"[DEBUG] executeQuery: Built {len(data)} rows for table")
-    if not progressDialog.wasCanceled():
-        progressDialog.setLabelText("Building table...")
-        progressDialog.setValue(70)
-        progressDialog.repaint()
-        QCoreApplication.processEvents()
-        mainWindow.mainTable.clear()
-
-        # Add tab before building table
-        if mainWindow.tabWidget.indexOf(mainWindow.tabMain) == -1:
-            mainWindow.tabWidget.addTab(mainWindow.tabMain, 'Data Query')
-
-        # Build the table
-        buildTable(mainWindow.mainTable, data, originalDataIds, dataDictionaryTable, originalIntervals, lookupIds, labelsDict, databases, queryItems=queryItems)
+                print("[DEBUG] executeQuery: User declined large query")
+            return None
 
-        # Modify table if query tools are checked
-        if deltaChecked or overlayChecked:
-            QueryUtils.modifyTable(mainWindow.mainTable, deltaChecked, overlayChecked, databases, queryItems, labelsDict, dataDictionaryTable, originalIntervals, lookupIds, mainWindow=mainWindow)
-        else:
-            mainWindow.columnMetadata = []
-            
-            for i in range(mainWindow.mainTable.columnCount()):
-                mainWindow.columnMetadata.append({
-                    'type': 'normal',
-                    'dataIds': [lookupIds[i]],
-                    'dbs': [databases[i]],
-                    'queryInfos': [f"{queryItems[i][0]}|{queryItems[i][1]}|{queryItems[i][2]}"]
-                })
-            if Config.debug:
-                print("[DEBUG] executeQuery: Set normal columnMetadata with {} entries".format(len(mainWindow.columnMetadata)))
+    # One worker per (db, interval, mrid); their fetch tasks share the Scheduler's per-host budgets
+    # A new query replaces one still in flight; its results would be overwritten anyway
+    previous = getattr(mainWindow, 'queryController', None)
+    if previous is not None:
+        if Config.debug:
+            print("[DEBUG] executeQuery: Canceling previous query still in flight")
+        previous.cancel()
+    controller = queryController(mainWindow, queryItems, isInternal, dataDictionaryTable, plan, deltaChecked, overlayChecked)
+    mainWindow.queryController = controller
 
-        progressDialog.setValue(72)
-        progressDialog.repaint()
-        QCoreApplication.processEvents()
     if Config.debug:
-        print(f"[DEBUG] executeQuery: Table built, progress dialog completed")
-    if progressDialog.wasCanceled():
-        if Config.debug:
-            print(f"[DEBUG] executeQuery: User canceled during table building")
-        progressDialog.cancel()
-        return
-    if mainWindow.tabWidget.indexOf(mainWindow.tabMain) == -1:
-        mainWindow.tabWidget.addTab(mainWindow.tabMain, 'Data Query')
-        if Config.debug:
-            print("[DEBUG] Query executed and table updated.")
-    progressDialog.cancel()
-    QCoreApplication.processEvents()
\ No newline at end of file
+        print(f"[DEBUG] executeQuery: Starting {len(plan.groups)} groups in background")
+    controller.start()
+    return controller
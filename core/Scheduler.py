@@ -0,0 +1,210 @@
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from core import Config, Http
+
+# One executor for every provider's fetch tasks (a USBR batch, a USGS request, an Aquarius chunk).
+# Each budget (normally a host) may only have its limit of tasks running; the rest wait in a per-budget
+# queue, so a slow host never ties up workers that another host could use. A budget may sit inside a
+# parent budget (an HDB server inside www.usbr.gov); its tasks then count against both limits.
+executor = None
+schedulerLock = threading.Lock()
+pending = defaultdict(deque)
+running = defaultdict(int)
+limits = {}
+parents = {} # budget -> enclosing budget
+
+class canceledError(Exception):
+    """Raised in fetch code once its query's cancelToken is canceled."""
+
+class cancelToken:
+    """One query's cancel switch, passed down into the provider reads.
+
+    Fetch code calls check() between batches and chunks and registers callbacks that abort work in flight
+    (queued futures, open downloads, Oracle calls); cancel() runs them all from the UI thread.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.callbacks = set()
+        self.signal = Future() # Done once canceled, so waits can return without their task
+
+    def isCanceled(self):
+        return self.signal.done()
+
+    def check(self):
+        if self.signal.done():
+            raise canceledError("Query canceled")
+
+    def add(self, callback):
+        """Run callback on cancel (at once if already canceled); returns it for discard()."""
+        with self.lock:
+            if not self.signal.done():
+                self.callbacks.add(callback)
+                return callback
+        callback()
+        return callback
+
+    def discard(self, callback):
+        with self.lock:
+            self.callbacks.discard(callback)
+
+    def cancel(self):
+        with self.lock:
+            if self.signal.done():
+                return
+            self.signal.set_result(True)
+            callbacks = list(self.callbacks)
+            self.callbacks.clear()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                if Config.debug:
+                    print(f"[DEBUG] cancelToken.cancel: Abort callback failed: {e}")
+        if Config.debug:
+            print(f"[DEBUG] cancelToken.cancel: Ran {len(callbacks)} abort callbacks")
+
+def getExecutor():
+    global executor
+
+    with schedulerLock:
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=Config.schedulerMaxWorkers, thread_name_prefix='DataDoctorFetch')
+        return executor
+
+def submit(url, fn, *args, **kwargs):
+    """Queue fn(*args, **kwargs) against the URL's host budget; returns a concurrent.futures.Future.
+
+    Tasks must not wait on other scheduler futures themselves, or a full host budget could deadlock.
+    """
+    host = Http.hostKey(url)
+    return submitTo(host, Http.maxConnections(host), fn, *args, **kwargs)
+
+def submitTo(budget, limit, fn, *args, **kwargs):
+    """Queue fn against a named budget that runs at most limit tasks at once, e.g. one HDB server behind a shared host."""
+    future = Future()
+
+    with schedulerLock:
+        limits[budget] = limit
+        pending[budget].append((future, fn, args, kwargs))
+    dispatch(budget)
+    return future
+
+def nest(budget, parent, parentLimit):
+    """Count budget's tasks against parent's limit too, so sub-budgets sharing a host cannot together exceed it."""
+    with schedulerLock:
+        parents[budget] = parent
+        limits[parent] = parentLimit
+
+def chain(budget):
+    """The budget and every budget enclosing it, innermost first."""
+    budgets = [budget]
+
+    while budgets[-1] in parents:
+        budgets.append(parents[budgets[-1]])
+    return budgets
+
+def dispatch(budget):
+    """Start queued tasks wherever a whole budget chain has room, across every budget under the same root."""
+    ready = []
+
+    with schedulerLock:
+        root = chain(budget)[-1]
+        family = [queued for queued in pending if chain(queued)[-1] == root]
+        started = True
+
+        # One task per budget per pass, so sub-budgets sharing a parent take turns
+        while started:
+            started = False
+
+            for queued in family:
+                budgets = chain(queued)
+
+                if pending[queued] and all(running[b] < limits[b] for b in budgets):
+                    task = pending[queued].popleft()
+                    started = True
+
+                    # Skip tasks whose future was canceled while queued
+                    if task[0].set_running_or_notify_cancel():
+                        for b in budgets:
+                            running[b] += 1
+                        ready.append((queued, task))
+    for queued, (future, fn, args, kwargs) in ready:
+        getExecutor().submit(runTask, queued, future, fn, args, kwargs)
+
+def runTask(budget, future, fn, args, kwargs):
+    try:
+        future.set_result(fn(*args, **kwargs))
+    except BaseException as e:
+        future.set_exception(e)
+    finally:
+        with schedulerLock:
+            for b in chain(budget):
+                running[b] -= 1
+        dispatch(budget)
+
+def results(futures, cancel=None):
+    """Wait for futures in order and return their results; a failed task yields None after logging.
+
+    With a cancelToken, queued futures are dropped on cancel and canceledError is raised without waiting for tasks still running.
+    """
+    if cancel is None:
+        output = []
+
+        for future in futures:
+            try:
+                output.append(future.result())
+            except Exception as e:
+                print(f"[ERROR] Scheduler task failed: {e}")
+                output.append(None)
+        return output
+    callbacks = [cancel.add(future.cancel) for future in futures]
+    output = []
+
+    try:
+        for future in futures:
+            wait([future, cancel.signal], return_when=FIRST_COMPLETED)
+            cancel.check()
+            try:
+                output.append(future.result())
+            except Exception as e:
+                print(f"[ERROR] Scheduler task failed: {e}")
+                output.append(None)
+        return output
+    finally:
+        for callback in callbacks:
+            cancel.discard(callback)
+
+def nextResult(futures, cancel=None):
+    """Wait for whichever of futures finishes first and return (future, result); a failed task yields None, as in results()."""
+    callbacks = [cancel.add(future.cancel) for future in futures] if cancel is not None else []
+
+    try:
+        waitOn = list(futures) + ([cancel.signal] if cancel is not None else [])
+        done, _ = wait(waitOn, return_when=FIRST_COMPLETED)
+        if cancel is not None:
+            cancel.check()
+        future = next(future for future in futures if future in done)
+        try:
+            return future, future.result()
+        except Exception as e:
+            print(f"[ERROR] Scheduler task failed: {e}")
+            return future, None
+    finally:
+        for callback in callbacks:
+            cancel.discard(callback)
+
+def shutdown():
+    global executor
+
+    with schedulerLock:
+        for queued in pending.values():
+            for future, _, _, _ in queued:
+                future.cancel()
+            queued.clear()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+            executor = None
+
+    if Config.debug:
+        print("[DEBUG] Scheduler.shutdown: Executor stopped")
@@ -0,0 +1,255 @@
+import time
+import bisect
+import numpy as np
+from PyQt6.QtCore import Qt, QThreadPool, QRunnable, pyqtSignal, QObject, QAbstractTableModel, QModelIndex
+from PyQt6.QtGui import QKeySequence, QShortcut
+from PyQt6.QtWidgets import QComboBox, QPushButton, QLabel, QPlainTextEdit, QTableView
+from core import Config, Oracle, USBR, Utils
+
+pageSize = 1000 # Rows per fetch round trip as the view scrolls
+
+class sqlTaskSignals(QObject):
+    done = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+class sqlTask(QRunnable):
+    """Run one blocking Oracle call off the UI thread and report back through signals."""
+    def __init__(self, fn):
+        super().__init__()
+        self.fn = fn
+        self.signals = sqlTaskSignals()
+
+    def run(self):
+        try:
+            result = self.fn()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.done.emit(result)
+
+class sqlResultModel(QAbstractTableModel):
+    """Rows of an open cursor held as columnar pages; more pages are requested as the view scrolls."""
+    def __init__(self, console, parent=None):
+        super().__init__(parent)
+        self.console = console
+        self.names = []
+        self.pages = []
+        self.offsets = []
+        self.rows = 0
+
+    def reset(self, names=None):
+        self.beginResetModel()
+        self.names = names or []
+        self.pages = []
+        self.offsets = []
+        self.rows = 0
+        self.endResetModel()
+
+    def addPage(self, page):
+        count = page.rowCount()
+
+        if not count:
+            return
+        self.beginInsertRows(QModelIndex(), self.rows, self.rows + count - 1)
+        self.pages.append(page)
+        self.offsets.append(self.rows)
+        self.rows += count
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.names)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.console.hasMore()
+
+    def fetchMore(self, parent=QModelIndex()):
+        self.console.fetchPage()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        pageIndex = bisect.bisect_right(self.offsets, index.row()) - 1
+        page = self.pages[pageIndex]
+        row = index.row() - self.offsets[pageIndex]
+        col = index.column()
+
+        if page.masks[col][row]:
+            return ''
+        return formatValue(page.arrays[col][row])
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.names[section] if section < len(self.names) else None
+        return str(section + 1)
+
+def formatValue(value):
+    if isinstance(value, np.floating):
+        return str(int(value)) if value.is_integer() and abs(value) < 1e15 else str(value)
+    if isinstance(value, np.datetime64):
+        return str(value).replace('T', ' ')
+    return str(value)
+
+class sqlConsole(QObject):
+    """SQL tab: runs a statement on a pooled connection in the background and pages rows into the view on demand."""
+    def __init__(self, mainWindow, tab):
+        super().__init__(mainWindow)
+        self.mainWindow = mainWindow
+        self.cbSqlServer = tab.findChild(QComboBox, 'cbSqlServer')
+        self.btnSqlRun = tab.findChild(QPushButton, 'btnSqlRun')
+        self.btnSqlCancel = tab.findChild(QPushButton, 'btnSqlCancel')
+        self.lblSqlStatus = tab.findChild(QLabel, 'lblSqlStatus')
+        self.txtSql = tab.findChild(QPlainTextEdit, 'txtSql')
+        self.sqlTable = tab.findChild(QTableView, 'sqlTable')
+        self.model = sqlResultModel(self, self)
+        self.sqlTable.setModel(self.model)
+        self.oracleConn = None
+        self.cursor = None
+        self.exhausted = True
+        self.task = None
+        self.canceled = False
+        self.closed = False
+        self.executeSeconds = 0.0
+        self.fetchSeconds = 0.0
+
+        for btn in [self.btnSqlRun, self.btnSqlCancel]:
+            Utils.buttonStyle(btn)
+        self.cbSqlServer.addItems(sorted(set(USBR.tnsMap.values())))
+        self.btnSqlRun.clicked.connect(self.run)
+        self.btnSqlCancel.clicked.connect(self.cancel)
+        shortcut = QShortcut(QKeySequence("Ctrl+Return"), self.txtSql, self.run)
+        shortcut.setContext(Qt.ShortcutContext.WidgetShortcut)
+
+    def busy(self):
+        return self.task is not None
+
+    def hasMore(self):
+        return self.cursor is not None and not self.exhausted and not self.busy()
+
+    def start(self, fn, onDone):
+        self.task = sqlTask(fn)
+        self.task.signals.done.connect(onDone)
+        self.task.signals.failed.connect(self.onFailed)
+        self.btnSqlRun.setEnabled(False)
+        self.btnSqlCancel.setEnabled(True)
+        QThreadPool.globalInstance().start(self.task)
+
+    def taskEnded(self):
+        self.task = None
+        self.btnSqlRun.setEnabled(True)
+        self.btnSqlCancel.setEnabled(False)
+
+    def run(self):
+        query = self.txtSql.toPlainText().strip().rstrip(';')
+        alias = self.cbSqlServer.currentText().strip()
+
+        if self.busy() or not query or not alias:
+            return
+        self.release()
+        self.canceled = False
+        self.closed = False
+        self.model.reset()
+        self.lblSqlStatus.setText(f"Running on {alias}...")
+        if Config.debug: print(f"[DEBUG] sqlConsole.run: {alias}: {query[:100]}")
+        self.start(lambda: self.execute(alias, query), self.onExecuted)
+
+    def execute(self, alias, query):
+        """Background: check out a connection, execute and read the first page."""
+        self.oracleConn = Oracle.oracleConnection(alias)
+        self.oracleConn.connect()
+        startTime = time.perf_counter()
+        cursor = self.oracleConn.openCursor(query, batchSize=pageSize)
+        executeSeconds = time.perf_counter() - startTime
+
+        if cursor.description is None:
+            return cursor, None, executeSeconds, 0.0
+        page, fetchSeconds = self.readPage(cursor)
+        return cursor, page, executeSeconds, fetchSeconds
+
+    def readPage(self, cursor):
+        startTime = time.perf_counter()
+        page = Oracle.describeColumns(cursor)
+        rows = cursor.fetchmany(pageSize)
+        if rows: page.appendRows(rows)
+        return page.finish(), time.perf_counter() - startTime
+
+    def onExecuted(self, result):
+        self.taskEnded()
+        cursor, page, self.executeSeconds, self.fetchSeconds = result
+        self.cursor = cursor
+
+        if self.closed:
+            # The tab closed while this ran; nothing will page the cursor, so give the connection back now
+            self.release()
+            return
+        if page is None:
+            # DML/DDL: nothing to page; the pool rolls back anything left uncommitted on release
+            self.lblSqlStatus.setText(f"{cursor.rowcount} rows affected (not committed) | executed in {self.executeSeconds:.3f} s")
+            self.release()
+            return
+        self.model.reset(page.names)
+        self.addPage(page)
+
+    def fetchPage(self):
+        if not self.hasMore():
+            return
+        cursor = self.cursor
+        self.start(lambda: self.readPage(cursor), self.onPage)
+
+    def onPage(self, result):
+        self.taskEnded()
+        if self.closed:
+            self.release()
+            return
+        page, seconds = result
+        self.fetchSeconds += seconds
+        self.addPage(page)
+
+    def addPage(self, page):
+        self.exhausted = page.rowCount() < pageSize
+        self.model.addPage(page)
+        more = "" if self.exhausted else "+"
+        self.lblSqlStatus.setText(f"{self.model.rows}{more} rows | executed in {self.executeSeconds:.3f} s | fetched in {self.fetchSeconds:.3f} s")
+        if self.exhausted:
+            self.release()
+
+    def onFailed(self, message):
+        self.taskEnded()
+        self.lblSqlStatus.setText("Canceled" if self.canceled else f"Error: {message}")
+        if Config.debug: print(f"[DEBUG] sqlConsole.onFailed: {message}")
+        self.release()
+
+    def cancel(self):
+        """Interrupt the server call in flight; the task then fails with ORA-01013 and the connection is released."""
+        if not self.busy() or self.oracleConn is None:
+            return
+        self.canceled = True
+
+        try:
+            self.oracleConn.cancel()
+        except Exception as e:
+            print(f"[WARN] SQL cancel failed: {e}")
+
+    def release(self):
+        """Close the cursor and return the connection to its pool."""
+        if self.cursor is not None:
+            try:
+                self.cursor.close()
+            except Exception as e:
+                if Config.debug: print(f"[DEBUG] sqlConsole.release: Cursor close failed: {e}")
+            self.cursor = None
+        if self.oracleConn is not None:
+            self.oracleConn.close()
+            self.oracleConn = None
+        self.exhausted = True
+
+    def close(self):
+        """Cancel any call in flight; a task still running when the tab closes releases on completion."""
+        self.closed = True
+        self.cancel()
+        if not self.busy():
+            self.release()
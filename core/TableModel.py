@@ -0,0 +1,119 @@
+import numpy as np
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt6.QtGui import QColor, QBrush
+from core import Config, TimeSeries
+
+# QAQC flag per cell, kept as a uint8 matrix by qaqc; one flag per cell, repeats over rate of change over limits
+flagNone, flagMissing, flagBelowExpected, flagAboveExpected, flagBelowCutoff, flagAboveCutoff, flagRateOfChange, flagRepeat = range(8)
+black = QBrush(QColor(0, 0, 0))
+flagStyles = [
+    (None, None),
+    (QBrush(QColor(100, 195, 247)), None), # Missing past now
+    (QBrush(QColor(249, 240, 107)), black), # Below expected
+    (QBrush(QColor(249, 194, 17)), black), # Above expected
+    (QBrush(QColor(255, 163, 72)), None), # Below cutoff
+    (QBrush(QColor(192, 28, 40)), None), # Above cutoff
+    (QBrush(QColor(246, 97, 81)), None), # Rate of change
+    (QBrush(QColor(87, 227, 137)), black), # Repeated value
+]
+
+# Column states a running query shows under the header; 'ok' and 'empty' columns show just their header
+stateLabels = {'loading': 'Loading...', 'error': 'Fetch failed', 'canceled': 'Canceled'}
+
+class resultTableModel(QAbstractTableModel):
+    """Table model over a resultFrame; cells are formatted and colored only when the view asks."""
+    def __init__(self, frame, parent=None):
+        super().__init__(parent)
+        self.frame = frame
+        self.flags = None # uint8 QAQC flag per cell, same shape as the frame; None until QAQC runs
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.frame.rowCount()
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.frame.columnCount()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        col = index.column()
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.frame.cellText(row, col)
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignCenter | Qt.AlignmentFlag.AlignVCenter
+        if role in (Qt.ItemDataRole.BackgroundRole, Qt.ItemDataRole.ForegroundRole):
+            background, foreground = self.cellStyle(row, col)
+            return background if role == Qt.ItemDataRole.BackgroundRole else foreground
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and section >= self.frame.columnCount():
+            return None
+        if role == Qt.ItemDataRole.ToolTipRole and orientation == Qt.Orientation.Horizontal:
+            meta = self.frame.columns[section]
+            tips = [f"Source: {meta['backend']}"] if meta.get('backend') else []
+            if meta.get('state') in stateLabels:
+                tips.append(stateLabels[meta['state']])
+            return '\n'.join(tips) or None
+        if role == Qt.ItemDataRole.ForegroundRole and orientation == Qt.Orientation.Horizontal:
+            return QBrush(QColor(192, 28, 40)) if self.frame.columns[section].get('state') == 'error' else None
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            meta = self.frame.columns[section]
+            header = meta.get('header', '')
+            return f"{header}\n{stateLabels[meta['state']]}" if meta.get('state') in stateLabels else header
+        if section < self.frame.rowCount():
+            return TimeSeries.fromEpoch(self.frame.timestamps[section]).strftime(TimeSeries.displayFormat)
+        return None
+
+    def cellStyle(self, row, col):
+        """Background/foreground for one cell: delta and overlay rules, else QAQC result."""
+        meta = self.frame.columns[col]
+        colType = meta.get('type', 'normal')
+
+        if colType == 'delta':
+            d = self.frame.values[row, col]
+            if np.isfinite(d) and d > 0:
+                return None, QBrush(QColor(255, 165, 0)) # Orange
+            if np.isfinite(d) and d < 0:
+                return None, QBrush(QColor(0, 0, 255)) # Blue
+            return None, QBrush(Config.systemTextColor) # System default
+        if colType == 'overlay':
+            hasP = np.isfinite(meta['primary'][row])
+            hasS = np.isfinite(meta['secondary'][row])
+
+            if hasP and hasS:
+                if meta['delta'][row] != 0:
+                    return None, QBrush(QColor(255, 0, 0)) # Red
+                return None, QBrush(Config.systemTextColor) # System default
+            if not hasP and hasS:
+                return QBrush(QColor(221, 160, 221)), QBrush(QColor(0, 0, 0)) # Light purple
+            if hasP and not hasS:
+                return QBrush(QColor(255, 182, 193)), QBrush(QColor(0, 0, 0)) # Light pink
+            return None, None
+        if self.flags is None:
+            return None, None
+        return flagStyles[self.flags[row, col]]
+
+    def setFlags(self, flags):
+        self.flags = flags
+        if self.frame.rowCount() and self.frame.columnCount():
+            self.dataChanged.emit(self.index(0, 0), self.index(self.frame.rowCount() - 1, self.frame.columnCount() - 1))
+
+    def refreshColumns(self, cols):
+        """Repaint columns whose values, header or state changed after the view was built (e.g. a query group arriving)."""
+        if not cols or not self.frame.rowCount():
+            return
+        first, last = min(cols), max(cols)
+        self.dataChanged.emit(self.index(0, first), self.index(self.frame.rowCount() - 1, last))
+        self.headerDataChanged.emit(Qt.Orientation.Horizontal, first, last)
+
+    def reorderRows(self, order):
+        """Apply a row permutation to the frame (sorting) and refresh the view."""
+        self.layoutAboutToBeChanged.emit()
+        self.frame.take(order)
+        self.flags = None # Repeat and rate-of-change checks depend on row order; QAQC reruns after sorting
+        self.layoutChanged.emit()
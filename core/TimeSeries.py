@@ -0,0 +1,198 @@
+import numpy as np
+from functools import lru_cache
+from datetime import datetime, timedelta
+from core import Logic, Config
+
+epochOrigin = datetime(1970, 1, 1)
+displayFormat = '%m/%d/%y %H:%M:00'
+
+def toEpoch(dateTime):
+    """Convert a naive datetime to integer epoch seconds (wall clock, no TZ)."""
+    return int((dateTime - epochOrigin).total_seconds())
+
+def fromEpoch(epoch):
+    """Convert integer epoch seconds back to a naive datetime."""
+    return epochOrigin + timedelta(seconds=int(epoch))
+
+def formatEpochs(epochs):
+    """Format an epoch array as display strings (MM/DD/YY HH:MM:00)."""
+    return [fromEpoch(e).strftime(displayFormat) for e in epochs]
+
+# Calendar intervals: (months per step, month the period starts in)
+calendarIntervals = {'MONTH': (1, None), 'YEAR': (12, 1), 'WATER YEAR': (12, 10)}
+
+@lru_cache(maxsize=64)
+def buildGrid(startDateStr, endDateStr, intervalStr):
+    """Epoch grid [start, end) for an interval, built with datetime64 arithmetic.
+
+    The array is int64 seconds (the same bits as datetime64[s]) and read-only, since the
+    cache hands the same array to every caller asking for the same range.
+    """
+    try:
+        start = np.datetime64(datetime.strptime(startDateStr, '%Y-%m-%d %H:%M'), 's')
+        end = np.datetime64(datetime.strptime(endDateStr, '%Y-%m-%d %H:%M'), 's')
+    except ValueError as e:
+        print("[ERROR] Invalid date format in buildGrid: {}".format(e))
+        return None
+    if intervalStr == 'HOUR':
+        step = np.timedelta64(1, 'h')
+    elif intervalStr.startswith('INSTANT:'):
+        try:
+            minutes = int(intervalStr.split(':')[1])
+        except (IndexError, ValueError) as e:
+            print("[ERROR] Invalid INSTANT interval format: {}".format(e))
+            return None
+        if minutes not in (1, 15, 60):
+            print("[ERROR] Unsupported INSTANT interval: {}".format(intervalStr))
+            return None
+        step = np.timedelta64(minutes, 'm')
+    elif intervalStr == 'DAY':
+        step = np.timedelta64(1, 'D')
+    elif intervalStr in calendarIntervals:
+        months, startMonth = calendarIntervals[intervalStr]
+        first = start.astype('datetime64[M]')
+
+        # Roll back to the first month of the year / water year that contains start
+        if startMonth is not None:
+            monthOfYear = first.astype(np.int64) % 12 + 1
+            first = first - np.timedelta64(int((monthOfYear - startMonth) % 12), 'M')
+        grid = np.arange(first, end.astype('datetime64[M]') + 1, np.timedelta64(months, 'M')).astype('datetime64[s]')
+        grid = grid[grid < end].astype(np.int64)
+        grid.setflags(write=False)
+        return grid
+    else:
+        print("[ERROR] Unknown intervalStr: {}".format(intervalStr))
+        return None
+
+    # Floor start to the interval boundary (e.g. top of the hour, quarter hour, midnight)
+    stepSeconds = int(step / np.timedelta64(1, 's'))
+    first = start.astype(np.int64) - start.astype(np.int64) % stepSeconds
+    grid = np.arange(first, end.astype(np.int64), stepSeconds, dtype=np.int64) if first < end.astype(np.int64) else np.array([], dtype=np.int64)
+    grid.setflags(write=False)
+    return grid
+
+def toFloat(value):
+    """Parse a provider value to float; blanks and junk become NaN."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def toFloats(values):
+    """toFloat over a whole list; numbers, numeric strings and None convert in one NumPy call."""
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array([toFloat(value) for value in values], dtype=np.float64)
+
+def formatValue(value):
+    """Format a float for display, honoring the raw data setting."""
+    if Config.rawData:
+        return str(int(value)) if float(value).is_integer() else repr(float(value))
+    return Logic.valuePrecision(value)
+
+class timeSeries:
+    """Raw provider output for one data ID: epoch times and float values."""
+    def __init__(self, times=None, values=None, label=None):
+        self.times = np.asarray(times if times is not None else [], dtype=np.int64)
+        self.values = np.asarray(values if values is not None else [], dtype=np.float64)
+        self.label = label
+
+    def __len__(self):
+        return len(self.times)
+
+    @classmethod
+    def fromPoints(cls, points, label=None):
+        """Build from a list of (epoch, float) pairs."""
+        if not points:
+            return cls(label=label)
+        times, values = zip(*points)
+        return cls(times, values, label)
+
+    def sortByTime(self):
+        order = np.argsort(self.times, kind='stable')
+        self.times = self.times[order]
+        self.values = self.values[order]
+        return self
+
+def alignToGrid(grid, series):
+    """Place a series' values onto the epoch grid; returns (float64 array with NaN gaps, off-grid point count).
+
+    A regular grid is indexed arithmetically, anything else through searchsorted. When a
+    timestamp repeats, the first value wins.
+    """
+    aligned = np.full(len(grid), np.nan, dtype=np.float64)
+
+    if len(grid) == 0 or series is None or len(series) == 0:
+        return aligned, 0 if series is None else len(series)
+    times = series.times
+    step = grid[1] - grid[0] if len(grid) > 1 else 1
+
+    if step > 0 and grid[-1] == grid[0] + step * (len(grid) - 1) and (len(grid) < 3 or (np.diff(grid) == step).all()):
+        offsets = times - grid[0]
+        idx = offsets // step
+        onGrid = (offsets % step == 0) & (idx >= 0) & (idx < len(grid))
+    else:
+        idx = np.searchsorted(grid, times)
+        inBounds = idx < len(grid)
+        onGrid = np.zeros(len(times), dtype=bool)
+        onGrid[inBounds] = grid[idx[inBounds]] == times[inBounds]
+    rows = idx[onGrid]
+    placed, first = np.unique(rows, return_index=True)
+    aligned[placed] = series.values[onGrid][first]
+    return aligned, len(times) - len(placed)
+
+class resultFrame:
+    """Aligned query result: epoch axis, float64 value matrix, NaN mask and column metadata."""
+    def __init__(self, timestamps, numCols=0, columns=None):
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.values = np.full((len(self.timestamps), numCols), np.nan, dtype=np.float64)
+        self.mask = np.ones((len(self.timestamps), numCols), dtype=bool)
+        self.columns = list(columns) if columns else [{} for _ in range(numCols)]
+
+    def rowCount(self):
+        return self.values.shape[0]
+
+    def columnCount(self):
+        return self.values.shape[1]
+
+    def column(self, col):
+        return self.values[:, col]
+
+    def setColumn(self, col, values, **meta):
+        self.values[:, col] = values
+        self.mask[:, col] = np.isnan(self.values[:, col])
+        if meta:
+            self.columns[col].update(meta)
+
+    def insertColumn(self, col, values, meta):
+        values = np.asarray(values, dtype=np.float64)
+        self.values = np.insert(self.values, col, values, axis=1)
+        self.mask = np.insert(self.mask, col, np.isnan(values), axis=1)
+        self.columns.insert(col, meta)
+
+    def removeColumn(self, col):
+        self.values = np.delete(self.values, col, axis=1)
+        self.mask = np.delete(self.mask, col, axis=1)
+        del self.columns[col]
+
+    def take(self, order):
+        """Reorder rows (e.g. for sorting); per-row metadata arrays follow along."""
+        self.timestamps = self.timestamps[order]
+        self.values = self.values[order]
+        self.mask = self.mask[order]
+        for meta in self.columns:
+            for key, value in meta.items():
+                if isinstance(value, np.ndarray) and len(value) == len(order):
+                    meta[key] = value[order]
+
+    def timestampStrings(self):
+        return formatEpochs(self.timestamps)
+
+    def cellText(self, row, col):
+        if self.mask[row, col]:
+            return ''
+        return formatValue(self.values[row, col])
+
+    def headers(self):
+        return [meta.get('header', meta.get('dataID', '')) for meta in self.columns]
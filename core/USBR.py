@@ -1,9 +1,71 @@
-import requests
+import re
+import io
+import csv
 import json
-from core import Oracle, Logic, Query, Config
-from datetime import datetime, timedelta
+import numpy as np
+from core import Http, Scheduler, Oracle, Logic, Query, Config, TimeSeries, Planner
+from datetime import datetime, timedelta, date
 
-def apiRead(svr, SDIDs, startDate, endDate, interval, mrid='0', table='R'):
+baseUrl = 'https://www.usbr.gov/pn-bin/hdb/hdb.pl'
+queryLimit = 50 # SDIDs per hdb.pl request
+sqlInListLimit = 1000 # Oracle's IN-list maximum
+sqlInListSizes = [10, 50, 100, 250, 500, 1000] # Padded bind counts, so few statement shapes get cached
+epochOrdinal = date(1970, 1, 1).toordinal()
+sqlUnavailable = set() # Servers whose SQL path failed this session; they go straight to hdb.pl
+
+# HDB table suffix per interval; intervals without a table here (INSTANT) are always read from hdb.pl
+sqlTableSuffixes = {
+    'HOUR': 'H',
+    'DAY': 'D',
+    'MONTH': 'M',
+    'YEAR': 'Y',
+    'WATER YEAR': 'WY'
+}
+
+# Map server to TNS alias
+tnsMap = {
+    'lchdb': 'USBR-LCHDB',
+    'yaohdb': 'USBR-YAOHDB',
+    'uchdb2': 'USBR-UCHDB2',
+    'ecohdb': 'USBR-ECOHDB',
+    'lbohdb': 'USBR-LBOHDB',
+    'kbohdb': 'USBR-KBOHDB',
+    'pnhyd': 'USBR-PNHYD',
+    'gphyd': 'USBR-GPHYD'
+}
+
+def read(svr, SDIDs, startDate, endDate, interval, mrid='0', table='R', isInternal=False, cancel=None):
+    """Read from HDB directly over SQL when possible, else hdb.pl; returns (resultDict, backend) with backend 'sql' or 'api'.
+
+    A SQL read that fails or finds no points at all is retried on hdb.pl; a failure also keeps the server on hdb.pl for the session.
+    """
+    if useSql(svr, interval, isInternal):
+        result = sqlRead(svr, SDIDs, startDate, endDate, interval, mrid, table, cancel)
+
+        # sqlRead answers every SDI, so only points show the SQL path actually served the batch
+        if any(len(series) for series in result.values()):
+            return result, 'sql'
+        if cancel is not None:
+            cancel.check() # A canceled read is not a reason to give up on SQL
+        if result:
+            print(f"[WARN] USBR SQL read found no data for {len(SDIDs)} SDIDs on {svr}, trying hdb.pl")
+        else:
+            sqlUnavailable.add(svr.lower())
+            print(f"[WARN] USBR SQL read failed for {svr}, falling back to hdb.pl for this session")
+    return apiRead(svr, SDIDs, startDate, endDate, interval, mrid, table, cancel), 'api'
+
+def useSql(svr, interval, isInternal):
+    """SQL is used for internal queries on intervals with an HDB table when enabled and the Oracle login and TNS alias are both available."""
+    if not isInternal or Config.usbrBackend == 'api' or interval not in sqlTableSuffixes or svr.lower() in sqlUnavailable:
+        return False
+    try:
+        return Oracle.manager.hasCredentials() and Oracle.manager.hasAlias(tnsMap.get(svr.lower(), svr))
+    except Exception as e:
+        if Config.debug: print(f"[DEBUG] USBR.useSql: Oracle unavailable for {svr}: {e}")
+        sqlUnavailable.add(svr.lower())
+        return False
+
+def apiRead(svr, SDIDs, startDate, endDate, interval, mrid='0', table='R', cancel=None):
     if Config.debug:
         print(f"[DEBUG] USBR.apiRead called with svr: {svr}, SDIDs: {SDIDs}, interval: {interval}, start: {startDate}, end: {endDate}, mrid: {mrid}, table='R'")
 
@@ -23,180 +85,254 @@ def apiRead(svr, SDIDs, startDate, endDate, interval, mrid='0', table='R'):
     # Use original interval for timestamps
     timestamps = Query.buildTimestamps(startDate, endDate, interval)
 
-    if not timestamps:
+    if len(timestamps) == 0:
         print("[ERROR] No timestamps generated - invalid dates or interval.")
         return {}
 
-    # Parse start (with pad if periodOffset and HOUR)
-    startDateTime = datetime.strptime(startDate, '%Y-%m-%d %H:%M')
-
-    if Config.periodOffset and interval == 'HOUR':
-        startDateTime = startDateTime - timedelta(hours=1)
-
-    startYear = startDateTime.year
-    startMonth = f'{startDateTime.month:02d}'
-    startDay = f'{startDateTime.day:02d}'
-    startHour = f'{startDateTime.hour:02d}'
-    startMinute = f'{startDateTime.minute:02d}'
-
-    # Parse end (no pad needed, as offset is on points)
-    endDateTime = datetime.strptime(endDate, '%Y-%m-%d %H:%M')
-    endYear = endDateTime.year
-    endMonth = f'{endDateTime.month:02d}'
-    endDay = f'{endDateTime.day:02d}'
-    endHour = f'{endDateTime.hour:02d}'
-    endMinute = f'{endDateTime.minute:02d}'
-    queryLimit = 50
-    resultDict = {}
+    # Request times run one period early when HOUR timestamps are shifted to end of period
+    offsetSeconds = 3600 if Config.periodOffset and interval == 'HOUR' else 0
+    batchList = batches(SDIDs)
+    windows = planWindows(startDate, endDate, interval, max((len(batch) for batch in batchList), default=1))
 
-    for groupStart in range(0, len(SDIDs), queryLimit):
-        groupSDIDs = SDIDs[groupStart:groupStart + queryLimit]
+    def readBatch(groupSDIDs, windowStart, windowEnd):
+        batchResult = {}
         groupSDIDStr = ','.join(groupSDIDs)
-        url = f'https://www.usbr.gov/pn-bin/hdb/hdb.pl?svr={svr}&SDI={groupSDIDStr}&tstp={tstp}&t1={startYear}-{startMonth}-{startDay}T{startHour}:{startMinute}&t2={endYear}-{endMonth}-{endDay}T{endHour}:{endMinute}&table={table}&mrid={mrid}&format=json'
-        
+        t1 = TimeSeries.fromEpoch(windowStart).strftime('%Y-%m-%dT%H:%M')
+        t2 = TimeSeries.fromEpoch(windowEnd).strftime('%Y-%m-%dT%H:%M')
+        url = f'{baseUrl}?svr={svr}&SDI={groupSDIDStr}&tstp={tstp}&t1={t1}&t2={t2}&table={table}&mrid={mrid}&format={Config.usbrFormat}'
+
         if Config.debug:
             print("[DEBUG] Fetching USBR URL: {}".format(url))
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            readFile = json.loads(response.content)
-            seriesList = readFile['Series']
+        response = Http.get(url, cancel=cancel)
+        response.raise_for_status()
+        seriesData = splitCsv(response.text) if Config.usbrFormat == 'csv' else splitJson(response.content)
 
-            if Config.debug:
-                print("[DEBUG] Fetched {} series entries.".format(len(seriesList)))
-        except Exception as e:
-            print("[ERROR] USBR fetch failed: {}".format(e))
-            continue
+        if Config.debug:
+            print("[DEBUG] Fetched {} series entries.".format(len(seriesData)))
         for SDID in groupSDIDs:
-            matchingSeries = None
-
-            for series in seriesList:
-                jsonSDID = series['SDI']
-
-                if isinstance(jsonSDID, list):
-                    jsonSDID = jsonSDID[0] if jsonSDID else ''
-                if str(jsonSDID) == SDID:
-                    matchingSeries = series
-                    break
-            if not matchingSeries:
+            if SDID not in seriesData:
                 print(f"[WARN] No matching series for SDID '{SDID}'.")
-                resultDict[SDID] = []
+                batchResult[SDID] = TimeSeries.timeSeries()
                 continue
-            dataPoints = matchingSeries['Data']
+            timeStrings, values = seriesData[SDID]
 
             if Config.debug:
-                print(f"[DEBUG] Found series for '{SDID}': {len(dataPoints)} points.")
-            outputData = []
-
-            for point in dataPoints:
-                value = point['v']
-                dateTime = point['t']
-                dateTimeParts = dateTime.split(' ')
-                dateParts = dateTimeParts[0].split('/')
-                hourMinuteSecond = dateTimeParts[1].split(':')
-                amPm = dateTimeParts[2] if len(dateTimeParts) > 2 else ''
-                year = int(dateParts[2])
-                month = int(dateParts[0])
-                day = int(dateParts[1])
-                hour = int(hourMinuteSecond[0])
-                minute = int(hourMinuteSecond[1])
-                second = int(hourMinuteSecond[2]) if len(hourMinuteSecond) > 2 else 0
-                dateTime = datetime(year, month, day, hour, minute, second)
-                
-                if Config.periodOffset and interval == 'HOUR':
-                    dateTime = dateTime + timedelta(hours=1)
-                if amPm == 'AM' and hour == 12:
-                    dateTime = dateTime - timedelta(hours=12)
-                elif amPm == 'PM' and hour < 12:
-                    dateTime = dateTime + timedelta(hours=12)
-                formattedTs = dateTime.strftime('%m/%d/%y %H:%M:00')
-                outputData.append(f'{formattedTs},{value}')
-            resultDict[SDID] = outputData
+                print(f"[DEBUG] Found series for '{SDID}': {len(timeStrings)} points.")
+            batchResult[SDID] = TimeSeries.timeSeries(decodeTimes(timeStrings, offsetSeconds), TimeSeries.toFloats(values))
+        return batchResult
+
+    # Every batch x window is its own task; HDB servers share www.usbr.gov, so each server's budget sits inside the host's
+    host = Http.hostKey(baseUrl)
+    budget = f"{host}/{svr.lower()}"
+    limit = Config.usbrServerConnections
+    Scheduler.nest(budget, host, Http.maxConnections(host))
+    futures = [[Scheduler.submitTo(budget, limit, readBatch, batch, windowStart, windowEnd) for windowStart, windowEnd in windows] for batch in batchList]
+    if Config.debug: print(f"[DEBUG] USBR.apiRead: {len(batchList)} batches x {len(windows)} windows on {svr}, {limit} at a time")
+    resultDict = {}
+
+    for batch, batchFutures in zip(batchList, futures):
+        windowResults = Scheduler.results(batchFutures, cancel)
+
+        # A missing window would leave a silent hole (and the cache would mark it covered), so drop the batch instead;
+        # its SDIDs stay out of resultDict, which the query reports as failed columns
+        if any(windowResult is None for windowResult in windowResults):
+            print(f"[ERROR] USBR fetch failed for {len(batch)} SDIDs on {svr}; a time window did not download")
+            continue
+        for SDID in batch:
+            parts = [windowResult[SDID] for windowResult in windowResults if SDID in windowResult]
+            resultDict[SDID] = TimeSeries.timeSeries(np.concatenate([part.times for part in parts]), np.concatenate([part.values for part in parts])) if parts else TimeSeries.timeSeries()
     if not resultDict:
         print("[WARN] No data after processing all batches.")
     return resultDict
 
-def sqlRead(svr, SDIDs, startDate, endDate, interval, mrid='0', table='R'):
+def batches(SDIDs):
+    """hdb.pl batches: at most queryLimit SDIDs, with the SDI list short enough to keep the URL under Config.maxUrlLength."""
+    return Planner.splitBatches(SDIDs, queryLimit, Config.maxUrlLength - len(baseUrl) - 150)
+
+def planWindows(startDate, endDate, interval, batchSize):
+    """Request windows for a batch of batchSize SDIDs, sized to about Config.usbrWindowPoints points each."""
+    timestamps = Query.buildTimestamps(startDate, endDate, interval)
+    offsetSeconds = 3600 if Config.periodOffset and interval == 'HOUR' else 0
+    endEpoch = TimeSeries.toEpoch(datetime.strptime(endDate, '%Y-%m-%d %H:%M'))
+    return timeWindows(timestamps, endEpoch, offsetSeconds, max(1, Config.usbrWindowPoints // max(1, batchSize)))
+
+def splitJson(content):
+    """hdb.pl JSON to {SDID: (time strings, values)}; the first series for an SDID wins."""
+    seriesData = {}
+
+    for series in json.loads(content)['Series']:
+        jsonSDID = series['SDI']
+
+        if isinstance(jsonSDID, list):
+            jsonSDID = jsonSDID[0] if jsonSDID else ''
+        dataPoints = series['Data']
+        seriesData.setdefault(str(jsonSDID), ([point['t'] for point in dataPoints], [point['v'] for point in dataPoints]))
+    return seriesData
+
+def splitCsv(text):
+    """hdb.pl CSV (a date column, then one value column per SDI) to {SDID: (time strings, values)}; ragged rows are dropped with a warning."""
+    rows = [row for row in csv.reader(io.StringIO(text), skipinitialspace=True) if any(field.strip() for field in row)]
+
+    if not rows:
+        return {}
+    header = [field.strip() for field in rows[0]]
+    body = [row for row in rows[1:] if len(row) == len(header)]
+    dropped = len(rows) - 1 - len(body)
+    if dropped: print(f"[WARN] USBR.splitCsv: Dropped {dropped} of {len(rows) - 1} rows without {len(header)} fields")
+    columns = list(zip(*body)) if body else [()] * len(header)
+    seriesData = {}
+
+    for col, name in enumerate(header[1:], start=1):
+        match = re.search(r'\d+', name)
+        if match:
+            values = [value.strip() for value in columns[col]]
+            seriesData.setdefault(match.group(), ([t.strip() for t in columns[0]], values))
+    return seriesData
+
+def decodeTimes(timeStrings, shiftSeconds=0):
+    """Parse hdb.pl date-times ('M/D/YYYY h:MM:SS AM' or ISO) in bulk into int64 epochs, plus shiftSeconds.
+
+    A series repeats the same few dates and clock times over and over, so each distinct date and
+    clock is parsed once and every point is two dictionary lookups and an integer add.
+    """
+    if timeStrings and 'T' in timeStrings[0]:
+        timeStrings = [t.replace('T', ' ', 1) for t in timeStrings]
+    dates = []
+    clocks = []
+
+    for t in timeStrings:
+        dateStr, _, clock = t.partition(' ')
+        dates.append(dateStr)
+        clocks.append(clock)
+    daySeconds = {dateStr: parseDate(dateStr) for dateStr in set(dates)}
+    clockSeconds = {clock: parseClock(clock) for clock in set(clocks)}
+    epochs = np.fromiter(map(daySeconds.__getitem__, dates), dtype=np.int64, count=len(dates))
+    epochs += np.fromiter(map(clockSeconds.__getitem__, clocks), dtype=np.int64, count=len(clocks))
+    return epochs + shiftSeconds
+
+def parseDate(dateStr):
+    """Epoch seconds at midnight of an M/D/YYYY or YYYY-MM-DD date."""
+    if '-' in dateStr:
+        year, month, day = dateStr.split('-')
+    else:
+        month, day, year = dateStr.split('/')
+    return (date(int(year), int(month), int(day)).toordinal() - epochOrdinal) * 86400
+
+def parseClock(clock):
+    """Seconds after midnight for 'h:MM[:SS] [AM|PM]'; 12 AM is hour 0 and 12 PM is hour 12."""
+    timePart, _, amPm = clock.strip().partition(' ')
+    fields = timePart.split(':')
+    hour = int(fields[0])
+
+    if amPm:
+        hour = hour % 12 + (12 if amPm.upper().startswith('P') else 0)
+    return hour * 3600 + int(fields[1]) * 60 + (int(float(fields[2])) if len(fields) > 2 else 0)
+
+def timeWindows(timestamps, endEpoch, offsetSeconds, stepsPerWindow):
+    """Split the query grid into back-to-back request ranges of stepsPerWindow steps, in request (unshifted) time.
+
+    hdb.pl ranges are inclusive to the minute, so each window ends one minute before the next begins.
+    """
+    windows = []
+
+    for i in range(0, len(timestamps), stepsPerWindow):
+        windowStart = int(timestamps[i]) - offsetSeconds
+
+        if i + stepsPerWindow < len(timestamps):
+            windowEnd = int(timestamps[i + stepsPerWindow]) - offsetSeconds - 60
+        else:
+            windowEnd = endEpoch
+        windows.append((windowStart, windowEnd))
+    return windows
+
+def sqlRead(svr, SDIDs, startDate, endDate, interval, mrid='0', table='R', cancel=None):
     if Config.debug: print(f"[DEBUG] USBR.sqlRead called with svr: {svr}, SDIDs: {SDIDs}, interval: {interval}, start: {startDate}, end: {endDate}, mrid: {mrid}, table: {table}")
 
-    # Map interval to Oracle table suffix
-    intervalMap = {
-        'HOUR': 'H',
-        'INSTANT:1': 'M',
-        'INSTANT:15': 'M',
-        'INSTANT:60': 'M',
-        'DAY': 'D',
-        'MONTH': 'M',
-        'YEAR': 'Y',
-        'WATER YEAR': 'WY'
-    }
+    tableSuffix = sqlTableSuffixes.get(interval)
 
-    tableSuffix = intervalMap.get(interval, 'H')
+    if tableSuffix is None:
+        print(f"[ERROR] sqlRead: No HDB table for interval {interval}")
+        return {}
 
     # Adjust table name for MRID
     tableName = f"HDB_{table}_{tableSuffix}" if table == 'R' else f"HDB_M_{tableSuffix}"
 
-    # Parse dates
+    # Parse dates; HOUR reads start one period early when timestamps are shifted to end of period
     try:
         startDateTime = datetime.strptime(startDate, '%Y-%m-%d %H:%M')
         endDateTime = datetime.strptime(endDate, '%Y-%m-%d %H:%M')
-        if periodOffset and interval == 'HOUR': startDateTime = startDateTime - timedelta(hours=1)
+        if Config.periodOffset and interval == 'HOUR': startDateTime = startDateTime - timedelta(hours=1)
     except ValueError as e:
         print(f"[ERROR] sqlRead: Date parse failed: {e}")
         return {}
 
-    # Build query
-    resultDict = {}
+    dsn = tnsMap.get(svr.lower(), svr)
+    sdiList = [int(sdi) for sdi in SDIDs if str(sdi).isdigit()]
+    resultDict = {sdi: TimeSeries.timeSeries() for sdi in SDIDs}
     oracleConn = None
+    callback = None
+
+    if not sdiList:
+        return resultDict
 
     try:
-        # Map server to TNS alias
-        tnsMap = {
-            'lchdb': 'USBR-LCHDB',
-            'yaohdb': 'USBR-YAOHDB',
-            'uchdb2': 'USBR-UCHDB2',
-            'ecohdb': 'USBR-ECOHDB',
-            'lbohdb': 'USBR-LBOHDB',
-            'kbohdb': 'USBR-KBOHDB',
-            'pnhyd': 'USBR-PNHYD',
-            'gphyd': 'USBR-GPHYD'
-        }
-
-        dsn = tnsMap.get(svr.lower(), svr)
         oracleConn = Oracle.oracleConnection(dsn)
         conn = oracleConn.connect()
+        sdiCols, dateCols, valueCols = [], [], []
+
+        # Cancel sends a break to the server, which fails the statement in flight with ORA-01013
+        if cancel is not None:
+            callback = cancel.add(oracleConn.cancel)
+
+        for chunkStart in range(0, len(sdiList), sqlInListLimit):
+            if cancel is not None:
+                cancel.check()
+            chunk = sdiList[chunkStart:chunkStart + sqlInListLimit]
 
-        for sdi in SDIDs:
+            # Pad the IN-list by repeating the last SDI
+            bindSize = next(size for size in sqlInListSizes if size >= len(chunk))
+            chunk = chunk + [chunk[-1]] * (bindSize - len(chunk))
+            inList = ', '.join(f':s{i}' for i in range(bindSize))
             query = f"""
-                SELECT TO_CHAR(hdb_date, 'MM/DD/YY HH24:MI:00') AS timestamp, value
+                SELECT sdi, hdb_date, value
                 FROM {tableName}
-                WHERE sdi = :1
-                AND hdb_date BETWEEN TO_DATE(:2, 'YYYY-MM-DD HH24:MI')
-                AND TO_DATE(:3, 'YYYY-MM-DD HH24:MI')
-                {'AND mrid = :4' if mrid != '0' else ''}
-                ORDER BY hdb_date
+                WHERE sdi IN ({inList})
+                AND hdb_date BETWEEN :startDate AND :endDate
+                {'AND mrid = :mrid' if mrid != '0' else ''}
+                ORDER BY sdi, hdb_date
             """
+            params = {f's{i}': sdi for i, sdi in enumerate(chunk)}
+            params['startDate'] = startDateTime
+            params['endDate'] = endDateTime
+            if mrid != '0': params['mrid'] = int(mrid)
+            if Config.debug: print(f"[DEBUG] sqlRead: Executing bulk query for {len(set(chunk))} SDIs on {dsn}")
+            columns = Oracle.fetchColumns(conn, query, params)
+            sdiCols.append(columns.column('SDI'))
+            dateCols.append(columns.column('HDB_DATE'))
+            valueCols.append(columns.column('VALUE'))
 
-            params = [sdi, startDate, endDate]
-            if mrid != '0': params.append(mrid)
-            if Config.debug: print(f"[DEBUG] sqlRead: Executing query for SDI {sdi}: {query}")
-
-            try:
-                data = oracleConn.executeQuery(query, params=params)
-                resultDict[sdi] = Query.gapCheck(
-                    Query.buildTimestamps(startDate, endDate, interval),
-                    data,
-                    sdi
-                )
-
-                if Config.debug: print(f"[DEBUG] sqlRead: Fetched {len(resultDict[sdi])} rows for SDI {sdi}")
-            except Exception as e:
-                print(f"[ERROR] sqlRead: Query failed for SDI {sdi}: {e}")
-                resultDict[sdi] = []
+        # Rows arrive ordered by (sdi, date); split them into one columnar series per SDI
+        sdis = np.concatenate(sdiCols).astype(np.int64)
+        epochs = np.concatenate(dateCols).astype('datetime64[s]').astype(np.int64)
+        values = np.concatenate(valueCols)
+        if Config.debug: print(f"[DEBUG] sqlRead: Fetched {len(sdis)} rows for {len(sdiList)} SDIs")
+
+        if Config.periodOffset and interval == 'HOUR':
+            epochs = epochs + 3600
+        uniqueSdis, starts = np.unique(sdis, return_index=True)
+        ends = np.append(starts[1:], len(sdis))
+
+        for sdi, start, end in zip(uniqueSdis.tolist(), starts.tolist(), ends.tolist()):
+            resultDict[str(sdi)] = TimeSeries.timeSeries(epochs[start:end], values[start:end])
+    except Scheduler.canceledError:
+        raise
     except Exception as e:
-        print(f"[ERROR] sqlRead: Connection failed: {e}")
+        if cancel is not None:
+            cancel.check()
+        print(f"[ERROR] sqlRead: Bulk read failed on {dsn}: {e}")
         return {}
     finally:
+        if callback: cancel.discard(callback)
         if oracleConn: oracleConn.close()
             
-    return resultDict
\ No newline at end of file
+    return resultDict
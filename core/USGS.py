@@ -1,21 +1,165 @@
 import requests
 import json
+import numpy as np
 import keyring
 import re
 import time
 import ssl
+from collections import deque
 from datetime import datetime, timedelta
-from core import Logic, Query, Config
+from urllib.parse import urlencode, urlsplit, parse_qsl, urlunsplit
+from core import Http, Scheduler, Logic, Query, Config, TimeSeries, Planner
 
-def apiReadOldMethod(dataID, interval, startDate, endDate):
+ogcBaseUrl = 'https://api.waterdata.usgs.gov/ogcapi/v0/collections/daily/items'
+nwisBaseUrl = 'https://waterservices.usgs.gov/nwis/'
+queryLimit = 50 # uids per request
+
+def batches(uids):
+    """Request batches: at most queryLimit uids, with the site list short enough to keep the URL under Config.maxUrlLength."""
+    return Planner.splitBatches(uids, queryLimit, Config.maxUrlLength - 300)
+
+def ogcGetPage(url, headers, cancel=None):
+    """GET one OGC items page with retries; returns the parsed page, raising after the last retry."""
+    maxRetries = 3
+    if Config.debug: print("[DEBUG] Fetching USGS new API URL: {}".format(url))
+
+    for attempt in range(maxRetries):
+        try:
+            response = Http.get(url, headers=headers, cancel=cancel)
+            response.raise_for_status()
+            return json.loads(response.content)
+        except Scheduler.canceledError:
+            raise
+        except Exception as e:
+            if attempt < maxRetries - 1:
+                print("[WARN] Retry {} of {}: USGS new API fetch failed: {} for URL: {}. Retrying...".format(attempt + 1, maxRetries, e, url))
+                time.sleep(2 ** attempt) # Exponential backoff
+            else:
+                print("[ERROR] Max retries exceeded: {} for URL: {}".format(e, url))
+                raise
+
+class ogcReader:
+    """Paged read of the daily OGC collection for one batch of uids.
+
+    Each page's features are folded into per-time-series arrays as it arrives and the JSON is
+    then dropped, so at most apiRead's window of pages is held at once. When the first page
+    reports numberMatched and pages by offset, the remaining pages are all queued at once;
+    otherwise next links are followed.
+    """
+    def __init__(self, groupUids, startFormatted, endFormatted):
+        if Config.debug: print("[DEBUG] Processing batch of {} uids: {}".format(len(groupUids), groupUids[:3] if groupUids else []))
+        self.groupUids = groupUids
+        self.uidMap = {} # uid -> (site, method, param)
+        self.chunks = {} # (monitoring_location_id, parameter_code, time_series_id) -> [(times, values), ...]
+        self.pageCount = 0
+        self.fannedOut = False
+        self.failed = False
+        sites = []
+        params = []
+
+        for uid in groupUids:
+            parts = uid.split('-')
+
+            if len(parts) != 3:
+                print("[WARN] Invalid uid format skipped: {}".format(uid))
+                continue
+
+            site, method, param = parts
+            if Config.debug: print("[DEBUG] UID parts: site={}, method={}, param={}".format(site, method, param))
+
+            # Prepend USGS- and pad param to 5 digits for new API
+            sites.append('USGS-' + site)
+            params.append(param.zfill(5))
+            self.uidMap[uid] = (site, method, param)
+
+        # Unique for efficiency
+        self.sites = ','.join(sorted(set(sites)))
+        self.params = ','.join(sorted(set(params)))
+        self.startFormatted = startFormatted
+        self.endFormatted = endFormatted
+
+    def firstUrl(self):
+        query = {'f': 'json', 'monitoring_location_id': self.sites, 'time': f"{self.startFormatted}/{self.endFormatted}",
+                 'parameter_code': self.params, 'statistic_id': '00003', 'limit': Config.usgsPageLimit}
+        return f"{ogcBaseUrl}?{urlencode(query, safe=',/:')}"
+
+    def addPage(self, page):
+        """Fold one page into the per-series arrays; returns the page URLs still to fetch."""
+        features = page.get('features', [])
+        self.pageCount += 1
+        if Config.debug: print("[DEBUG] Fetched {} feature entries (page {}).".format(len(features), self.pageCount))
+        pageSeries = {}
+
+        for feature in features:
+            properties = feature['properties']
+            value = properties.get('value')
+
+            if value is not None and properties.get('time'):
+                key = (properties.get('monitoring_location_id'), properties.get('parameter_code'), properties.get('time_series_id'))
+                times, values = pageSeries.setdefault(key, ([], []))
+                times.append(properties['time'][:10])
+                values.append(TimeSeries.toFloat(value))
+        for key, (times, values) in pageSeries.items():
+            # Dates are UTC midnight, stored as naive epochs
+            epochs = np.array(times, dtype='datetime64[D]').astype('datetime64[s]').astype(np.int64)
+            self.chunks.setdefault(key, []).append((epochs, np.array(values, dtype=np.float64)))
+
+        nextUrl = next((link.get('href') for link in page.get('links', []) if link.get('rel') == 'next'), None)
+
+        if not nextUrl or not features:
+            return []
+        if self.pageCount == 1:
+            pages = offsetPages(nextUrl, page.get('numberMatched'), len(features))
+            self.fannedOut = bool(pages)
+            return pages or [nextUrl]
+        # Pages fanned out by offset were all requested after the first one
+        return [] if self.fannedOut else [nextUrl]
+
+    def results(self):
+        """uid -> series for the batch; {} when a page failed, since a missing page would leave a silent hole the cache marks covered."""
+        if self.failed:
+            print("[ERROR] USGS fetch failed for {} uids ({}...); a page did not download".format(len(self.groupUids), self.groupUids[:3]))
+            return {}
+        batchResult = {}
+
+        for uid in self.groupUids:
+            site, method, param = self.uidMap.get(uid, (None, None, None))
+            chunks = self.chunks.get(('USGS-' + site, param.zfill(5), method)) if site else None
+
+            if not site or not chunks:
+                if site: print("[WARN] No matching feature for uid '{}': site={}, param={}, method={}. Skipping.".format(uid, site, param, method))
+                batchResult[uid] = TimeSeries.timeSeries() # Blank
+                continue
+
+            # Aligned onto the query grid once, in queryWorker
+            series = TimeSeries.timeSeries(np.concatenate([c[0] for c in chunks]), np.concatenate([c[1] for c in chunks])).sortByTime()
+            if Config.debug: print("[DEBUG] Extracted {} points for '{}'".format(len(series), uid))
+            batchResult[uid] = series
+        return batchResult
+
+def offsetPages(nextUrl, numberMatched, pageSize):
+    """Every remaining page URL when the next link pages by offset and the total is known, else []."""
+    parts = urlsplit(nextUrl)
+    query = dict(parse_qsl(parts.query))
+
+    if not numberMatched or 'offset' not in query or not query['offset'].isdigit():
+        return []
+    urls = []
+
+    for offset in range(int(query['offset']), int(numberMatched), pageSize):
+        query['offset'] = str(offset)
+        urls.append(urlunsplit(parts._replace(query=urlencode(query, safe=',/:'))))
+    return urls
+
+def apiReadOldMethod(dataID, interval, startDate, endDate, cancel=None):
     if Config.debug: print("[DEBUG] USGS.apiReadOldMethod called with dataID: {}, interval: {}, start: {}, end: {}".format(dataID, interval, startDate, endDate))
 
     # Standardize timestamps
     timestamps = Query.buildTimestamps(startDate, endDate, interval)
 
-    if not timestamps:
+    if len(timestamps) == 0:
         print("[ERROR] No timestamps generated - invalid dates or interval.")
-        return []
+        return {}
 
     # Set interval for USGS ('iv' for HOUR/INSTANT, 'dv' for DAY)
     if interval in ['HOUR'] or interval.startswith('INSTANT:'):
@@ -24,7 +168,7 @@ def apiReadOldMethod(dataID, interval, startDate, endDate):
         usgsInterval = 'dv'
     else:
         print("[ERROR] Unsupported interval: {}".format(interval))
-        return []
+        return {}
 
     # Format start/end for API (YYYY-MM-DDTHH:MM, no TZ; assumes local)
     try:
@@ -34,14 +178,13 @@ def apiReadOldMethod(dataID, interval, startDate, endDate):
         endFormatted = endDateTime.strftime('%Y-%m-%dT%H:%M')
     except ValueError as e:
         print("[ERROR] Date parse failed: {}".format(e))
-        return []
+        return {}
 
-    queryLimit = 50
     resultDict = {}
 
-    # Batch uids into groups of queryLimit
-    for groupStart in range(0, len(dataID), queryLimit):
-        groupUids = dataID[groupStart:groupStart + queryLimit]
+    # One scheduler task per batch so batches share the host's concurrency budget
+    def readBatch(groupUids):
+        batchResult = {}
         if Config.debug: print("[DEBUG] Processing batch of {} uids: {}".format(len(groupUids), groupUids[:3] if groupUids else []))
 
         # Parse group: collect unique sites, params (methods filter post-fetch)
@@ -62,7 +205,7 @@ def apiReadOldMethod(dataID, interval, startDate, endDate):
             # Check for UUID method, reject if present
             if re.match(r'^[0-9a-fA-F]{32}$', method):
                 print("[ERROR] UUID method {} in uid {} not supported by old method. Use new API with DAY interval.".format(method, uid))
-                return []
+                return batchResult
 
             # Pad param to 5 digits for old API
             params.append(param.zfill(5))
@@ -71,15 +214,15 @@ def apiReadOldMethod(dataID, interval, startDate, endDate):
             uidMap[uid] = (site, method, param)
 
         if not sites:
-            continue
+            return batchResult
 
         # Unique for efficiency, but API handles dups
         sites = ','.join(set(sites))
         joinedParams = ','.join(set(params))
 
         # Fetch batched using startDT/endDT with retry and SSL handling
-        url = "https://waterservices.usgs.gov/nwis/{}/?format=json&sites={}&startDT={}&endDT={}&parameterCd={}&siteStatus=all".format(
-            usgsInterval, sites, startFormatted, endFormatted, joinedParams
+        url = "{}{}/?format=json&sites={}&startDT={}&endDT={}&parameterCd={}&siteStatus=all".format(
+            nwisBaseUrl, usgsInterval, sites, startFormatted, endFormatted, joinedParams
         )
 
         if Config.debug: print("[DEBUG] Fetching USGS URL: {}".format(url))
@@ -88,7 +231,7 @@ def apiReadOldMethod(dataID, interval, startDate, endDate):
 
         for attempt in range(maxRetries):
             try:
-                response = requests.get(url, timeout=timeout, verify=True)
+                response = Http.get(url, timeout=timeout, verify=True, cancel=cancel)
                 response.raise_for_status()
                 readFile = json.loads(response.content)
                 timeSeriesList = readFile['value']['timeSeries']
@@ -100,7 +243,7 @@ def apiReadOldMethod(dataID, interval, startDate, endDate):
                     print("[WARN] Retry {} of {}: SSL error: {}. Retrying with increased timeout and disabled verification...".format(attempt + 1, maxRetries, e))
                     timeout *= 2 # Double timeout for next attempt
                     time.sleep(2 ** attempt) # Exponential backoff
-                    response = requests.get(url, timeout=timeout, verify=False)
+                    response = Http.get(url, timeout=timeout, verify=False, cancel=cancel)
                     response.raise_for_status()
                     readFile = json.loads(response.content)
                     timeSeriesList = readFile['value']['timeSeries']
@@ -110,7 +253,7 @@ def apiReadOldMethod(dataID, interval, startDate, endDate):
                     break
                 else:
                     print("[ERROR] Max retries exceeded: {} for URL: {}. Update OpenSSL or use a different network.".format(e, url))
-                    return []
+                    return batchResult
             except requests.exceptions.RequestException as e:
                 if attempt < maxRetries - 1:
                     print("[WARN] Retry {} of {}: Request failed: {} for URL: {}. Retrying...".format(attempt + 1, maxRetries, e, url))
@@ -118,40 +261,35 @@ def apiReadOldMethod(dataID, interval, startDate, endDate):
                     time.sleep(2 ** attempt) # Exponential backoff
                 else:
                     print("[ERROR] Max retries exceeded: {} for URL: {}".format(e, url))
-                    return []
+                    return batchResult
+
+        # Index the response once by (site, padded param, method ID); the first series for a key wins
+        seriesIndex = {}
+
+        for series in timeSeriesList:
+            seriesSite = series['sourceInfo']['siteCode'][0]['value'] if 'sourceInfo' in series and 'siteCode' in series['sourceInfo'] else None
+            seriesParam = series['variable']['variableCode'][0]['value'] if 'variable' in series and 'variableCode' in series['variable'] else None
+
+            for seriesValues in series.get('values', []):
+                if seriesValues.get('method'):
+                    seriesIndex.setdefault((seriesSite, seriesParam, str(seriesValues['method'][0]['methodID'])), (series, seriesValues))
 
         # Process per input uid in order (reorder/validate)
         for uid in groupUids:
             site, method, param = uidMap.get(uid, (None, None, None))
 
             if not site:
-                resultDict[uid] = [] # Blank
+                batchResult[uid] = TimeSeries.timeSeries() # Blank
                 continue
-
-            # Find matching timeSeries
-            matchingSeries = None
-
-            for series in timeSeriesList:
-                seriesSite = series['sourceInfo']['siteCode'][0]['value'] if 'sourceInfo' in series and 'siteCode' in series['sourceInfo'] else None
-                seriesParam = series['variable']['variableCode'][0]['value'] if 'variable' in series and 'variableCode' in series['variable'] else None
-
-                if seriesSite == site and seriesParam == param.zfill(5): # Match padded param
-                    seriesValues = series['values']
-
-                    if seriesValues and 'method' in seriesValues[0] and seriesValues[0]['method']:
-                        seriesMethodId = seriesValues[0]['method'][0]['methodID']
-
-                        if str(seriesMethodId) == method:
-                            matchingSeries = series
-                            break
+            matchingSeries, seriesValues = seriesIndex.get((site, param.zfill(5), method), (None, None))
 
             if not matchingSeries:
                 print("[WARN] No matching series for uid '{}': site={}, param={}, method={}. Skipping.".format(uid, site, param, method))
-                resultDict[uid] = [] # Blank
+                batchResult[uid] = TimeSeries.timeSeries() # Blank
                 continue
 
             # Extract points
-            dataPoints = matchingSeries['values'][0]['value']
+            dataPoints = seriesValues['value']
             if Config.debug: print("[DEBUG] Found series for '{}': {} points, siteName={}".format(uid, len(dataPoints), matchingSeries['sourceInfo']['siteName']))
             outputData = []
 
@@ -161,26 +299,31 @@ def apiReadOldMethod(dataID, interval, startDate, endDate):
 
                 try:
                     dateTime = datetime.fromisoformat(f"{dateTimeStr.replace(' ', 'T')}") # Ensure ISO for parse
-                    formattedTs = dateTime.strftime('%m/%d/%y %H:%M:00') # Standard
-                    outputData.append(f"{formattedTs},{value}")
+                    outputData.append((TimeSeries.toEpoch(dateTime.replace(second=0, tzinfo=None)), TimeSeries.toFloat(value)))
                 except ValueError as e:
                     print("[WARN] Invalid point ts skipped for '{}': {} - {}".format(uid, dateTimeStr, e))
 
-            # Gap check
-            outputData = Query.gapCheck(timestamps, outputData, uid)
-            resultDict[uid] = outputData
+            # Aligned onto the query grid once, in queryWorker
+            batchResult[uid] = TimeSeries.timeSeries.fromPoints(outputData)
             
+        return batchResult
+
+    futures = [Scheduler.submit(nwisBaseUrl, readBatch, batch) for batch in batches(dataID)]
+
+    for batchResult in Scheduler.results(futures, cancel):
+        if batchResult:
+            resultDict.update(batchResult)
     return resultDict
 
-def apiRead(dataID, interval, startDate, endDate):
+def apiRead(dataID, interval, startDate, endDate, cancel=None):
     if Config.debug: print("[DEBUG] USGS.apiRead called with dataID: {}, interval: {}, start: {}, end: {}".format(dataID, interval, startDate, endDate))
 
     # Standardize timestamps
     timestamps = Query.buildTimestamps(startDate, endDate, interval)
 
-    if not timestamps:
+    if len(timestamps) == 0:
         print("[ERROR] No timestamps generated - invalid dates or interval.")
-        return []
+        return {}
 
     # Use new API only for DAY with UID methods
     if interval == 'DAY':
@@ -198,7 +341,7 @@ def apiRead(dataID, interval, startDate, endDate):
 
         if hasNonUid:
             print("[WARN] Non-UID method detected. Use numeric methodIDs with legacy method or UIDs with DAY interval.")
-            return []
+            return {}
 
         # Format start/end for new API (UTC, midnight for DAY)
         try:
@@ -206,7 +349,7 @@ def apiRead(dataID, interval, startDate, endDate):
             endDateTime = datetime.strptime(endDate, '%Y-%m-%d %H:%M')
 
             # Apply UTC offset for new API (negative to convert local to UTC)
-            offsetHours = Logic.getUtcOffsetInt(Logic.utcOffset)
+            offsetHours = Logic.getUtcOffsetInt(Config.utcOffset)
             startDateTime = startDateTime - timedelta(hours=offsetHours)
             endDateTime = endDateTime - timedelta(hours=offsetHours)
 
@@ -215,125 +358,54 @@ def apiRead(dataID, interval, startDate, endDate):
             endFormatted = endDateTime.replace(hour=0, minute=0, second=0).strftime('%Y-%m-%dT00:00:00Z')
         except ValueError as e:
             print("[ERROR] Date parse failed: {}".format(e))
-            return []
+            return {}
 
-        queryLimit = 50
         resultDict = {}
 
-        # Batch uids into groups of queryLimit
-        for groupStart in range(0, len(dataID), queryLimit):
-            groupUids = dataID[groupStart:groupStart + queryLimit]
-            if Config.debug: print("[DEBUG] Processing batch of {} uids: {}".format(len(groupUids), groupUids[:3] if groupUids else []))
-
-            # Parse group: collect unique sites, params, and check method
-            sites = []
-            params = []
-            uidMap = {} # uid -> (site, method, param)
-
-            for uid in groupUids:
-                parts = uid.split('-')
-
-                if len(parts) != 3:
-                    print("[WARN] Invalid uid format skipped: {}".format(uid))
-                    continue
-
-                site, method, param = parts
-                if Config.debug: print("[DEBUG] UID parts: site={}, method={}, param={}".format(site, method, param))
-
-                # Prepend USGS- for new API
-                sites.append('USGS-' + site)
-
-                # Pad param to 5 digits for new API
-                params.append(param.zfill(5))
-                uidMap[uid] = (site, method, param)
-            if not sites:
-                continue
-
-            # Unique for efficiency
-            sites = ','.join(set(sites))
-            joinedParams = ','.join(set(params))
-
-            # Get API key if available, otherwise proceed without
+        # Get API key if available, otherwise proceed without
+        try:
             apiKey = keyring.get_password("DataDoctor", "usgsApiKey") or ''
-            headers = {'X-Api-Key': apiKey} if apiKey else {}
+        except keyring.errors.KeyringError as e:
+            if Config.debug: print("[DEBUG] USGS.apiRead: No keyring available, querying without API key: {}".format(e))
+            apiKey = ''
+        headers = {'X-Api-Key': apiKey} if apiKey else {}
+
+        # One reader per batch of uids; each batch's pages share the host's concurrency budget
+        readers = [ogcReader(batch, startFormatted, endFormatted) for batch in batches(dataID)]
+        readers = [reader for reader in readers if reader.sites]
+
+        # Pages go out through a sliding window the size of the host's budget; each is folded into its reader and
+        # dropped as it lands, and the next queued page (or the next link it returned) takes its slot
+        windowSize = Http.maxConnections(Http.hostKey(ogcBaseUrl))
+        queued = deque((reader, reader.firstUrl()) for reader in readers)
+        inFlight = {} # future -> reader
+
+        while queued or inFlight:
+            while queued and len(inFlight) < windowSize:
+                reader, url = queued.popleft()
+                if not reader.failed: # The batch is already lost; skip its remaining pages
+                    inFlight[Scheduler.submit(ogcBaseUrl, ogcGetPage, url, headers, cancel)] = reader
+            if not inFlight:
+                break
+            future, page = Scheduler.nextResult(list(inFlight), cancel)
+            reader = inFlight.pop(future)
 
-            # Construct URL for daily collection
-            url = "https://api.waterdata.usgs.gov/ogcapi/v0/collections/daily/items?f=json&monitoring_location_id={}&time={}/{}&parameter_code={}&statistic_id=00003".format(
-                sites, startFormatted, endFormatted, joinedParams
-            )
+            if page is None:
+                reader.failed = True
+                continue
+            queued.extend((reader, nextUrl) for nextUrl in reader.addPage(page))
 
-            if Config.debug: print("[DEBUG] Fetching USGS new API URL: {}".format(url))
-            maxRetries = 3
+        failedUids = set()
 
-            for attempt in range(maxRetries):
-                try:
-                    response = requests.get(url, headers=headers)
-                    response.raise_for_status()
-                    readFile = json.loads(response.content)
-                    if Config.debug: print("[DEBUG] API response: {}".format(readFile)) # Debug full response
-                    features = readFile.get('features', [])
-                    if Config.debug: print("[DEBUG] Fetched {} feature entries.".format(len(features)))
-                    break
-                except Exception as e:
-                    if attempt < maxRetries - 1:
-                        print("[WARN] Retry {} of {}: USGS new API fetch failed: {} for URL: {}. Retrying...".format(attempt + 1, maxRetries, e, url))
-                        time.sleep(2 ** attempt) # Exponential backoff
-                    else:
-                        print("[ERROR] Max retries exceeded: {} for URL: {}".format(e, url))
-                        return []
-
-            # Process features
-            for uid in groupUids:
-                site, method, param = uidMap.get(uid, (None, None, None))
-
-                if not site:
-                    resultDict[uid] = [] # Blank
-                    continue
-
-                # Match by site, param, and time_series_id
-                matchingFeature = None
-
-                for feature in features:
-                    featureSite = feature['properties'].get('monitoring_location_id')
-                    featureParam = feature['properties'].get('parameter_code')
-                    featureTimeSeriesId = feature['properties'].get('time_series_id')
-
-                    if featureSite == 'USGS-' + site and featureParam == param.zfill(5) and featureTimeSeriesId == method:
-                        matchingFeature = feature
-                        break
-                if not matchingFeature:
-                    print("[WARN] No matching feature for uid '{}': site={}, param={}, method={}. Skipping.".format(uid, site, param, method))
-                    resultDict[uid] = [] # Blank
-                    continue
-
-                # Extract points
-                if Config.debug: print("[DEBUG] Found feature for '{}': properties={}".format(uid, matchingFeature['properties']))
-                outputData = []
-
-                # Collect all matching features for the UID
-                matchingFeatures = [f for f in features if f['properties'].get('time_series_id') == method]
-
-                # Sort by 'time' chronologically
-                matchingFeatures.sort(key=lambda f: f['properties'].get('time'))
-
-                for feature in matchingFeatures:
-                    value = feature['properties'].get('value')
-                    dateTimeStr = feature['properties'].get('time') + 'T00:00:00Z' # Use UTC midnight
-
-                    try:
-                        dateTime = datetime.fromisoformat(dateTimeStr)
-                        formattedTs = dateTime.strftime('%m/%d/%y %H:%M:00')
-                        if value is not None: # Ensure value exists
-                            outputData.append(f"{formattedTs},{value}")
-                    except ValueError as e:
-                        print("[WARN] Invalid point ts skipped for '{}': {} - {}".format(uid, dateTimeStr, e))
-
-                if Config.debug: print("[DEBUG] Extracted {} points for '{}': {}".format(len(outputData), uid, outputData))
-
-                # Gap check
-                outputData = Query.gapCheck(timestamps, outputData, uid)
-                resultDict[uid] = outputData
+        for reader in readers:
+            resultDict.update(reader.results())
+            if reader.failed:
+                failedUids.update(reader.groupUids)
 
+        # Failed uids stay out of the result so they show as failed rather than blank
+        for uid in dataID:
+            if uid not in failedUids:
+                resultDict.setdefault(uid, TimeSeries.timeSeries()) # Blank
         return resultDict
     else:
-        return apiReadOldMethod(dataID, interval, startDate, endDate)
\ No newline at end of file
+        return apiReadOldMethod(dataID, interval, startDate, endDate, cancel)
\ No newline at end of file
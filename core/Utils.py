@@ -187,7 +187,15 @@ def loadConfig():
         'retroMode': True,
         'qaqc': True,
         'rawData': False,
-        'lastQuickLook': ''
+        'lastQuickLook': '',
+        'cacheEnabled': True,
+        'cacheRecentHours': 48,
+        'httpConnectTimeout': 10,
+        'httpReadTimeout': 120,
+        'httpMaxConnections': 8,
+        'httpHostConnections': {},
+        'schedulerMaxWorkers': 24,
+        'usbrBackend': 'auto'
     }
 
     if os.path.exists(configPath):
@@ -280,6 +288,14 @@ def loadConfig():
             settings['qaqc'] = config.get('qaqc', settings['qaqc'])
             settings['rawData'] = config.get('rawData', settings['rawData'])
             settings['lastQuickLook'] = config.get('lastQuickLook', settings['lastQuickLook'])
+            settings['cacheEnabled'] = config.get('cacheEnabled', settings['cacheEnabled'])
+            settings['cacheRecentHours'] = config.get('cacheRecentHours', settings['cacheRecentHours'])
+            settings['httpConnectTimeout'] = config.get('httpConnectTimeout', settings['httpConnectTimeout'])
+            settings['httpReadTimeout'] = config.get('httpReadTimeout', settings['httpReadTimeout'])
+            settings['httpMaxConnections'] = config.get('httpMaxConnections', settings['httpMaxConnections'])
+            settings['httpHostConnections'] = config.get('httpHostConnections', settings['httpHostConnections'])
+            settings['schedulerMaxWorkers'] = config.get('schedulerMaxWorkers', settings['schedulerMaxWorkers'])
+            settings['usbrBackend'] = config.get('usbrBackend', settings['usbrBackend'])
 
             if Config.debug:
                 print("[DEBUG] Loaded settings from user.config: {}".format(settings))
@@ -416,6 +432,14 @@ def reloadGlobals():
     Config.retroMode = settings['retroMode']
     Config.qaqcEnabled = settings['qaqc']
     Config.rawData = settings['rawData']
+    Config.cacheEnabled = settings['cacheEnabled']
+    Config.cacheRecentHours = settings['cacheRecentHours']
+    Config.httpConnectTimeout = settings['httpConnectTimeout']
+    Config.httpReadTimeout = settings['httpReadTimeout']
+    Config.httpMaxConnections = settings['httpMaxConnections']
+    Config.httpHostConnections = settings['httpHostConnections']
+    Config.schedulerMaxWorkers = settings['schedulerMaxWorkers']
+    Config.usbrBackend = settings['usbrBackend']
 
     if Config.debug:
         print("[DEBUG] Globals reloaded from user.config")
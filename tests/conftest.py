@@ -0,0 +1,26 @@
+import os
+import sys
+import traceback
+import pytest
+
+# Widgets are built without a display; the core modules import the main window, so the app must exist first
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtCore import QStandardPaths
+from PyQt6.QtWidgets import QApplication
+
+QStandardPaths.setTestModeEnabled(True) # Cache and settings go to a test location, never the user's
+app = QApplication.instance() or QApplication(sys.argv)
+
+@pytest.fixture
+def qapp():
+    return app
+
+@pytest.fixture(autouse=True)
+def slotErrors(monkeypatch):
+    """PyQt aborts on an exception raised in a slot unless sys.excepthook is replaced; fail the test instead."""
+    errors = []
+    monkeypatch.setattr(sys, 'excepthook', lambda *info: errors.append(info))
+    yield
+    assert not errors, ''.join(traceback.format_exception(*errors[0]))
@@ -0,0 +1,31 @@
+import pytest
+from datetime import datetime
+from core import Aquarius, Config
+
+start, end = '2025-01-01 00:00', '2025-01-02 00:00'
+uids = ['0123456789abcdef0123456789abcdef', 'fedcba9876543210fedcba9876543210']
+
+@pytest.fixture
+def signedIn(monkeypatch):
+    monkeypatch.setattr(Config, 'utcOffset', 'UTC+00:00 | Coordinated Universal Time')
+    monkeypatch.setattr(Aquarius.tokens, 'getToken', lambda: ('https://aquarius.example', 'token'))
+
+def testSignedOutReadReturnsNoUids(signedIn, monkeypatch):
+    monkeypatch.setattr(Aquarius.tokens, 'getToken', lambda: ('', None))
+    assert Aquarius.apiRead(uids, start, end, 'HOUR') == {} # Absent UIDs show as failed columns, not blank ones
+
+@pytest.mark.parametrize('interval', ['MONTH', 'YEAR', 'WATER YEAR'])
+def testUnsupportedIntervalReturnsNoUids(signedIn, interval):
+    assert Aquarius.apiRead(uids, start, end, interval) == {}
+
+def testPlanChunksSplitsTheRangeBackToBack():
+    chunks = Aquarius.planChunks(datetime(2025, 1, 1), datetime(2025, 1, 5), 4000, 1000)
+
+    assert chunks == [('2025-01-01 00:00', '2025-01-02 00:00'), ('2025-01-02 00:00', '2025-01-03 00:00'),
+                      ('2025-01-03 00:00', '2025-01-04 00:00'), ('2025-01-04 00:00', '2025-01-05 00:00')]
+
+def testPlanChunksFoldsASmallRemainder():
+    assert len(Aquarius.planChunks(datetime(2025, 1, 1), datetime(2025, 1, 5), 3100, 1000)) == 3
+    assert len(Aquarius.planChunks(datetime(2025, 1, 1), datetime(2025, 1, 5), 3300, 1000)) == 4
+    assert Aquarius.planChunks(datetime(2025, 1, 1), datetime(2025, 1, 5), 10, 1000) == [('2025-01-01 00:00', '2025-01-05 00:00')]
+    assert Aquarius.planChunks(datetime(2025, 1, 1), datetime(2025, 1, 5), 0, 1000) == []
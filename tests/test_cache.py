@@ -0,0 +1,40 @@
+import numpy as np
+from datetime import datetime
+from core import Cache, Config, TimeSeries
+
+hour = 3600
+t0 = 1577836800 # 2020-01-01, well before the recent tail
+
+def testMergeRangesJoinsOverlappingAndTouchingRanges():
+    merged = Cache.mergeRanges([(t0 + 5 * hour, t0 + 8 * hour), (t0, t0 + 2 * hour), (t0 + 2 * hour, t0 + 3 * hour), (t0 + 6 * hour, t0 + 7 * hour)])
+    np.testing.assert_array_equal(merged, [[t0, t0 + 3 * hour], [t0 + 5 * hour, t0 + 8 * hour]])
+    assert Cache.mergeRanges([]).shape == (0, 2)
+
+def testMissingRangesAreTheGapsInTheRequest():
+    ranges = np.array([[t0 + 2 * hour, t0 + 4 * hour], [t0 + 6 * hour, t0 + 8 * hour]])
+
+    assert Cache.missingRanges(ranges, t0, t0 + 10 * hour) == [(t0, t0 + 2 * hour), (t0 + 4 * hour, t0 + 6 * hour), (t0 + 8 * hour, t0 + 10 * hour)]
+    assert Cache.missingRanges(ranges, t0 + 2 * hour, t0 + 4 * hour) == []
+    assert Cache.missingRanges(np.empty((0, 2), dtype=np.int64), t0, t0 + hour) == [(t0, t0 + hour)]
+
+def testMissingRangesAlwaysRefetchTheRecentTail(monkeypatch):
+    monkeypatch.setattr(Config, 'cacheRecentHours', 48)
+    now = TimeSeries.toEpoch(datetime.now())
+    start, end = now - now % hour - 10 * 24 * hour, now - now % hour + hour
+    missing = Cache.missingRanges(np.array([[start, end]]), start, end)
+
+    assert len(missing) == 1 and missing[0][1] == end
+    assert end - missing[0][0] >= 48 * hour
+
+def testStoreReplacesTheFetchedRangeAndKeepsTheRest():
+    Cache.clear()
+    key = Cache.cacheKey('USBR-TESTHDB', '1930', '0', 'HOUR')
+    Cache.store(key, TimeSeries.timeSeries(t0 + hour * np.arange(4), [1.0, 2.0, 3.0, 4.0], 'Lake Mead'), t0, t0 + 4 * hour)
+    Cache.store(key, TimeSeries.timeSeries(t0 + hour * np.arange(2, 6), [30.0, np.nan, 50.0, 60.0]), t0 + 2 * hour, t0 + 6 * hour)
+    times, values, ranges, label = Cache.loadEntry(key)
+
+    np.testing.assert_array_equal(times, t0 + hour * np.arange(6))
+    np.testing.assert_array_equal(values, [1.0, 2.0, 30.0, np.nan, 50.0, 60.0])
+    np.testing.assert_array_equal(ranges, [[t0, t0 + 6 * hour]])
+    assert label == 'Lake Mead'
+    assert len(Cache.read(key, t0 + hour, t0 + 3 * hour)) == 2
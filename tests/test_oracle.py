@@ -0,0 +1,78 @@
+import datetime
+import numpy as np
+import oracledb
+import pytest
+from core import Oracle
+
+query = 'SELECT START_DATE_TIME, VALUE FROM R_HOUR WHERE SITE_DATATYPE_ID = :1'
+rows = [(datetime.datetime(2025, 1, 1, 0), 1.5), (datetime.datetime(2025, 1, 1, 1), None), (datetime.datetime(2025, 1, 1, 2), 3.0)]
+
+class fakeCursor:
+    """Executed-cursor stand-in: one execute, then rows in arraysize batches."""
+    def __init__(self, calls):
+        self.calls = calls
+        self.description = None
+        self.pending = []
+
+    def parse(self, statement):
+        self.calls.append('parse')
+
+    def execute(self, statement, params):
+        self.calls.append('execute')
+        self.description = [('START_DATE_TIME', oracledb.DB_TYPE_DATE), ('VALUE', oracledb.DB_TYPE_NUMBER)]
+        self.pending = list(rows)
+
+    def fetchmany(self):
+        batch, self.pending = self.pending[:self.arraysize], self.pending[self.arraysize:]
+        return batch
+
+    def close(self):
+        pass
+
+class fakeConnection:
+    def __init__(self):
+        self.calls = []
+
+    def cursor(self):
+        return fakeCursor(self.calls)
+
+def checkResult(result):
+    np.testing.assert_array_equal(result.column('start_date_time'), np.array(['2025-01-01T00', '2025-01-01T01', '2025-01-01T02'], dtype='datetime64[s]'))
+    np.testing.assert_array_equal(result.column('value'), [1.5, np.nan, 3.0])
+    np.testing.assert_array_equal(result.mask('value'), [False, True, False])
+
+def testCursorPathTypesColumnsFromTheExecutedCursor(monkeypatch):
+    monkeypatch.setattr(Oracle, 'pyarrow', None)
+    connection = fakeConnection()
+    result = Oracle.fetchColumns(connection, query, ['1930'], batchSize=2)
+
+    assert connection.calls == ['execute'] # No separate parse round trip
+    checkResult(result)
+
+def testArrowPathTypesColumnsFromTheFrameSchema(monkeypatch):
+    pyarrow = pytest.importorskip('pyarrow')
+    monkeypatch.setattr(Oracle, 'pyarrow', pyarrow)
+
+    class fakeFrame:
+        def __init__(self, batch):
+            self.arrays = [pyarrow.array([row[0] for row in batch], type=pyarrow.timestamp('s')), pyarrow.array([row[1] for row in batch], type=pyarrow.float64())]
+
+        def column_names(self):
+            return ['START_DATE_TIME', 'VALUE']
+
+        def num_columns(self):
+            return len(self.arrays)
+
+        def get_column(self, col):
+            return self.arrays[col]
+
+    class arrowConnection(fakeConnection):
+        def fetch_df_batches(self, statement, parameters=None, size=None):
+            self.calls.append('fetch_df_batches')
+            return [fakeFrame(rows[i:i + size]) for i in range(0, len(rows), size)]
+
+    connection = arrowConnection()
+    result = Oracle.fetchColumns(connection, query, ['1930'], batchSize=2)
+
+    assert connection.calls == ['fetch_df_batches'] # The query runs once and no cursor is opened
+    checkResult(result)
@@ -0,0 +1,19 @@
+from core import Planner
+
+start, end = '2025-01-01 00:00', '2025-01-03 00:00'
+
+def testMixedIntervalsShareTheFinestGrid():
+    items = [('09380000-0123456789abcdef0123456789abcdef-60', 'DAY', 'USGS-NWIS', '0', 0), ('1930', 'HOUR', 'USBR-LCHDB', '0', 1)]
+    plan = Planner.buildPlan(items, start, end)
+
+    assert plan.rowCount() == 48 # The hourly grid, though the daily item comes first
+    assert plan.pointCount() == 2 * 48
+    assert plan.timestamps[24] - plan.timestamps[0] == 86400 # The second day's value has a row to land on
+
+def testSplitBatchesRespectsCountAndJoinedLength():
+    ids = [f"{i:04d}" for i in range(10)]
+
+    assert Planner.splitBatches(ids, 4, 1000) == [ids[0:4], ids[4:8], ids[8:10]]
+    assert Planner.splitBatches(ids, 50, 14) == [ids[0:3], ids[3:6], ids[6:9], ids[9:10]] # '0000,0001,0002' is 14 characters
+    assert Planner.splitBatches(['a' * 20], 50, 10) == [['a' * 20]] # An ID too long for the limit still goes out alone
+    assert Planner.splitBatches([], 50, 100) == []
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+from PyQt6 import sip
+from PyQt6.QtCore import QThreadPool, QCoreApplication, QEvent
+from PyQt6.QtGui import QColor
+from PyQt6.QtWidgets import QTableView, QTableWidget, QTableWidgetItem
+from core import Query, USBR, Config, Cache, TimeSeries, TableModel
+
+start, end = '2025-01-01 00:00', '2025-01-02 00:00'
+
+def runWorker(groupKey, items):
+    """Run a queryWorker in this thread and return the tuple it emits."""
+    timestamps = TimeSeries.buildGrid(start, end, groupKey[1])
+    signals = Query.queryWorkerSignals()
+    emitted = []
+    signals.resultSignal.connect(emitted.append)
+    Query.queryWorker(groupKey, items, signals, start, end, False, timestamps, np.full(len(timestamps), np.nan)).run()
+    return emitted[0]
+
+@pytest.mark.parametrize('cacheEnabled', [False, True])
+def testDroppedUsbrIdsAreReportedAsErrors(cacheEnabled, monkeypatch):
+    monkeypatch.setattr(Config, 'cacheEnabled', cacheEnabled)
+    Cache.clear()
+    grid = TimeSeries.buildGrid(start, end, 'HOUR')
+
+    # 1721's batch failed and was dropped; 1776 answered with no points
+    def read(svr, SDIDs, *args):
+        return {'1930': TimeSeries.timeSeries(grid[:3], np.array([1.0, 2.0, 3.0])), '1776': TimeSeries.timeSeries()}, 'api'
+    monkeypatch.setattr(USBR, 'read', read)
+    items = [(i, sdid, sdid, 'USBR-TESTHDB', 'HOUR', '0') for i, sdid in enumerate(['1930', '1721', '1776'])]
+    _, groupResult, _, _, groupStates = runWorker(('USBR-TESTHDB', 'HOUR', '0'), items)
+
+    assert groupStates[('1930', 'USBR-TESTHDB', 'HOUR', '0')] == 'ok'
+    assert groupStates[('1721', 'USBR-TESTHDB', 'HOUR', '0')] == 'error'
+    assert groupStates[('1776', 'USBR-TESTHDB', 'HOUR', '0')] == 'empty'
+    assert np.isnan(groupResult[('1721', 'USBR-TESTHDB', 'HOUR', '0')]).all()
+
+def testHeaderClickSortsColumn(qapp, monkeypatch):
+    monkeypatch.setattr(Config, 'sortState', {})
+    monkeypatch.setattr(Config, 'qaqcEnabled', True)
+    timestamps = 1735689600 + 3600 * np.arange(5, dtype=np.int64)
+    frame = TimeSeries.resultFrame(timestamps, 2, [{'dataID': 'a', 'type': 'normal'}, {'dataID': 'b', 'type': 'normal'}])
+    frame.setColumn(0, [3.0, 1.0, np.nan, 5.0, 2.0], state='ok')
+    frame.setColumn(1, [30.0, 10.0, 0.0, 50.0, 20.0], state='ok')
+    table = QTableView()
+    dataDictionaryTable = QTableWidget(0, 8)
+    Query.buildTable(table, frame, dataDictionaryTable)
+    table.horizontalHeader().sectionClicked.connect(lambda col: Query.customSortTable(table, col, dataDictionaryTable, frame))
+
+    # The sort runs on the thread pool and lands through a queued signal; blanks sort as 0 and rows move together
+    for first, second in [([np.nan, 1.0, 2.0, 3.0, 5.0], [0.0, 10.0, 20.0, 30.0, 50.0]), ([5.0, 3.0, 2.0, 1.0, np.nan], [50.0, 30.0, 20.0, 10.0, 0.0])]:
+        table.horizontalHeader().sectionClicked.emit(0)
+        QThreadPool.globalInstance().waitForDone()
+        qapp.processEvents()
+        np.testing.assert_array_equal(frame.column(0), first)
+        np.testing.assert_array_equal(frame.column(1), second)
+        assert table.model().flags is not None # QAQC reran on the new row order
+
+def testControllerIsFreedAfterQuery(qapp, monkeypatch):
+    import DataDoctor
+    from ui.uiDataDictionary import uiDataDictionary
+    monkeypatch.setattr(Config, 'cacheEnabled', False)
+    monkeypatch.setattr(Config, 'systemTextColor', QColor(0, 0, 0), raising=False)
+    monkeypatch.setattr(USBR, 'read', lambda svr, SDIDs, s, e, interval, *args: ({sdid: TimeSeries.timeSeries(TimeSeries.buildGrid(s, e, interval), np.ones(25)) for sdid in SDIDs}, 'api'))
+    mainWindow = DataDoctor.uiMain()
+    mainWindow.winDataDictionary = uiDataDictionary(mainWindow)
+    controller = Query.executeQuery(mainWindow, [('1930', 'HOUR', 'USBR-LCHDB', '0', 0)], start, end, False, mainWindow.winDataDictionary.mainTable)
+
+    while not controller.done:
+        qapp.processEvents()
+    QCoreApplication.sendPostedEvents(None, QEvent.Type.DeferredDelete.value)
+    assert sip.isdeleted(controller)
+    assert mainWindow.queryController is None
+    assert mainWindow.mainTable.model().frame.column(0)[0] == 1.0
+
+def testUsgsReadsAreLabeledApi(monkeypatch):
+    monkeypatch.setattr(Config, 'cacheEnabled', True)
+    Cache.clear()
+    grid = TimeSeries.buildGrid(start, end, 'HOUR')
+    monkeypatch.setattr(Query.USGS, 'apiRead', lambda ids, *args: {i: TimeSeries.timeSeries(grid, np.ones(len(grid))) for i in ids})
+    items = [(0, '09428500-210438-60', '09428500-210438-60', 'USGS-NWIS', 'HOUR', '0')]
+    key = ('09428500-210438-60', 'USGS-NWIS', 'HOUR', '0')
+
+    assert runWorker(('USGS-NWIS', 'HOUR', '0'), items)[3][key] == 'api'
+    assert runWorker(('USGS-NWIS', 'HOUR', '0'), items)[3][key] == 'cache' # Second read is served from the cache
+
+def testQaqcFlagPriority(qapp, monkeypatch):
+    monkeypatch.setattr(Config, 'qaqcEnabled', True)
+    timestamps = np.append(1735689600 + 3600 * np.arange(6, dtype=np.int64), 4102444800) # The last row is in 2100
+    frame = TimeSeries.resultFrame(timestamps, 2, [{'dataID': 'a', 'type': 'normal'}, {'dataID': 'b', 'type': 'normal'}])
+    frame.setColumn(0, [20.0, 60.0, 60.0, np.nan, 20.0, -1.0, np.nan], state='ok')
+    frame.setColumn(1, [1.0, 1.0, 2.0, np.nan, 2.0, 500.0, np.nan], state='ok')
+    dataDictionaryTable = QTableWidget(1, 8)
+    for col, text in [(0, 'a'), (3, '10'), (4, '50'), (5, '0'), (6, '100'), (7, '30')]:
+        dataDictionaryTable.setItem(0, col, QTableWidgetItem(text))
+    model = TableModel.resultTableModel(frame)
+    Query.qaqc(model, dataDictionaryTable)
+
+    # Repeats beat rate of change, which beats the limits; expected limits are checked before cutoffs; blanks skip back to the last value
+    assert model.flags[:, 0].tolist() == [TableModel.flagNone, TableModel.flagRateOfChange, TableModel.flagRepeat, TableModel.flagMissing,
+                                          TableModel.flagRateOfChange, TableModel.flagBelowExpected, TableModel.flagNone]
+    assert model.flags[:, 1].tolist() == [TableModel.flagNone, TableModel.flagRepeat, TableModel.flagNone, TableModel.flagMissing,
+                                          TableModel.flagRepeat, TableModel.flagNone, TableModel.flagNone] # No thresholds, so only repeats and gaps
@@ -0,0 +1,28 @@
+import threading
+import time
+from core import Scheduler
+
+def testNestedBudgetsShareTheHostLimit():
+    lock = threading.Lock()
+    counts = {'host': [0, 0], 'lchdb': [0, 0], 'uchdb2': [0, 0]} # current, most seen
+
+    def task(server):
+        with lock:
+            for name in ('host', server):
+                counts[name][0] += 1
+                counts[name][1] = max(counts[name])
+        time.sleep(0.02)
+        with lock:
+            for name in ('host', server):
+                counts[name][0] -= 1
+        return server
+
+    futures = []
+    for server in ('lchdb', 'uchdb2'):
+        budget = f"test.host/{server}"
+        Scheduler.nest(budget, 'test.host', 3)
+        futures += [Scheduler.submitTo(budget, 2, task, server) for _ in range(6)]
+
+    assert Scheduler.results(futures) == ['lchdb'] * 6 + ['uchdb2'] * 6
+    assert counts['host'][1] == 3 # The servers together never exceed the host
+    assert counts['lchdb'][1] <= 2 and counts['uchdb2'][1] <= 2
@@ -0,0 +1,61 @@
+import threading
+import oracledb
+from PyQt6.QtCore import QThreadPool
+from PyQt6.QtWidgets import QWidget, QComboBox, QPushButton, QLabel, QPlainTextEdit, QTableView
+from core import SqlConsole, Oracle
+
+def buildTab():
+    tab = QWidget()
+    for widgetType, name in [(QComboBox, 'cbSqlServer'), (QPushButton, 'btnSqlRun'), (QPushButton, 'btnSqlCancel'),
+                             (QLabel, 'lblSqlStatus'), (QPlainTextEdit, 'txtSql'), (QTableView, 'sqlTable')]:
+        widgetType(tab).setObjectName(name)
+    return tab
+
+def testClosingTheTabMidQueryReleasesTheConnection(qapp, monkeypatch):
+    executing = threading.Event()
+    proceed = threading.Event()
+    released = []
+
+    class fakeCursor:
+        description = [('VALUE', oracledb.DB_TYPE_NUMBER)]
+
+        def fetchmany(self, size):
+            return [(1.0,)] * size # A full page, so the cursor stays open for more
+
+        def close(self):
+            released.append('cursor')
+
+    class fakeConnection:
+        def __init__(self, alias):
+            pass
+
+        def connect(self):
+            pass
+
+        def openCursor(self, query, batchSize=None):
+            executing.set()
+            proceed.wait(5)
+            return fakeCursor()
+
+        def cancel(self):
+            pass
+
+        def close(self):
+            released.append('connection')
+
+    monkeypatch.setattr(Oracle, 'oracleConnection', fakeConnection)
+    tab = buildTab()
+    console = SqlConsole.sqlConsole(tab, tab)
+    console.txtSql.setPlainText('SELECT VALUE FROM R_HOUR')
+    console.run()
+    assert executing.wait(5)
+
+    # The server call outlives the tab; its result must not keep the connection checked out
+    console.close()
+    assert released == []
+    proceed.set()
+    QThreadPool.globalInstance().waitForDone()
+    qapp.processEvents()
+
+    assert released == ['cursor', 'connection']
+    assert not console.busy()
@@ -0,0 +1,41 @@
+import numpy as np
+from core import TimeSeries
+
+hour = 3600
+t0 = 1735689600 # 2025-01-01 00:00
+
+def testAlignToGridPlacesPointsOnARegularGrid():
+    grid = t0 + hour * np.arange(6, dtype=np.int64)
+    series = TimeSeries.timeSeries([t0 + hour, t0 + 4 * hour, t0 + 4 * hour, t0 + 90, t0 - hour, t0 + 6 * hour], [1.0, 4.0, 40.0, 9.0, 8.0, 7.0])
+    aligned, offGrid = TimeSeries.alignToGrid(grid, series)
+
+    np.testing.assert_array_equal(aligned, [np.nan, 1.0, np.nan, np.nan, 4.0, np.nan]) # First value wins on a repeat
+    assert offGrid == 4 # The repeat, the off-step point and both points outside the grid
+
+def testAlignToGridSearchesAnIrregularGrid():
+    grid = np.array([t0, t0 + 31 * 86400, t0 + 59 * 86400], dtype=np.int64) # Month starts
+    aligned, offGrid = TimeSeries.alignToGrid(grid, TimeSeries.timeSeries([t0 + 59 * 86400, t0 + 86400, t0], [3.0, 2.0, 1.0]))
+
+    np.testing.assert_array_equal(aligned, [1.0, np.nan, 3.0])
+    assert offGrid == 1
+
+def testAlignToGridWithNoSeries():
+    grid = t0 + hour * np.arange(3, dtype=np.int64)
+    aligned, offGrid = TimeSeries.alignToGrid(grid, None)
+
+    assert np.isnan(aligned).all() and offGrid == 0
+
+def gridDates(grid):
+    return [str(date) for date in grid.astype('datetime64[s]').astype('datetime64[D]')]
+
+def testBuildGridSteps():
+    assert len(TimeSeries.buildGrid('2025-01-01 00:00', '2025-01-02 00:00', 'HOUR')) == 24
+    assert len(TimeSeries.buildGrid('2025-01-01 00:00', '2025-01-02 00:00', 'INSTANT:15')) == 96
+    assert len(TimeSeries.buildGrid('2025-01-01 00:00', '2025-01-31 00:00', 'DAY')) == 30
+    assert TimeSeries.buildGrid('2025-01-01 00:00', '2025-01-02 00:00', 'INSTANT:5') is None
+    assert not TimeSeries.buildGrid('2025-01-01 00:00', '2025-01-02 00:00', 'HOUR').flags.writeable # Shared through the memo
+
+def testBuildGridCalendarStarts():
+    assert gridDates(TimeSeries.buildGrid('2025-01-15 00:00', '2025-04-15 00:00', 'MONTH')) == ['2025-01-01', '2025-02-01', '2025-03-01', '2025-04-01']
+    assert gridDates(TimeSeries.buildGrid('2023-06-01 00:00', '2025-06-01 00:00', 'YEAR')) == ['2023-01-01', '2024-01-01', '2025-01-01']
+    assert gridDates(TimeSeries.buildGrid('2024-03-01 00:00', '2025-11-01 00:00', 'WATER YEAR')) == ['2023-10-01', '2024-10-01', '2025-10-01']
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+from core import USBR, TimeSeries
+
+sdids = ['1930', '1721']
+start, end = '2025-01-01 00:00', '2025-01-02 00:00'
+
+def series(*values):
+    times = 1735689600 + 3600 * np.arange(len(values), dtype=np.int64)
+    return TimeSeries.timeSeries(times, np.array(values, dtype=np.float64))
+
+@pytest.fixture
+def backends(monkeypatch):
+    """Force the SQL path and record which backend each read reaches."""
+    calls = []
+    monkeypatch.setattr(USBR, 'useSql', lambda *args: True)
+    monkeypatch.setattr(USBR, 'sqlUnavailable', set())
+
+    def apiRead(svr, SDIDs, *args):
+        calls.append('api')
+        return {sdi: series(1.0, 2.0) for sdi in SDIDs}
+    monkeypatch.setattr(USBR, 'apiRead', apiRead)
+    return calls
+
+def testSqlReadWithDataIsServedBySql(backends, monkeypatch):
+    monkeypatch.setattr(USBR, 'sqlRead', lambda svr, SDIDs, *args: {'1930': series(5.0), '1721': TimeSeries.timeSeries()})
+    result, backend = USBR.read('lchdb', sdids, start, end, 'HOUR', isInternal=True)
+
+    assert backend == 'sql'
+    assert backends == []
+    assert len(result['1930']) == 1
+
+def testEmptySqlReadFallsBackToApi(backends, monkeypatch):
+    monkeypatch.setattr(USBR, 'sqlRead', lambda svr, SDIDs, *args: {sdi: TimeSeries.timeSeries() for sdi in SDIDs})
+    result, backend = USBR.read('lchdb', sdids, start, end, 'HOUR', isInternal=True)
+
+    assert backend == 'api'
+    assert backends == ['api']
+    assert all(len(result[sdi]) == 2 for sdi in sdids)
+    assert 'lchdb' not in USBR.sqlUnavailable # The server answered; later reads still try SQL
+
+def testFailedSqlReadFallsBackToApiForTheSession(backends, monkeypatch):
+    monkeypatch.setattr(USBR, 'sqlRead', lambda svr, SDIDs, *args: {})
+    result, backend = USBR.read('lchdb', sdids, start, end, 'HOUR', isInternal=True)
+
+    assert backend == 'api'
+    assert backends == ['api']
+    assert 'lchdb' in USBR.sqlUnavailable
+
+@pytest.mark.parametrize('interval', ['INSTANT:1', 'INSTANT:15', 'INSTANT:60'])
+def testInstantReadsSkipSql(interval, monkeypatch):
+    monkeypatch.setattr(USBR, 'sqlUnavailable', set())
+    assert not USBR.useSql('lchdb', interval, True)
+
+def testCredentialLookupIsCached(monkeypatch):
+    from core import Oracle
+    lookups = []
+    monkeypatch.setattr(Oracle.keyring, 'get_password', lambda service, name: lookups.append(name) or 'secret')
+    monkeypatch.setattr(Oracle.manager, 'hasAlias', lambda alias: True)
+    monkeypatch.setattr(Oracle.manager, 'credentialsStored', None)
+    monkeypatch.setattr(USBR, 'sqlUnavailable', set())
+    monkeypatch.setattr(USBR.Config, 'usbrBackend', 'auto')
+
+    assert all(USBR.useSql('lchdb', 'HOUR', True) for _ in range(3))
+    assert lookups == ['oracleUser', 'oraclePassword']
+
+def testTimeWindowsAreBackToBackAndEndOneMinuteEarly():
+    grid = 1735689600 + 3600 * np.arange(5, dtype=np.int64)
+    endEpoch = 1735689600 + 5 * 3600
+    windows = USBR.timeWindows(grid, endEpoch, 0, 2)
+
+    assert windows == [(grid[0], grid[2] - 60), (grid[2], grid[4] - 60), (grid[4], endEpoch)]
+    assert USBR.timeWindows(grid, endEpoch, 3600, 5) == [(grid[0] - 3600, endEpoch)] # Period offset shifts the request, not the end
+
+def testParseClockHandlesMidnightAndNoon():
+    assert USBR.parseClock('12:00:00 AM') == 0
+    assert USBR.parseClock('12:30:00 PM') == 12 * 3600 + 30 * 60
+    assert USBR.parseClock('1:05:00 PM') == 13 * 3600 + 5 * 60
+    assert USBR.parseClock('11:59:59 PM') == 86399
+    assert USBR.parseClock('07:15') == 7 * 3600 + 15 * 60
+
+def testDecodeTimesReadsBothDateStyles():
+    epochs = USBR.decodeTimes(['1/1/2025 12:00:00 AM', '1/1/2025 12:00:00 PM', '1/2/2025 1:00:00 AM'], shiftSeconds=-3600)
+    np.testing.assert_array_equal(epochs, 1735689600 + 3600 * np.array([0, 12, 25]) - 3600)
+    np.testing.assert_array_equal(USBR.decodeTimes(['2025-01-02T13:00:00', '2025-01-02 14:00:00']), 1735689600 + 3600 * np.array([37, 38]))
+    assert len(USBR.decodeTimes([])) == 0
+
+def testSplitCsvReadsOneColumnPerSdi(capsys):
+    text = 'Date, SDI_1930, SDI_1721\n1/1/2025 12:00:00 AM, 1.5, \n\n"1/1/2025 1:00:00 AM","2","3"\n1/1/2025 2:00:00 AM,4\n'
+    seriesData = USBR.splitCsv(text)
+
+    assert seriesData == {'1930': (['1/1/2025 12:00:00 AM', '1/1/2025 1:00:00 AM'], ['1.5', '2']),
+                          '1721': (['1/1/2025 12:00:00 AM', '1/1/2025 1:00:00 AM'], ['', '3'])}
+    assert 'Dropped 1 of 3 rows' in capsys.readouterr().out
+    assert USBR.splitCsv('') == {}
@@ -0,0 +1,52 @@
+import threading
+import time
+from urllib.parse import urlsplit, parse_qsl
+from core import USGS, Config
+
+uid = '09380000-0123456789abcdef0123456789abcdef-60'
+start, end = '2025-01-01 00:00', '2025-01-10 00:00'
+
+def testPagesAreFetchedThroughASlidingWindow(monkeypatch):
+    pageSize, pageCount = 2, 9
+    lock = threading.Lock()
+    held = [0, 0] # pages downloaded but not yet folded: current, most seen
+    offsets = []
+
+    def getPage(url, headers, cancel=None):
+        time.sleep(0.01)
+        offset = int(dict(parse_qsl(urlsplit(url).query)).get('offset', 0))
+        features = [{'properties': {'monitoring_location_id': 'USGS-09380000', 'parameter_code': '00060', 'time_series_id': '0123456789abcdef0123456789abcdef',
+                                    'time': f"2025-01-{offset + i + 1:02d}", 'value': str(offset + i)}} for i in range(pageSize)]
+        with lock:
+            held[0] += 1
+            held[1] = max(held)
+            offsets.append(offset)
+        return {'features': features, 'numberMatched': pageSize * pageCount, 'links': [{'rel': 'next', 'href': f"{USGS.ogcBaseUrl}?f=json&offset={offset + pageSize}"}]}
+
+    addPage = USGS.ogcReader.addPage
+
+    def foldPage(reader, page):
+        with lock:
+            held[0] -= 1
+        return addPage(reader, page)
+
+    monkeypatch.setattr(USGS, 'ogcGetPage', getPage)
+    monkeypatch.setattr(USGS.ogcReader, 'addPage', foldPage)
+    monkeypatch.setattr(USGS.keyring, 'get_password', lambda *args: None)
+    monkeypatch.setattr(Config, 'httpHostConnections', {urlsplit(USGS.ogcBaseUrl).netloc: 3})
+    monkeypatch.setattr(Config, 'utcOffset', 'UTC+00:00 | Coordinated Universal Time')
+    result = USGS.apiRead([uid], 'DAY', start, end)
+
+    assert sorted(offsets) == list(range(0, pageSize * pageCount, pageSize)) # Every page once
+    assert held[1] <= 3 # Never more pages parsed and waiting than the window
+    assert list(result[uid].values) == list(range(pageSize * pageCount))
+
+def testOffsetPagesListsEveryRemainingPage():
+    nextUrl = f"{USGS.ogcBaseUrl}?f=json&limit=100&offset=100"
+    offsets = [int(dict(parse_qsl(urlsplit(url).query))['offset']) for url in USGS.offsetPages(nextUrl, 350, 100)]
+
+    assert offsets == [100, 200, 300]
+
+def testOffsetPagesNeedsAnOffsetAndATotal():
+    assert USGS.offsetPages(f"{USGS.ogcBaseUrl}?f=json&cursor=abc", 350, 100) == []
+    assert USGS.offsetPages(f"{USGS.ogcBaseUrl}?f=json&offset=100", None, 100) == []
@@ -2,7 +2,7 @@ from PyQt6.QtWidgets import QDialog, QComboBox, QLineEdit, QRadioButton, QDialog
 from PyQt6.QtCore import QTimer, QEvent
 from PyQt6.QtGui import QIcon
 from PyQt6 import uic
-from core import Logic, Utils, Config
+from core import Logic, Utils, Config, Aquarius, Oracle
 import os
 import sys
 import json
@@ -419,4 +419,8 @@ class uiOptions(QDialog):
                     QMessageBox.warning(self, "Credential Save Error", "Failed to save {}: {}".format(key, e))
                     
             elif Config.debug:
-                print("[DEBUG] Skipped saving {} to keyring: empty or invalid".format(key))
\ No newline at end of file
+                print("[DEBUG] Skipped saving {} to keyring: empty or invalid".format(key))
+
+        # Drop cached Aquarius and Oracle sessions so the next query signs in with the saved credentials
+        Aquarius.tokens.logout()
+        Oracle.manager.closePools()
\ No newline at end of file